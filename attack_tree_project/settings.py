@@ -95,6 +95,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # On disk rather than in memory: the simworker tests fork workers that share it
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -155,6 +157,27 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Simulation results kept per attack graph (older rows are pruned on save)
+SIM_RESULTS_PER_GRAPH = int(os.environ.get("SIM_RESULTS_PER_GRAPH", "20"))
+# Upper bound on the "trials" of simulate requests (graph and FAIR scenario runs)
+SIM_MAX_TRIALS = int(os.environ.get("SIM_MAX_TRIALS", "200000"))
+# Upper bound on the "workers" simulate parameter (defaults to the CPU count)
+SIM_MAX_WORKERS = int(os.environ.get("SIM_MAX_WORKERS", "0")) or None
+# Seconds without a progress write after which a running job's worker is presumed dead;
+# its job is requeued, or failed after SIM_JOB_MAX_ATTEMPTS claims
+SIM_JOB_TIMEOUT = int(os.environ.get("SIM_JOB_TIMEOUT", "600"))
+SIM_JOB_MAX_ATTEMPTS = int(os.environ.get("SIM_JOB_MAX_ATTEMPTS", "3"))
+# Memory a what-if request may use for its variants' node statistics, in MB
+SIM_WHATIF_MAX_STATS_BYTES = int(os.environ.get("SIM_WHATIF_MAX_STATS_MB", "256")) << 20
+# Memory for the seeded runs kept for incremental re-simulation, in MB
+SIM_INCREMENTAL_MAX_BYTES = int(os.environ.get("SIM_INCREMENTAL_MAX_MB", "512")) << 20
+# Server-Timing header on every simulate response (a request can also ask with "timings": true)
+SIM_TIMINGS = os.environ.get("SIM_TIMINGS", "false").lower() == "true"
+# In-process counters and the /api/metrics/ endpoint (staff users, or a scraper
+# sending "Authorization: Bearer <SIM_METRICS_TOKEN>"; unset disables the token)
+SIM_METRICS = os.environ.get("SIM_METRICS", "false").lower() == "true"
+SIM_METRICS_TOKEN = os.environ.get("SIM_METRICS_TOKEN", "")
+
 LOGIN_URL = "two_factor:login"
 #LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "two_factor:profile"
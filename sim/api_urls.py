@@ -1,9 +1,14 @@
 # sim/api_urls.py
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import AttackGraphViewSet, ScenarioViewSet
+from .views import AttackGraphViewSet, ScenarioViewSet, SimulationJobViewSet, metrics_view
 
 router = DefaultRouter()
 router.register(r'graphs', AttackGraphViewSet, basename='graphs')
 router.register(r'scenarios', ScenarioViewSet, basename='scenarios')
+router.register(r'jobs', SimulationJobViewSet, basename='jobs')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    # Prometheus text metrics, see sim.metrics
+    path('metrics/', metrics_view, name='metrics'),
+]
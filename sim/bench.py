@@ -0,0 +1,225 @@
+from __future__ import annotations
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from .compiled import compile_graph
+from .fair_run import simulate_scenario_mc
+from .simulate import ENGINE_VERSION, SimNode, run_trials, simulate_plan, topo_sort
+
+"""
+Benchmarks for the simulation hot paths, run by `manage.py simbench`.
+
+Synthetic graphs of a few shapes are generated deterministically from
+(shape, size, seed):
+
+  chain    n0 -> n1 -> ... (one level per node, the worst case for level loops)
+  fan_in   every foothold feeds one goal (a single wide gather)
+  layered  levels of equal width, each node with `fan` parents in the level above
+  random   a random DAG with about `fan` parents per node
+
+Each case records wall time, vectorized and discrete trials per second and
+peak traced memory; results are plain JSON so a later run can be compared against them.
+"""
+
+SHAPES = ("chain", "fan_in", "layered", "random")
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_FAN = 3
+# Fractional slowdown (or memory growth) against the baseline counted as a regression
+DEFAULT_THRESHOLD = 0.25
+# Largest graph the scalar engine is timed on
+SCALAR_MAX_NODES = 100
+
+# Metric suffix -> True when larger is better
+_HIGHER_IS_BETTER = {"per_sec": True, "_ms": False, "_mb": False}
+
+_P_SUCC = ({"min": 0.2, "mode": 0.5, "max": 0.9}, {"dist": "PERT", "min": 0.1, "mode": 0.3, "max": 0.6})
+
+
+def synthetic_graph(
+    shape: str, n: int, seed: int = 0, fan: int = DEFAULT_FAN
+) -> Tuple[List[SimNode], List[Tuple[str, str]]]:
+    """(nodes, edges) of an n-node graph of the given shape, in run_trials form."""
+    if shape not in SHAPES:
+        raise ValueError(f"Unknown shape '{shape}'. Expected one of: {', '.join(SHAPES)}.")
+    n = max(int(n), 2)
+    r = random.Random(seed)
+    ids = [f"n{i}" for i in range(n)]
+    edges: List[Tuple[str, str]] = []
+
+    if shape == "chain":
+        edges = [(ids[i - 1], ids[i]) for i in range(1, n)]
+        starts, goals = {0}, {n - 1}
+    elif shape == "fan_in":
+        edges = [(ids[i], ids[n - 1]) for i in range(n - 1)]
+        starts, goals = set(range(n - 1)), {n - 1}
+    elif shape == "layered":
+        width = max(1, int(round(n ** 0.5)))
+        for i in range(width, n):
+            above = range((i // width - 1) * width, (i // width) * width)
+            edges += [(ids[p], ids[i]) for p in r.sample(above, min(fan, len(above)))]
+        starts = set(range(width))
+        goals = set(range((n - 1) // width * width, n))
+    else:
+        starts = set(range(max(1, n // 20)))
+        for i in range(len(starts), n):
+            edges += [(ids[p], ids[i]) for p in r.sample(range(i), min(fan, i))]
+        goals = set(range(n - max(1, n // 20), n))
+
+    nodes = [
+        SimNode(
+            node_id=nid,
+            node_name=nid,
+            node_type="foothold" if i in starts else "goal" if i in goals else "triangular",
+            kind="",
+            p_succ=dict(_P_SUCC[i % len(_P_SUCC)]),
+        )
+        for i, nid in enumerate(ids)
+    ]
+    return nodes, edges
+
+
+def _timed(fn: Callable[[], object], repeat: int) -> Tuple[float, float]:
+    """(median seconds, peak traced MiB) of `repeat` calls; the peak is taken on a separate call."""
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(times), peak / 2 ** 20
+
+
+def bench_graph(shape: str, n: int, trials: int = 20000, repeat: int = 3, seed: int = 0) -> Dict[str, float]:
+    """Timings of topo_sort, compile_graph and the engines on one synthetic graph."""
+    nodes, edges = synthetic_graph(shape, n, seed)
+    plan = compile_graph(nodes, edges)
+    out = {}
+    out["topo_sort_ms"] = _timed(lambda: topo_sort(nodes, edges), repeat)[0] * 1e3
+    out["compile_ms"] = _timed(lambda: compile_graph(nodes, edges), repeat)[0] * 1e3
+
+    seconds, peak = _timed(lambda: simulate_plan(plan, trials=trials, seed=seed), repeat)
+    out["vectorized_ms"] = seconds * 1e3
+    out["vectorized_trials_per_sec"] = trials / seconds if seconds else 0.0
+    out["vectorized_peak_mb"] = peak
+    discrete_trials = trials * 10
+    seconds, _ = _timed(lambda: simulate_plan(plan, trials=discrete_trials, seed=seed, engine="discrete"), repeat)
+    out["discrete_trials_per_sec"] = discrete_trials / seconds if seconds else 0.0
+    if n <= SCALAR_MAX_NODES:
+        scalar_trials = max(1, trials // 20)
+        seconds, _ = _timed(lambda: run_trials(nodes, edges, trials=scalar_trials, seed=seed, engine="scalar"), 1)
+        out["scalar_trials_per_sec"] = scalar_trials / seconds if seconds else 0.0
+    return out
+
+
+def bench_fair(trials: int = 100_000, repeat: int = 3, seed: int = 0) -> Dict[str, float]:
+    spec = {"dist": "PERT", "min": 0.1, "mode": 0.3, "max": 0.6}
+    seconds, peak = _timed(
+        lambda: simulate_scenario_mc(
+            tef_spec=spec, vuln_spec=spec, plm_spec=spec, slef_spec=spec, slm_spec=spec, trials=trials, seed=seed
+        ),
+        repeat,
+    )
+    return {"scenario_ms": seconds * 1e3, "trials_per_sec": trials / seconds if seconds else 0.0, "peak_mb": peak}
+
+
+def store_graph(owner, shape: str, n: int, seed: int = 0):
+    """Save a synthetic graph as an AttackGraph owned by `owner`."""
+    from sim.models import AttackGraph, Edge, Node
+
+    nodes, edges = synthetic_graph(shape, n, seed)
+    graph = AttackGraph.objects.create(title=f"bench {shape} {n}", owner=owner)
+    Node.objects.bulk_create([
+        Node(graph=graph, node_id=s.node_id, label=s.node_name, node_type=s.node_type, p_succ=s.p_succ)
+        for s in nodes
+    ])
+    Edge.objects.bulk_create([
+        Edge(graph=graph, edge_id=f"e{i}", source=s, target=t) for i, (s, t) in enumerate(edges)
+    ])
+    return graph
+
+
+def bench_api(owner, shape: str, n: int, trials: int = 5000, repeat: int = 3) -> Dict[str, float]:
+    """Serializer time and POST /api/graphs/{id}/simulate/ latency on a stored synthetic graph."""
+    from rest_framework.test import APIClient
+    from sim.serializers import AttackGraphSerializer
+
+    graph = store_graph(owner, shape, n)
+    client = APIClient()
+    client.force_authenticate(owner)
+    url = f"/api/graphs/{graph.pk}/simulate/"
+    out = {}
+    try:
+        out["serialize_ms"] = _timed(lambda: AttackGraphSerializer(graph).data, repeat)[0] * 1e3
+
+        def simulate(body):
+            response = client.post(url, body, format="json")
+            if response.status_code != 200:
+                raise RuntimeError(f"simulate returned {response.status_code}: {response.data}")
+
+        # Unseeded runs always simulate; the seeded repeat is answered from the stored result
+        out["simulate_latency_ms"] = _timed(lambda: simulate({"trials": trials}), repeat)[0] * 1e3
+        simulate({"trials": trials, "seed": 1})
+        out["simulate_cached_latency_ms"] = _timed(lambda: simulate({"trials": trials, "seed": 1}), repeat)[0] * 1e3
+    finally:
+        graph.delete()
+    return out
+
+
+def environment() -> Dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "engine_version": ENGINE_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+
+
+def _higher_is_better(metric: str) -> bool | None:
+    for suffix, higher in _HIGHER_IS_BETTER.items():
+        if metric.endswith(suffix):
+            return higher
+    return None
+
+
+def compare(current: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Regressions of `current` against `baseline` (both {"results": {case: {metric: value}}}):
+    metrics that got worse by more than `threshold` as a fraction of the baseline.
+    Cases or metrics missing from either side are skipped.
+    """
+    regressions = []
+    base_results = baseline.get("results", {})
+    for case, metrics in current.get("results", {}).items():
+        for metric, value in metrics.items():
+            before = base_results.get(case, {}).get(metric)
+            higher = _higher_is_better(metric)
+            if before is None or higher is None or before <= 0:
+                continue
+            change = (before - value) / before if higher else (value - before) / before
+            if change > threshold:
+                regressions.append({
+                    "case": case, "metric": metric, "baseline": before, "current": value, "change": change,
+                })
+    return regressions
+
+
+def load(path: str) -> Dict:
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save(report: Dict, path: str) -> None:
+    with open(path, "w") as fh:
+        json.dump(report, fh, indent=2, sort_keys=True)
+        fh.write("\n")
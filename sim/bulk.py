@@ -0,0 +1,197 @@
+from __future__ import annotations
+import json
+from typing import Dict, Iterable, Iterator, List, Tuple
+from django.db import transaction
+from sim.models import AttackGraph, Edge, Node
+
+"""
+Streaming graph import / export as NDJSON.
+
+One JSON object per line, each wrapping a single record:
+
+  {"graph": {"title": ..., "arrival": {...}, "metadata": {...}}}   optional, first
+  {"node": {"node_id": "n1", "label": ..., "p_succ": {...}, ...}}
+  {"edge": {"edge_id": "e1", "source": "n1", "target": "n2", "type": "follows"}}
+
+Nodes and edges may come in any order. Import validates each record as it is
+read, writes them with bulk_create in batches of BULK_BATCH inside one
+transaction, and checks edge endpoints and acyclicity in a single pass at
+the end, so only node ids and edge endpoints are held in memory. Export reads
+the tables in chunks and yields lines as it goes.
+"""
+
+NODE_FIELDS = ("node_id", "label", "kind", "node_type", "p_succ", "p_detect", "controls", "weights", "gate", "ui")
+EDGE_FIELDS = ("edge_id", "source", "target", "type")
+EDGE_TYPES = ("follows", "requires")
+NODE_TYPES = tuple(value for value, _ in Node._meta.get_field("node_type").choices)
+# Rows per bulk_create on import and per database fetch on export
+BULK_BATCH = 2000
+
+_JSON_TYPES = {"p_succ": dict, "p_detect": dict, "controls": list, "weights": dict, "gate": dict, "ui": dict}
+
+
+def _text(record: Dict, key: str, max_length: int, default: str | None = None) -> str:
+    value = record.get(key, default)
+    if value is None:
+        raise ValueError(f"{key} is required.")
+    if not isinstance(value, str) or (default is None and not value):
+        raise ValueError(f"{key} must be a non-empty string." if default is None else f"{key} must be a string.")
+    if len(value) > max_length:
+        raise ValueError(f"{key} is longer than {max_length} characters.")
+    return value
+
+
+def _node(graph: AttackGraph, record: Dict) -> Node:
+    unknown = sorted(set(record) - set(NODE_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown node field: {unknown[0]}")
+    node_id = _text(record, "node_id", 64)
+    node_type = record.get("node_type", "triangular")
+    if node_type not in NODE_TYPES:
+        raise ValueError(f"Node {node_id}: node_type must be one of: {', '.join(NODE_TYPES)}.")
+    for key, kind in _JSON_TYPES.items():
+        if key in record and not isinstance(record[key], kind):
+            raise ValueError(f"Node {node_id}: {key} must be a JSON {'array' if kind is list else 'object'}.")
+    return Node(
+        graph=graph,
+        node_id=node_id,
+        label=_text(record, "label", 200, default=node_id),
+        kind=_text(record, "kind", 24, default=""),
+        node_type=node_type,
+        **{key: record[key] for key in _JSON_TYPES if key in record},
+    )
+
+
+def _edge(graph: AttackGraph, record: Dict, number: int) -> Edge:
+    unknown = sorted(set(record) - set(EDGE_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown edge field: {unknown[0]}")
+    kind = record.get("type", "follows")
+    if kind not in EDGE_TYPES:
+        raise ValueError(f"Edge type must be one of: {', '.join(EDGE_TYPES)}.")
+    return Edge(
+        graph=graph,
+        edge_id=_text(record, "edge_id", 64, default=f"e{number}"),
+        source=_text(record, "source", 64),
+        target=_text(record, "target", 64),
+        type=kind,
+    )
+
+
+def _check_structure(ids: Dict[str, int], endpoints: List[Tuple[str, str, str]]) -> None:
+    """
+    Every edge endpoint exists and the graph has no cycle (Kahn's algorithm).
+    ids maps node_id to 0..n-1; endpoints are (where, source, target).
+    """
+    children: List[List[int]] = [[] for _ in ids]
+    indeg = [0] * len(ids)
+    for where, s, t in endpoints:
+        for end in (s, t):
+            if end not in ids:
+                raise ValueError(f"{where}: edge {s} -> {t} references an unknown node {end}")
+        children[ids[s]].append(ids[t])
+        indeg[ids[t]] += 1
+    queue = [i for i, d in enumerate(indeg) if d == 0]
+    seen = 0
+    while queue:
+        u = queue.pop()
+        seen += 1
+        for v in children[u]:
+            indeg[v] -= 1
+            if indeg[v] == 0:
+                queue.append(v)
+    if seen != len(ids):
+        raise ValueError("Cycle detected in attack graph")
+
+
+def _records(lines: Iterable) -> Iterator[Tuple[int, str, Dict]]:
+    """(line number, record kind, body) for each non-blank line."""
+    for number, line in enumerate(lines, 1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"Line {number}: invalid JSON ({exc.msg})")
+        if not isinstance(obj, dict) or len(obj) != 1:
+            raise ValueError(f'Line {number}: expected one of {{"graph": ...}}, {{"node": ...}}, {{"edge": ...}}')
+        (kind, body), = obj.items()
+        if kind not in ("graph", "node", "edge") or not isinstance(body, dict):
+            raise ValueError(f'Line {number}: expected one of {{"graph": ...}}, {{"node": ...}}, {{"edge": ...}}')
+        yield number, kind, body
+
+
+def import_graph(lines: Iterable, owner, graph: AttackGraph | None = None, title: str | None = None) -> Dict:
+    """
+    Create a graph for `owner` from NDJSON lines (str or bytes), or replace the
+    nodes and edges of `graph`. All or nothing: raises ValueError, naming the
+    line, on the first invalid record and nothing is saved.
+    Returns {"graph": AttackGraph, "nodes": count, "edges": count}.
+    """
+    with transaction.atomic():
+        if graph is None:
+            graph = AttackGraph.objects.create(title=title or "Imported graph", owner=owner)
+        else:
+            graph.title = title or graph.title
+            graph.revision += 1
+            graph.nodes.all().delete()
+            graph.edges.all().delete()
+
+        ids: Dict[str, int] = {}
+        endpoints: List[Tuple[str, str, str]] = []
+        nodes: List[Node] = []
+        edges: List[Edge] = []
+        for number, kind, body in _records(lines):
+            try:
+                if kind == "graph":
+                    if ids or endpoints:
+                        raise ValueError("the graph record must come before nodes and edges.")
+                    if not title and body.get("title"):
+                        graph.title = _text(body, "title", 200)
+                    for key in ("arrival", "metadata"):
+                        if key in body:
+                            if not isinstance(body[key], dict):
+                                raise ValueError(f"{key} must be a JSON object.")
+                            setattr(graph, key, body[key])
+                elif kind == "node":
+                    node = _node(graph, body)
+                    if node.node_id in ids:
+                        raise ValueError(f"Duplicate node_id {node.node_id}")
+                    ids[node.node_id] = len(ids)
+                    nodes.append(node)
+                else:
+                    edge = _edge(graph, body, len(endpoints) + 1)
+                    endpoints.append((f"Line {number}", edge.source, edge.target))
+                    edges.append(edge)
+            except ValueError as exc:
+                raise ValueError(f"Line {number}: {exc}")
+            if len(nodes) >= BULK_BATCH:
+                Node.objects.bulk_create(nodes)
+                nodes = []
+            if len(edges) >= BULK_BATCH:
+                Edge.objects.bulk_create(edges)
+                edges = []
+        Node.objects.bulk_create(nodes)
+        Edge.objects.bulk_create(edges)
+
+        if not ids:
+            raise ValueError("The import has no nodes.")
+        _check_structure(ids, endpoints)
+        # A replaced graph has a new revision, so compiled plans of the old contents are not reused
+        graph.save()
+    return {"graph": graph, "nodes": len(ids), "edges": len(endpoints)}
+
+
+def _line(kind: str, body: Dict) -> str:
+    return json.dumps({kind: body}, separators=(",", ":")) + "\n"
+
+
+def export_graph(graph: AttackGraph) -> Iterator[str]:
+    """NDJSON lines of `graph` (see the module docstring), read from the database in chunks."""
+    yield _line("graph", {"title": graph.title, "arrival": graph.arrival, "metadata": graph.metadata})
+    for row in graph.nodes.order_by("pk").values(*NODE_FIELDS).iterator(chunk_size=BULK_BATCH):
+        yield _line("node", row)
+    for row in graph.edges.order_by("pk").values(*EDGE_FIELDS).iterator(chunk_size=BULK_BATCH):
+        yield _line("edge", row)
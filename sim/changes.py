@@ -0,0 +1,206 @@
+from __future__ import annotations
+from typing import Callable, Dict, Iterable, List, Tuple
+from django.db import transaction
+from django.db.models import Q
+from sim.models import AttackGraph, Edge, Node
+from .bulk import BULK_BATCH, EDGE_FIELDS, NODE_FIELDS, _check_structure, _edge, _node
+
+"""
+Diff-based graph edits.
+
+Nodes and edges are keyed by node_id / edge_id. An edit only touches the
+rows it names: existing rows are loaded for those ids and written back with
+bulk_update (only the fields that actually differ), new ones go through
+bulk_create and deletions are targeted. Every edit that changes something
+bumps AttackGraph.revision, which graph_plan keys compiled plans on.
+
+apply_changes serves PATCH /api/graphs/{id}/changes/:
+
+  {"base_revision": 7,
+   "title": ..., "arrival": {...}, "metadata": {...},
+   "nodes": {"upsert": [{"node_id": "n1", "p_succ": {...}}, ...], "delete": ["n9"]},
+   "edges": {"upsert": [{"edge_id": "e1", "source": "n1", "target": "n2"}], "delete": ["e4"]}}
+
+An upsert of an existing row only needs the fields it changes. Edges of
+deleted nodes are deleted with them. replace_rows is the whole-list form used
+by AttackGraphSerializer.update.
+"""
+
+GRAPH_FIELDS = ("title", "arrival", "metadata")
+
+
+class RevisionConflict(ValueError):
+    """base_revision no longer matches the stored graph."""
+
+
+def _defaults(model, fields: Iterable[str]) -> Dict:
+    return {f: model._meta.get_field(f).get_default() for f in fields}
+
+
+NODE_DEFAULTS = _defaults(Node, NODE_FIELDS)
+EDGE_DEFAULTS = _defaults(Edge, EDGE_FIELDS)
+
+# model -> (related name on AttackGraph, key field, fields, defaults, validator)
+_TABLES = {
+    Node: ("nodes", "node_id", NODE_FIELDS, NODE_DEFAULTS, _node),
+    Edge: ("edges", "edge_id", EDGE_FIELDS, EDGE_DEFAULTS, lambda graph, rec: _edge(graph, rec, 0)),
+}
+
+
+def _record(obj, fields: Tuple[str, ...]) -> Dict:
+    return {f: getattr(obj, f) for f in fields}
+
+
+def _upsert(graph: AttackGraph, model, records: List[Dict], validate: Callable | None) -> List[Dict]:
+    """Write `records` (keyed by the table's id field) and return those that changed, in full."""
+    related, key, fields, defaults, _ = _TABLES[model]
+    existing = {
+        getattr(obj, key): obj
+        for obj in getattr(graph, related).filter(**{f"{key}__in": [r[key] for r in records]})
+    }
+    created, updated, changed_fields = [], [], set()
+    for rec in records:
+        obj = existing.get(rec[key])
+        if obj is None:
+            # The validator builds the row, with the same defaults as an NDJSON import
+            created.append(validate(graph, rec) if validate is not None else model(graph=graph, **{**defaults, **rec}))
+            continue
+        if validate is not None:
+            validate(graph, {**_record(obj, fields), **rec})
+        diff = {f: v for f, v in rec.items() if f != key and getattr(obj, f) != v}
+        if diff:
+            for f, v in diff.items():
+                setattr(obj, f, v)
+            updated.append(obj)
+            changed_fields |= set(diff)
+    if updated:
+        model.objects.bulk_update(updated, sorted(changed_fields), batch_size=BULK_BATCH)
+    if created:
+        model.objects.bulk_create(created, batch_size=BULK_BATCH)
+    return [_record(obj, fields) for obj in created + updated]
+
+
+def _delete(graph: AttackGraph, model, ids: Iterable[str]) -> List[str]:
+    related, key = _TABLES[model][:2]
+    rows = getattr(graph, related).filter(**{f"{key}__in": list(ids)})
+    deleted = sorted(set(rows.values_list(key, flat=True)))
+    if deleted:
+        rows.delete()
+    return deleted
+
+
+def _bump(graph: AttackGraph) -> None:
+    graph.revision += 1
+    graph.save()
+
+
+def replace_rows(graph: AttackGraph, model, records: List[Dict]) -> Tuple[List[Dict], List[str]]:
+    """
+    Make the graph's nodes (or edges) equal to `records`, writing only the
+    difference. Fields a record omits take the model defaults, as if the rows
+    had been recreated. Returns (changed records, deleted ids). Does not bump
+    the revision.
+    """
+    related, key, fields, defaults, _ = _TABLES[model]
+    current = {}
+    duplicates = []
+    for row in getattr(graph, related).values("pk", *fields):
+        pk = row.pop("pk")
+        if row[key] in current:
+            duplicates.append(pk)
+        else:
+            current[row[key]] = row
+    incoming = {r[key]: {**defaults, **r} for r in records}
+    changed = [rec for rid, rec in incoming.items() if current.get(rid) != rec]
+    if duplicates:
+        model.objects.filter(pk__in=duplicates).delete()
+    upserted = _upsert(graph, model, changed, None) if changed else []
+    deleted = _delete(graph, model, [rid for rid in current if rid not in incoming])
+    return upserted, deleted
+
+
+def _section(data: Dict, name: str, key: str) -> Tuple[List[Dict], List[str]]:
+    section = data.get(name) or {}
+    if not isinstance(section, dict):
+        raise ValueError(f'{name} must be an object with "upsert" and "delete" lists.')
+    upsert = section.get("upsert") or []
+    delete = section.get("delete") or []
+    if not isinstance(upsert, list) or not all(isinstance(r, dict) and r.get(key) for r in upsert):
+        raise ValueError(f"{name}.upsert must be a list of objects with a {key}.")
+    if not isinstance(delete, list) or not all(isinstance(i, str) for i in delete):
+        raise ValueError(f"{name}.delete must be a list of {key} strings.")
+    ids = [r[key] for r in upsert]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"{name}.upsert names a {key} more than once.")
+    return upsert, delete
+
+
+def _validator(model, label: str) -> Callable:
+    _, key, _, _, validate = _TABLES[model]
+
+    def check(graph, rec):
+        try:
+            return validate(graph, rec)
+        except ValueError as exc:
+            message = str(exc)
+            prefix = f"{label} {rec[key]}: "
+            raise ValueError(message if message.startswith(prefix) else prefix + message)
+    return check
+
+
+def apply_changes(graph: AttackGraph, data: Dict) -> Dict:
+    """
+    Apply a change set (see the module docstring) in one transaction. Raises
+    RevisionConflict when base_revision is stale and ValueError on invalid
+    records, dangling edges or a cycle; nothing is saved then.
+    Returns the new revision and only the changed entities.
+    """
+    node_upsert, node_delete = _section(data, "nodes", "node_id")
+    edge_upsert, edge_delete = _section(data, "edges", "edge_id")
+
+    with transaction.atomic():
+        graph = AttackGraph.objects.select_for_update().get(pk=graph.pk)
+        base = data.get("base_revision")
+        if base is not None:
+            try:
+                base = int(base)
+            except (TypeError, ValueError):
+                raise ValueError("base_revision must be an integer.")
+        if base is not None and base != graph.revision:
+            raise RevisionConflict(f"Graph is at revision {graph.revision}, not {base}.")
+
+        changed_graph = {}
+        for field in GRAPH_FIELDS:
+            if field in data and data[field] != getattr(graph, field):
+                value = data[field]
+                if field == "title" and (not isinstance(value, str) or not value.strip()):
+                    raise ValueError("title must be a non-empty string.")
+                if field != "title" and not isinstance(value, dict):
+                    raise ValueError(f"{field} must be a JSON object.")
+                setattr(graph, field, value)
+                changed_graph[field] = value
+
+        nodes = _upsert(graph, Node, node_upsert, _validator(Node, "Node")) if node_upsert else []
+        removed_nodes = _delete(graph, Node, node_delete) if node_delete else []
+        edges = _upsert(graph, Edge, edge_upsert, _validator(Edge, "Edge")) if edge_upsert else []
+        removed_edges = set(_delete(graph, Edge, edge_delete)) if edge_delete else set()
+        if removed_nodes:
+            # Edges left dangling by the deleted nodes go with them
+            kept = {r["edge_id"] for r in edge_upsert}
+            dangling = graph.edges.filter(Q(source__in=removed_nodes) | Q(target__in=removed_nodes))
+            removed_edges |= set(_delete(graph, Edge, dangling.exclude(edge_id__in=kept).values_list("edge_id", flat=True)))
+
+        if nodes or edges or removed_nodes or removed_edges:
+            ids = {nid: i for i, nid in enumerate(graph.nodes.values_list("node_id", flat=True))}
+            _check_structure(ids, [
+                (f"Edge {eid}", s, t) for eid, s, t in graph.edges.values_list("edge_id", "source", "target")
+            ])
+        if changed_graph or nodes or edges or removed_nodes or removed_edges:
+            _bump(graph)
+
+    return {
+        "revision": graph.revision,
+        "graph": changed_graph,
+        "nodes": {"upserted": nodes, "deleted": removed_nodes},
+        "edges": {"upserted": edges, "deleted": sorted(removed_edges)},
+    }
@@ -0,0 +1,303 @@
+from __future__ import annotations
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, Iterable, List, Tuple
+import numpy as np
+from . import metrics
+from .distributions import Distributions, compile_spec
+from .metrics import span
+from .threat import ThreatModel, compile_threat
+
+"""
+Compiled, index-based form of an attack graph.
+
+Every simulation path works on a CompiledGraph instead of SimNode lists and
+(source, target) tuples: node ids are mapped to dense integers in level-major
+topological order, parents are stored as CSR arrays and the per-level gather
+blocks used by the vectorized engine are built once. Plans for stored graphs
+are cached per AttackGraph revision (see graph_plan).
+
+Gates: a node is entered when all of its "requires" parents are reached and
+at least `threshold` of its "follows" parents are. Node.gate selects the
+threshold: {"type": "or"} (default, threshold 1), {"type": "and"} (every
+parent required) or {"type": "k_of_n", "k": k}. Parents are independent given
+the sampled p_succ, so the gate value is a product over required parents
+times a Poisson-binomial tail over the others.
+"""
+
+GATE_TYPES = ("or", "and", "k_of_n")
+
+
+@dataclass(frozen=True)
+class LevelBlock:
+    """Columns of one topological level, split the way the engines consume them."""
+    starts: np.ndarray   # foothold columns: reach = p
+    inner: np.ndarray    # non-foothold columns: reach = P(any parent) * p
+    gather: np.ndarray   # (len(inner), max_parents) parent columns, padded with the sentinel n
+    gated: "GateBlock | None" = None  # columns whose gate is anything but a plain OR
+
+
+@dataclass(frozen=True)
+class GateBlock:
+    """Non-foothold columns of one level with required parents or a threshold other than 1."""
+    cols: np.ndarray      # reach = P(all required) * P(>= k optional) * p
+    gather: np.ndarray    # (len(cols), width) optional parents, padded with the sentinel n
+    k: np.ndarray         # optional parents needed per column; 0 when there is no such condition
+    required: np.ndarray  # (len(cols), width) required parents, padded with the sentinel n
+    req_mask: np.ndarray  # bool, real entries of `required`
+
+    def subset(self, rows: np.ndarray) -> "GateBlock":
+        return GateBlock(
+            cols=self.cols[rows], gather=self.gather[rows], k=self.k[rows],
+            required=self.required[rows], req_mask=self.req_mask[rows],
+        )
+
+
+@dataclass(frozen=True)
+class CompiledGraph:
+    ids: Tuple[str, ...]           # node ids, level-major topological order
+    index: Dict[str, int]          # node id -> column
+    indptr: np.ndarray             # CSR row pointers into `indices`, length n + 1
+    indices: np.ndarray            # parent columns of every node
+    requires: np.ndarray           # bool, aligned with `indices`: parent is a "requires" edge
+    threshold: np.ndarray          # "follows" parents needed per node (see GATE_TYPES)
+    level: np.ndarray              # longest-path depth of every node
+    blocks: Tuple[LevelBlock, ...]
+    foothold: np.ndarray           # bool mask
+    goal_ids: Tuple[str, ...]      # goals in input order
+    goal_cols: np.ndarray
+    dists: Distributions           # p_succ distribution of every column
+    threat: ThreatModel | None     # capability, controls and detection (sim.threat)
+
+    @property
+    def n(self) -> int:
+        return len(self.ids)
+
+    def parents_of(self, j: int) -> np.ndarray:
+        return self.indices[self.indptr[j]:self.indptr[j + 1]]
+
+    @cached_property
+    def structure_digest(self) -> str:
+        """sha256 over ids, parents, gates, footholds, goals and the threat model (everything but p_succ)."""
+        h = hashlib.sha256()
+        h.update("\x1f".join(self.ids).encode())
+        h.update(b"\x1e" + "\x1f".join(self.goal_ids).encode())
+        for arr in (self.indptr, self.indices, self.requires, self.threshold, self.foothold):
+            h.update(np.ascontiguousarray(arr).tobytes())
+        if self.threat is not None:
+            h.update(self.threat.digest)
+        return h.hexdigest()
+
+    @cached_property
+    def digest(self) -> str:
+        """sha256 over everything the engines read; equal digests simulate identically."""
+        h = hashlib.sha256(self.structure_digest.encode())
+        h.update(np.ascontiguousarray(self.dists.family).tobytes())
+        h.update(np.ascontiguousarray(self.dists.params).tobytes())
+        return h.hexdigest()
+
+
+def p_succ_spec(pdef: Dict | None) -> Tuple[int, Tuple[float, ...]]:
+    """compile_spec with draw_p's defaults: triangular unless "dist" says otherwise, max 1."""
+    return compile_spec(pdef, default="TRIANGULAR", max_default=1.0)
+
+
+def gate_threshold(gate: Dict | None, optional: int, required: int) -> Tuple[int, bool]:
+    """
+    (threshold on the optional parents, whether every parent is required) for
+    a Node.gate spec. A node without parents keeps threshold >= 1, so it stays
+    unreachable unless it is a foothold.
+    """
+    gate = gate or {}
+    kind = gate.get("type", "or")
+    if kind not in GATE_TYPES:
+        raise ValueError(f"Unknown gate type '{kind}'. Expected one of: {', '.join(GATE_TYPES)}.")
+    if kind == "and":
+        return (0 if optional + required else 1), True
+    if kind == "k_of_n":
+        k = gate.get("k")
+        if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+            raise ValueError("k_of_n gates need an integer k >= 1.")
+        return k, False
+    return (1 if optional or not required else 0), False
+
+
+def compile_graph(
+    nodes: Iterable, edges: Iterable[Tuple[str, ...]], metadata: Dict | None = None
+) -> CompiledGraph:
+    """
+    Build the plan from anything exposing node_id / node_type / p_succ and
+    optionally gate, p_detect, controls and weights (SimNode or the Node
+    model), (source, target) or (source, target, type) edges, where type
+    "requires" marks a required parent, and the graph metadata (controls and
+    attacker_capability, see sim.threat).
+    Raises ValueError on unknown edge endpoints, an invalid gate or spec, or a cycle.
+    """
+    nodes = list(nodes)
+    edges = list(edges)
+    pos = {n.node_id: i for i, n in enumerate(nodes)}
+
+    parents: List[List[int]] = [[] for _ in nodes]
+    required: List[List[bool]] = [[] for _ in nodes]
+    children: List[List[int]] = [[] for _ in nodes]
+    for s, t, *kind in edges:
+        if s not in pos or t not in pos:
+            raise ValueError(f"Edge {s} -> {t} references an unknown node")
+        parents[pos[t]].append(pos[s])
+        required[pos[t]].append(bool(kind) and kind[0] == "requires")
+        children[pos[s]].append(pos[t])
+
+    threshold_of = []
+    for i, node in enumerate(nodes):
+        try:
+            k, all_required = gate_threshold(
+                getattr(node, "gate", None), required[i].count(False), required[i].count(True)
+            )
+        except ValueError as exc:
+            raise ValueError(f"Node {node.node_id}: {exc}")
+        if all_required:
+            required[i] = [True] * len(required[i])
+        threshold_of.append(k)
+
+    # Kahn's algorithm, tracking the longest-path depth of every node
+    with span("topo_sort"):
+        indeg = [len(ps) for ps in parents]
+        depth = [0] * len(nodes)
+        queue = [i for i, d in enumerate(indeg) if d == 0]
+        seen = 0
+        while queue:
+            u = queue.pop()
+            seen += 1
+            for v in children[u]:
+                depth[v] = max(depth[v], depth[u] + 1)
+                indeg[v] -= 1
+                if indeg[v] == 0:
+                    queue.append(v)
+    if seen != len(nodes):
+        raise ValueError("Cycle detected in attack graph")
+
+    # Level-major order, stable on input order, so each level is a contiguous run
+    order = sorted(range(len(nodes)), key=lambda i: (depth[i], i))
+    col = {orig: j for j, orig in enumerate(order)}
+    ids = tuple(nodes[i].node_id for i in order)
+    n = len(ids)
+
+    indptr = np.zeros(n + 1, dtype=np.intp)
+    for j, orig in enumerate(order):
+        indptr[j + 1] = indptr[j] + len(parents[orig])
+    indices = np.array([col[p] for orig in order for p in parents[orig]], dtype=np.intp)
+    requires = np.array([r for orig in order for r in required[orig]], dtype=bool)
+    threshold = np.array([threshold_of[orig] for orig in order], dtype=np.intp)
+    level = np.array([depth[orig] for orig in order], dtype=np.intp)
+
+    foothold = np.array([nodes[orig].node_type == "foothold" for orig in order], dtype=bool)
+    if not foothold.any():
+        # If no explicit foothold, treat zero-indegree nodes as starting points
+        foothold = np.diff(indptr) == 0
+    goal_ids = tuple(n_.node_id for n_ in nodes if n_.node_type == "goal")
+    goal_cols = np.array([col[pos[g]] for g in goal_ids], dtype=np.intp)
+
+    family = np.zeros(n, dtype=np.int8)
+    params = np.zeros((n, 5), dtype=float)
+    for j, orig in enumerate(order):
+        try:
+            family[j], params[j] = p_succ_spec(nodes[orig].p_succ)
+        except ValueError as exc:
+            raise ValueError(f"Node {ids[j]}: p_succ: {exc}")
+
+    def padded(rows: List[np.ndarray]) -> np.ndarray:
+        out = np.full((len(rows), max((len(r) for r in rows), default=0) or 1), n, dtype=np.intp)
+        for i, r in enumerate(rows):
+            out[i, :len(r)] = r
+        return out
+
+    # Plain OR columns (no required parent, threshold 1) keep the single-gather kernel
+    has_required = np.array([requires[indptr[j]:indptr[j + 1]].any() for j in range(n)], dtype=bool)
+    plain = ~has_required & (threshold == 1)
+
+    blocks = []
+    for lvl in np.unique(level):
+        members = np.flatnonzero(level == lvl)
+        starts = members[foothold[members]]
+        rest = members[~foothold[members]]
+        inner = rest[plain[rest]]
+        gated = None
+        cols = rest[~plain[rest]]
+        if cols.size:
+            opt, req = [], []
+            for j in cols:
+                sl = slice(indptr[j], indptr[j + 1])
+                opt.append(indices[sl][~requires[sl]])
+                req.append(indices[sl][requires[sl]])
+            required_cols = padded(req)
+            req_mask = np.zeros(required_cols.shape, dtype=bool)
+            for i, r in enumerate(req):
+                req_mask[i, :len(r)] = True
+            gated = GateBlock(
+                cols=cols, gather=padded(opt), k=threshold[cols],
+                required=required_cols, req_mask=req_mask,
+            )
+        blocks.append(LevelBlock(
+            starts=starts, inner=inner, gather=padded([indices[indptr[j]:indptr[j + 1]] for j in inner]),
+            gated=gated,
+        ))
+
+    return CompiledGraph(
+        ids=ids,
+        index={nid: j for j, nid in enumerate(ids)},
+        indptr=indptr,
+        indices=indices,
+        requires=requires,
+        threshold=threshold,
+        level=level,
+        blocks=tuple(blocks),
+        foothold=foothold,
+        goal_ids=goal_ids,
+        goal_cols=goal_cols,
+        dists=Distributions.from_arrays(family, params),
+        threat=compile_threat([nodes[orig] for orig in order], metadata),
+    )
+
+
+# Plans of stored graphs, keyed on (graph id, revision).
+PLAN_CACHE_SIZE = 64
+_plans: "OrderedDict[Tuple[str, str], CompiledGraph]" = OrderedDict()
+_plans_lock = threading.Lock()
+
+
+def graph_revision(graph) -> str:
+    """
+    Cache key component that changes whenever the graph is edited: its
+    revision number, plus updated_at for saves that bypass sim.changes.
+    """
+    return f"{graph.revision}:{graph.updated_at.isoformat() if graph.updated_at else ''}"
+
+
+def graph_plan(graph) -> CompiledGraph:
+    """CompiledGraph for an AttackGraph, compiled once per revision."""
+    key = (str(graph.pk), graph_revision(graph))
+    with _plans_lock:
+        plan = _plans.get(key)
+        if plan is not None:
+            _plans.move_to_end(key)
+    if plan is not None:
+        metrics.inc("sim_plan_cache_requests_total", outcome="hit")
+        return plan
+    metrics.inc("sim_plan_cache_requests_total", outcome="miss")
+
+    with span("db"):
+        nodes = list(graph.nodes.all().only("node_id", "node_type", "p_succ", "gate", "p_detect", "controls", "weights"))
+        edges = list(graph.edges.values_list("source", "target", "type"))
+    with span("compile"):
+        plan = compile_graph(nodes, edges, graph.metadata)
+    with _plans_lock:
+        # Older revisions of this graph can never be hit again
+        for stale in [k for k in _plans if k[0] == key[0]]:
+            del _plans[stale]
+        _plans[key] = plan
+        while len(_plans) > PLAN_CACHE_SIZE:
+            _plans.popitem(last=False)
+    return plan
@@ -0,0 +1,327 @@
+from __future__ import annotations
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, FrozenSet, List, Sequence, Set, Tuple
+import numpy as np
+from .analytic import _point_values, reach_values
+from .compiled import CompiledGraph
+
+"""
+Minimal cut sets: sets of nodes whose removal leaves no foothold -> goal path.
+
+Cuts are structural, over the graph run_trials simulates: a path starts at
+a foothold (edges into a foothold are never needed, it is reached on its
+own) and follows parent -> child edges to the goal. Every gate is read as an
+OR, so a cut stops the goal under any gate; with AND / k-of-n gates a
+smaller set may already suffice. The goal itself is never cut, footholds
+can be.
+
+The minimum cut size comes from max-flow on the node-split graph (every
+node an in -> out arc of capacity 1). Minimal cuts up to max_size nodes are
+then enumerated by branching on the nodes of a shortest path the current
+set does not hit yet; branch i forbids cutting the path's earlier nodes, so
+each set is produced once, and a branch is pruned when the set plus a
+max-flow lower bound on what it still needs (forbidden nodes uncuttable)
+exceeds max_size. When that bound leaves no slack, only nodes in some
+minimum cut of the residual network are branched on. Only nodes on some foothold -> goal path take part.
+
+Cuts are ranked by the reach probability they intercept,
+1 - prod(1 - reach) over the cut nodes with reach from the sim.analytic
+point estimate: every cut disconnects the goal, and one that intercepts
+more stops the attacker earlier on more of its ways in. Enumerations are
+cached on the plan's structure (they do not depend on p_succ), so edits to
+probabilities only re-rank.
+"""
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+MAX_CUT_SIZE = 10
+# Work bounds per goal; a result that hit either is flagged incomplete
+MAX_CUTS = 1000
+MAX_EXPANSIONS = 20_000
+CUT_CACHE_SIZE = 64
+
+_INF = float("inf")
+
+_cuts: "OrderedDict[Tuple, Tuple]" = OrderedDict()
+_cuts_lock = threading.Lock()
+
+
+class _Net:
+    """Foothold -> goal subgraph of one goal, in local indices."""
+
+    def __init__(self, plan: CompiledGraph, goal: int):
+        children: List[List[int]] = [[] for _ in range(plan.n)]
+        for j in range(plan.n):
+            if not plan.foothold[j]:
+                for p in set(plan.parents_of(j).tolist()):
+                    children[p].append(j)
+        starts = np.flatnonzero(plan.foothold).tolist()
+        forward = _closure(starts, children)
+        backward = _closure([goal], [list(set(plan.parents_of(j).tolist())) for j in range(plan.n)])
+        cols = sorted(forward & backward)
+        self.cols = cols
+        self.local = {c: i for i, c in enumerate(cols)}
+        self.children = [[self.local[c] for c in children[col] if c in self.local] for col in cols]
+        self.starts = [self.local[c] for c in starts if c in self.local]
+        self.goal = self.local.get(goal, -1)
+        self._network()
+
+    def _network(self) -> None:
+        """Node-split arcs, built once: node i is 2i (in) -> 2i + 1 (out), the source is 2m."""
+        m = len(self.cols)
+        self.source = 2 * m
+        self.head: List[List[int]] = [[] for _ in range(2 * m + 1)]
+        self.to: List[int] = []
+        self.cap: List[float] = []
+
+        def arc(a: int, b: int, c: float) -> int:
+            self.head[a].append(len(self.to))
+            self.to += (b, a)
+            self.cap += (c, 0.0)
+            self.head[b].append(len(self.to) - 1)
+            return len(self.to) - 2
+
+        # Arcs come in (forward, reverse) pairs, so e ^ 1 is the partner of e
+        self.node_arc = [arc(2 * i, 2 * i + 1, _INF if i == self.goal else 1.0) for i in range(m)]
+        for i in range(m):
+            for v in self.children[i]:
+                arc(2 * i + 1, 2 * v, _INF)
+        for s in self.starts:
+            arc(self.source, 2 * s, _INF)
+
+    def path(self, removed: Set[int]) -> List[int] | None:
+        """Nodes of a shortest foothold -> goal path avoiding `removed`, or None."""
+        prev = {s: -1 for s in self.starts if s not in removed}
+        queue = deque(prev)
+        while queue:
+            u = queue.popleft()
+            if u == self.goal:
+                out = []
+                while u >= 0:
+                    out.append(u)
+                    u = prev[u]
+                return out[::-1]
+            for v in self.children[u]:
+                if v not in prev and v not in removed:
+                    prev[v] = u
+                    queue.append(v)
+        return None
+
+    def flow(self, removed: Set[int], forbidden: Set[int], bound: int) -> Tuple[int, List[float]]:
+        """
+        Max-flow of the node-split network, i.e. the fewest further nodes
+        whose removal cuts the goal off, and the residual capacities;
+        counting stops above `bound`.
+        """
+        head, to, source, sink = self.head, self.to, self.source, 2 * self.goal
+        cap = self.cap.copy()
+        for i in removed:
+            cap[self.node_arc[i]] = 0.0
+        for i in forbidden:
+            cap[self.node_arc[i]] = _INF
+
+        total = 0
+        while total <= bound:
+            prev = {source: -1}
+            queue = deque([source])
+            while queue and sink not in prev:
+                a = queue.popleft()
+                for e in head[a]:
+                    if cap[e] > 0 and to[e] not in prev:
+                        prev[to[e]] = e
+                        queue.append(to[e])
+            if sink not in prev:
+                break
+            # Unit or unbounded arcs only: the bottleneck is 1 unless the whole path is uncuttable
+            path = []
+            b = sink
+            while b != source:
+                path.append(prev[b])
+                b = to[prev[b] ^ 1]
+            push = min(cap[e] for e in path)
+            if push == _INF:
+                return bound + 1, cap
+            for e in path:
+                cap[e] -= push
+                cap[e ^ 1] += push
+            total += 1
+        return total, cap
+
+    def min_cut_nodes(self, cap: List[float]) -> Set[int]:
+        """
+        Nodes in some minimum cut, from the residual capacities of a max-flow:
+        a saturated node arc is in one iff its ends are in different strongly
+        connected components of the residual graph (Tarjan, iterative).
+        """
+        head, to = self.head, self.to
+        n = len(head)
+        index = [-1] * n
+        low = [0] * n
+        comp = [-1] * n
+        stack: List[int] = []
+        counter = 0
+        for root in range(n):
+            if index[root] >= 0:
+                continue
+            work = [(root, 0)]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            while work:
+                a, i = work[-1]
+                arcs = head[a]
+                while i < len(arcs) and (cap[arcs[i]] <= 0 or index[to[arcs[i]]] >= 0):
+                    b = to[arcs[i]]
+                    if cap[arcs[i]] > 0 and comp[b] < 0:
+                        low[a] = min(low[a], index[b])
+                    i += 1
+                if i < len(arcs):
+                    work[-1] = (a, i + 1)
+                    b = to[arcs[i]]
+                    index[b] = low[b] = counter
+                    counter += 1
+                    stack.append(b)
+                    work.append((b, 0))
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[a])
+                if low[a] == index[a]:
+                    while True:
+                        b = stack.pop()
+                        comp[b] = a
+                        if b == a:
+                            break
+        return {
+            i for i, e in enumerate(self.node_arc)
+            if cap[e] == 0 and self.cap[e] == 1.0 and comp[2 * i] != comp[2 * i + 1]
+        }
+
+
+def _closure(seeds: Sequence[int], adjacency: List[List[int]]) -> Set[int]:
+    seen = set(seeds)
+    stack = list(seeds)
+    while stack:
+        for v in adjacency[stack.pop()]:
+            if v not in seen:
+                seen.add(v)
+                stack.append(v)
+    return seen
+
+
+def _enumerate(net: _Net, max_size: int) -> Tuple[List[FrozenSet[int]], bool]:
+    """Minimal cuts of at most max_size nodes (local indices), and whether the search finished."""
+    cuts: List[FrozenSet[int]] = []
+    state = {"expansions": 0, "complete": True}
+
+    def minimal(cut: FrozenSet[int]) -> bool:
+        return all(net.path(set(cut - {v})) is not None for v in cut)
+
+    def visit(cut: FrozenSet[int], forbidden: Set[int]) -> None:
+        if len(cuts) >= MAX_CUTS or state["expansions"] >= MAX_EXPANSIONS:
+            state["complete"] = False
+            return
+        state["expansions"] += 1
+        path = net.path(set(cut))
+        if path is None:
+            if minimal(cut):
+                cuts.append(cut)
+            return
+        if len(cut) >= max_size:
+            return
+        need, cap = net.flow(set(cut), forbidden, max_size - len(cut))
+        if len(cut) + need > max_size:
+            return
+        # With no slack left every completion is a minimum cut of what remains
+        allowed = net.min_cut_nodes(cap) if len(cut) + need == max_size else None
+        forbidden = set(forbidden)
+        for v in path:
+            if v in forbidden or v == net.goal:
+                continue
+            if allowed is None or v in allowed:
+                visit(cut | {v}, forbidden)
+            forbidden.add(v)
+
+    visit(frozenset(), set())
+    return cuts, state["complete"]
+
+
+def goal_cuts(plan: CompiledGraph, goal: int, max_size: int | None) -> Tuple[int | None, List[Tuple[int, ...]], bool, int]:
+    """
+    (minimum cut size, minimal cuts as plan columns, complete, max_size used)
+    for one goal column; minimum None when no cut exists (the goal is a
+    foothold) and 0 when the goal is already unreachable.
+    Raises ValueError when max_size is below the minimum cut size.
+    """
+    key = (plan.structure_digest, goal, max_size)
+    with _cuts_lock:
+        hit = _cuts.get(key)
+        if hit is not None:
+            _cuts.move_to_end(key)
+            return hit
+
+    net = _Net(plan, goal)
+    if net.goal < 0:
+        out = (0, [], True, 0)
+    elif net.goal in net.starts:
+        out = (None, [], True, 0)
+    else:
+        min_size, _ = net.flow(set(), set(), len(net.cols))
+        if max_size is not None and max_size < min_size:
+            raise ValueError(
+                f"max_size {max_size} is below the minimum cut size {min_size} of goal '{plan.ids[goal]}'."
+            )
+        used = min(min_size + 1 if max_size is None else max_size, MAX_CUT_SIZE)
+        cuts, complete = _enumerate(net, used) if min_size <= used else ([], False)
+        out = (min_size, [tuple(sorted(net.cols[i] for i in cut)) for cut in cuts], complete, used)
+    with _cuts_lock:
+        _cuts[key] = out
+        while len(_cuts) > CUT_CACHE_SIZE:
+            _cuts.popitem(last=False)
+    return out
+
+
+def min_cut_sets(
+    plan: CompiledGraph, goals: Sequence[str] | None = None, max_size: int | None = None, limit: int = DEFAULT_LIMIT
+) -> Dict:
+    """
+    Per goal (all goals by default), the `limit` minimal cut sets of at most
+    max_size nodes (default: the minimum size + 1) that intercept the most
+    reach. Raises ValueError on an unknown goal, bad limits or a max_size
+    below a goal's minimum cut size.
+    """
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_LIMIT}.")
+    if max_size is not None and not 1 <= max_size <= MAX_CUT_SIZE:
+        raise ValueError(f"max_size must be between 1 and {MAX_CUT_SIZE}.")
+    goals = list(plan.goal_ids) if goals is None else list(dict.fromkeys(goals))
+    unknown = [g for g in goals if g not in plan.index]
+    if unknown:
+        raise ValueError(f"Unknown goal node: {unknown[0]}")
+
+    p = np.clip(_point_values(plan, "mean"), 0.0, 1.0)
+    if plan.threat is not None:
+        p = plan.threat.combine(p[None, :], None, *plan.threat.means())[0]
+    reach = reach_values(plan, p)
+
+    out = {}
+    for g in goals:
+        min_size, cuts, complete, used = goal_cuts(plan, plan.index[g], max_size)
+        ranked = sorted(
+            ((1.0 - float(np.prod(1.0 - reach[list(cut)])), cut) for cut in cuts),
+            key=lambda t: (-t[0], len(t[1]), t[1]),
+        )
+        out[g] = {
+            "goal_reach": float(reach[plan.index[g]]),
+            "min_size": min_size,
+            "max_size": used,
+            "found": len(cuts),
+            "complete": complete,
+            "cuts": [
+                {"nodes": [plan.ids[c] for c in cut], "size": len(cut), "mass": mass}
+                for mass, cut in ranked[:limit]
+            ],
+        }
+    return {"limit": limit, "goals": out}
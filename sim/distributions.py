@@ -0,0 +1,279 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Dict, Iterable, Tuple
+import numpy as np
+from scipy.special import betaincinv, ndtr, ndtri
+
+"""
+Shared, vectorized sampler for {"dist": ...} specs.
+
+Specs are parsed and validated once into a Distributions table: one family
+code per column and packed parameters (lo, mode, hi, a, b). Draws are
+inverse-CDF transforms of uniforms, applied to whole (rows, k) blocks per
+family, so the engines keep their one-uniform-per-node-per-trial streams
+(common random numbers, incremental re-runs and rank correlations all rely
+on that) whatever the family.
+
+  TRIANGULAR  min, mode, max
+  PERT        min, mode, max (Beta with lambda = 4)
+  BETA        alpha, beta, optionally rescaled to [min, max]
+  LOGNORMAL   mu, sigma
+  FIXED       value
+
+Beta quantiles have no closed form, so PERT and BETA columns read a table of
+quantiles at TABLE_POINTS steps of the normal score ndtri(u), which keeps the
+tails resolved; linear interpolation in it is within ~1e-5 of the exact
+quantile on the unit interval. PERT is a one-parameter family in the mode's
+relative position, so all PERT columns share one table whose rows are
+built on first use.
+"""
+
+FAMILIES = ("TRIANGULAR", "PERT", "BETA", "LOGNORMAL", "FIXED")
+TRIANGULAR, PERT, BETA, LOGNORMAL, FIXED = range(len(FAMILIES))
+
+TABLE_POINTS = 1024
+# Normal scores beyond this are clipped (|u - 0.5| within ~1e-16 of 0.5)
+Z_MAX = 8.3
+# Steps of the PERT mode position in the shared table
+PERT_STEPS = 256
+
+_Z_GRID = np.linspace(-Z_MAX, Z_MAX, TABLE_POINTS + 1)
+
+
+def _number(spec: Dict, keys: Tuple[str, ...], default: float | None) -> float:
+    for key in keys:
+        if key in spec:
+            try:
+                value = float(spec[key])
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} must be a number.")
+            if not np.isfinite(value):
+                raise ValueError(f"{key} must be finite.")
+            return value
+    if default is None:
+        raise ValueError(f"{keys[0]} is required.")
+    return default
+
+
+def _bounded(spec: Dict, max_default: float | None) -> Tuple[float, float, float]:
+    """(min, mode, max), ordered and with the mode clamped into range."""
+    mn = _number(spec, ("min",), 0.0)
+    md = _number(spec, ("mode", "ml"), mn)
+    mx = _number(spec, ("max",), max(md, mn) if max_default is None else max_default)
+    if mx < mn:
+        mn, mx = mx, mn
+    return mn, min(max(md, mn), mx), mx
+
+
+def compile_spec(
+    spec: Dict | None, default: str = "TRIANGULAR", max_default: float | None = None
+) -> Tuple[int, Tuple[float, float, float, float, float]]:
+    """
+    (family, (lo, mode, hi, a, b)) of one spec; a and b are the Beta shapes
+    for PERT / BETA and (mu, sigma) for LOGNORMAL. An empty spec is FIXED 0.
+    `max_default` fills a missing max (draw_p uses 1.0; FAIR specs default to
+    max(mode, min)). Raises ValueError on an unknown family or bad parameters.
+    """
+    if not spec:
+        return FIXED, (0.0, 0.0, 0.0, 0.0, 0.0)
+    dist = str(spec.get("dist", default)).upper()
+
+    if dist == "FIXED":
+        v = _number(spec, ("value", "mode", "ml"), 0.0)
+        return FIXED, (v, v, v, 0.0, 0.0)
+
+    if dist == "TRIANGULAR":
+        mn, md, mx = _bounded(spec, max_default)
+        return TRIANGULAR, (mn, md, mx, 0.0, 0.0)
+
+    if dist == "PERT":
+        mn, md, mx = _bounded(spec, max_default)
+        c = (md - mn) / (mx - mn) if mx > mn else 0.5
+        return PERT, (mn, md, mx, 1.0 + 4.0 * c, 1.0 + 4.0 * (1.0 - c))
+
+    if dist == "BETA":
+        a = _number(spec, ("alpha", "a"), None)
+        b = _number(spec, ("beta", "b"), None)
+        if a <= 0 or b <= 0:
+            raise ValueError("BETA needs alpha > 0 and beta > 0.")
+        lo = _number(spec, ("min",), 0.0)
+        hi = _number(spec, ("max",), 1.0)
+        if hi < lo:
+            lo, hi = hi, lo
+        if a > 1 and b > 1:
+            m = (a - 1.0) / (a + b - 2.0)
+        else:
+            m = 0.0 if a < b else 1.0 if a > b else 0.5
+        return BETA, (lo, lo + m * (hi - lo), hi, a, b)
+
+    if dist == "LOGNORMAL":
+        mu = _number(spec, ("mu",), 0.0)
+        sigma = _number(spec, ("sigma",), 1.0)
+        if sigma < 0:
+            raise ValueError("LOGNORMAL needs sigma >= 0.")
+        return LOGNORMAL, (0.0, float(np.exp(mu - sigma * sigma)), np.inf, mu, sigma)
+
+    raise ValueError(f"Unsupported dist: {dist}")
+
+
+@lru_cache(maxsize=PERT_STEPS + 1)
+def _pert_row(k: int) -> np.ndarray:
+    """Unit PERT quantiles with the mode at k / PERT_STEPS; built per row, as few modes are used."""
+    c = np.linspace(0.0, 1.0, PERT_STEPS + 1)[k]
+    return betaincinv(1.0 + 4.0 * c, 1.0 + 4.0 * (1.0 - c), ndtr(_Z_GRID))
+
+
+@lru_cache(maxsize=256)
+def _beta_row(a: float, b: float) -> np.ndarray:
+    return betaincinv(a, b, ndtr(_Z_GRID))
+
+
+def _quantile_rows(family: np.ndarray, params: np.ndarray, cols: np.ndarray) -> np.ndarray:
+    """Unit-interval quantile tables of PERT / BETA `cols`."""
+    rows = np.empty((cols.size, TABLE_POINTS + 1), dtype=float)
+    for i, j in enumerate(cols.tolist()):
+        lo, md, hi, a, b = params[j]
+        if family[j] == PERT:
+            pos = ((md - lo) / (hi - lo) if hi > lo else 0.5) * PERT_STEPS
+            k = min(int(pos), PERT_STEPS - 1)
+            t = pos - k
+            rows[i] = (1.0 - t) * _pert_row(k) + t * _pert_row(k + 1)
+        else:
+            rows[i] = _beta_row(float(a), float(b))
+    return rows
+
+
+def _normal_scores(u: np.ndarray) -> np.ndarray:
+    z = ndtri(u)
+    # minimum/maximum rather than np.clip, whose wrapper costs more than the work here
+    np.maximum(z, -Z_MAX, out=z)
+    return np.minimum(z, Z_MAX, out=z)
+
+
+def _triangular(u: np.ndarray, lo: np.ndarray, md: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    width = hi - lo
+    c = (md - lo) / np.where(width > 0, width, 1.0)
+    left = u * (width * (md - lo))
+    np.sqrt(left, out=left)
+    left += lo
+    right = 1.0 - u
+    right *= width * (hi - md)
+    np.sqrt(right, out=right)
+    np.subtract(hi, right, out=right)
+    np.copyto(left, right, where=u >= c)
+    return left
+
+
+def _tabulated(u: np.ndarray, steps: np.ndarray, rows: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """Interpolate table `rows` of the flat Distributions.steps at the normal scores of u."""
+    pos = _normal_scores(u)
+    pos += Z_MAX
+    pos *= TABLE_POINTS / (2.0 * Z_MAX)
+    i = pos.astype(np.intp)
+    np.minimum(i, TABLE_POINTS - 1, out=i)
+    pos -= i
+    i += rows[None, :] * TABLE_POINTS
+    cell = steps.take(i)
+    x = cell.imag * pos
+    x += cell.real
+    x *= hi - lo
+    x += lo
+    return x
+
+
+@dataclass(frozen=True)
+class Distributions:
+    family: np.ndarray   # (n,) index into FAMILIES
+    params: np.ndarray   # (n, 5) packed (lo, mode, hi, a, b), see compile_spec
+    tables: np.ndarray   # quantile tables of the PERT / BETA columns
+    table_row: np.ndarray  # (n,) row in `tables`, -1 for other families
+
+    @classmethod
+    def from_arrays(cls, family: np.ndarray, params: np.ndarray) -> "Distributions":
+        tabulated = np.flatnonzero((family == PERT) | (family == BETA))
+        table_row = np.full(family.size, -1, dtype=np.intp)
+        table_row[tabulated] = np.arange(tabulated.size)
+        return cls(family, params, _quantile_rows(family, params, tabulated), table_row)
+
+    @cached_property
+    def steps(self) -> np.ndarray:
+        """
+        `tables` flattened as quantile + 1j * (next quantile - quantile), one
+        entry per interval, so interpolating a draw takes a single gather.
+        """
+        steps = np.empty((self.tables.shape[0], TABLE_POINTS), dtype=complex)
+        steps.real = self.tables[:, :-1]
+        steps.imag = np.diff(self.tables, axis=1)
+        return steps.ravel()
+
+    @property
+    def n(self) -> int:
+        return self.family.size
+
+    @cached_property
+    def groups(self) -> Tuple[Tuple[int, np.ndarray], ...]:
+        """(family, columns) for every family present."""
+        return tuple((int(f), np.flatnonzero(self.family == f)) for f in np.unique(self.family))
+
+    def sample(self, u: np.ndarray, cols: np.ndarray | None = None) -> np.ndarray:
+        """
+        Inverse-CDF transform of a (rows, k) uniform block, one column per
+        distribution (all of them, or `cols`). Not clipped.
+        """
+        if cols is None:
+            groups = [(f, c, c) for f, c in self.groups]
+        else:
+            fam = self.family[cols]
+            groups = []
+            for f in np.unique(fam):
+                local = np.flatnonzero(fam == f)
+                groups.append((int(f), local, cols[local]))
+
+        out = np.empty(u.shape, dtype=float, order="F")
+        for f, local, glob in groups:
+            lo, md, hi, a, b = self.params[glob].T
+            block = u[:, local]
+            if f == TRIANGULAR:
+                out[:, local] = _triangular(block, lo, md, hi)
+            elif f in (PERT, BETA):
+                out[:, local] = _tabulated(block, self.steps, self.table_row[glob], lo, hi)
+            elif f == LOGNORMAL:
+                out[:, local] = np.exp(a + b * _normal_scores(block))
+            else:
+                out[:, local] = lo
+        return out
+
+    def means(self) -> np.ndarray:
+        lo, md, hi, a, b = self.params.T
+        mean = np.where(self.family == PERT, (lo + 4.0 * md + hi) / 6.0, (lo + md + hi) / 3.0)
+        beta = lo + (hi - lo) * a / np.where(a + b > 0, a + b, 1.0)
+        mean = np.where(self.family == BETA, beta, mean)
+        mean = np.where(self.family == LOGNORMAL, np.exp(a + 0.5 * b * b), mean)
+        return np.where(self.family == FIXED, lo, mean)
+
+    def modes(self) -> np.ndarray:
+        return self.params[:, 1].copy()
+
+    def varying(self) -> np.ndarray:
+        """Columns whose draws are not constant."""
+        spread = np.where(self.family == LOGNORMAL, self.params[:, 4] > 0, self.params[:, 2] > self.params[:, 0])
+        return spread & (self.family != FIXED)
+
+    def changed(self, other: "Distributions") -> np.ndarray:
+        """Columns whose distribution differs from `other` (same length)."""
+        return (self.family != other.family) | np.any(self.params != other.params, axis=1)
+
+
+def compile_specs(
+    specs: Iterable[Dict | None], default: str = "TRIANGULAR", max_default: float | None = None
+) -> Distributions:
+    """Distributions for a sequence of specs; see compile_spec."""
+    family, params = [], []
+    for spec in specs:
+        f, p = compile_spec(spec, default, max_default)
+        family.append(f)
+        params.append(p)
+    return Distributions.from_arrays(
+        np.array(family, dtype=np.int8), np.array(params, dtype=float).reshape(len(params), 5)
+    )
@@ -1,4 +1,5 @@
 import numpy as np
+from .distributions import compile_specs
 
 """
 NOTE: 
@@ -8,85 +9,103 @@ It is not part of the core contribution of this project.
 It remains included for completeness and future extension, but is considered supplementary and is not essential
 to the attack graph engine
 """
+FAIR_SPECS = ("tef_spec", "vuln_spec", "plm_spec", "slef_spec", "slm_spec")
+
+
+def _summary(ale):
+    if ale.size == 0:
+        return {"mean": 0.0, "p10": 0.0, "p50": 0.0, "p90": 0.0}
+    p10, p50, p90 = np.percentile(ale, [10, 50, 90])
+    return {"mean": float(ale.mean()), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+
+def _scenario_ale(specs, trials, rng, vuln=None):
+    """
+    Per-trial ALE of one scenario. The specs are compiled once and drawn as a
+    single (trials, k) block from `rng`; ALE = TEF * Vuln * (PLM + SLEF * SLM)
+    is then formed in place in the TEF column. Given `vuln` (one value per
+    trial), it replaces vuln_spec and is paired with the draws trial by trial.
+    """
+    names = FAIR_SPECS if vuln is None else tuple(k for k in FAIR_SPECS if k != "vuln_spec")
+    dists = compile_specs([specs[k] for k in names], default="PERT")
+    # One contiguous row per spec so the in-place products stream through memory
+    rows = np.ascontiguousarray(dists.sample(rng.random((trials, len(names)))).T)
+    if vuln is None:
+        tef, vuln, plm, slef, slm = rows
+        np.clip(vuln, 0.0, 1.0, out=vuln)
+    else:
+        tef, plm, slef, slm = rows
+        vuln = np.clip(vuln, 0.0, 1.0)
+    slef *= slm
+    slef += plm
+    tef *= vuln
+    tef *= slef
+    return tef
+
+
 def simulate_scenario_mc(
     *,
     tef_spec, vuln_spec, plm_spec, slef_spec, slm_spec,
     trials=20000, seed=None
 ):
-    """Run Monte Carlo for a FAIR scenario using triangular/PERT sampling."""
-    rng = np.random.default_rng(seed)
-
-    tef = _sample_spec(tef_spec, trials)
-    vuln = np.clip(_sample_spec(vuln_spec, trials), 0.0, 1.0)
-    plm = _sample_spec(plm_spec, trials)
-    slef = _sample_spec(slef_spec, trials)
-    slm = _sample_spec(slm_spec, trials)
-
-    lef = tef * vuln
-    lm = plm + slef * slm
-    ale = lef * lm
-
-    summary = {
-        "mean": float(np.mean(ale)),
-        "p10": float(np.percentile(ale, 10)),
-        "p50": float(np.percentile(ale, 50)),
-        "p90": float(np.percentile(ale, 90)),
-    }
-    return summary
+    """Run Monte Carlo for a FAIR scenario; every spec draws from one Generator seeded with `seed`."""
+    specs = dict(tef_spec=tef_spec, vuln_spec=vuln_spec, plm_spec=plm_spec, slef_spec=slef_spec, slm_spec=slm_spec)
+    return _summary(_scenario_ale(specs, trials, np.random.default_rng(seed)))
 
-def _sample_spec(spec, n, rng=None):
+
+def simulate_graph_scenario_mc(
+    vuln_samples,
+    *,
+    tef_spec, plm_spec, slef_spec, slm_spec,
+    seed=None
+):
+    """
+    FAIR Monte Carlo with Vulnerability taken from an attack graph run: trial t
+    uses vuln_samples[t] (e.g. sim.incremental.success_samples) with the t-th
+    TEF and loss draws, so the graph's full distribution reaches the ALE
+    without being fitted to a vuln spec first.
+    Returns {"ale": summary, "vulnerability": summary of vuln_samples}.
+    """
+    vuln = np.asarray(vuln_samples, dtype=float)
+    specs = dict(tef_spec=tef_spec, plm_spec=plm_spec, slef_spec=slef_spec, slm_spec=slm_spec)
+    ale = _scenario_ale(specs, vuln.size, np.random.default_rng(seed), vuln=vuln)
+    return {"ale": _summary(ale), "vulnerability": _summary(vuln)}
+
+
+def simulate_portfolio_mc(scenarios, trials=20000, seed=None):
     """
-    Sample an array of size n from the given spec dict.
-    Supports: PERT, TRIANGULAR, LOGNORMAL, FIXED
+    Run several scenarios (dicts of the five *_spec keys) and their total.
+    Scenario i draws from child stream i of `seed`, so a seeded run is
+    reproducible for the same list; the portfolio ALE is the per-trial sum,
+    treating the scenarios as independent.
+    Returns {"scenarios": [summary, ...], "portfolio": summary}.
     """
-    import numpy as np
+    total = np.zeros(trials, dtype=float)
+    out = []
+    for specs, stream in zip(scenarios, np.random.SeedSequence(seed).spawn(len(scenarios))):
+        ale = _scenario_ale(specs, trials, np.random.default_rng(stream))
+        out.append(_summary(ale))
+        total += ale
+    return {"scenarios": out, "portfolio": _summary(total)}
 
+
+def _sample_spec(spec, n, rng=None):
+    """
+    Sample an array of size n from the given spec dict (PERT when "dist" is
+    missing) with the shared sampler in sim.distributions.
+    Supports: PERT, TRIANGULAR, BETA, LOGNORMAL, FIXED
+    """
     if rng is None:
         rng = np.random.default_rng()
 
-    dist = str(spec.get("dist", "PERT")).upper()
-
-    # --- FIXED ---
-    if dist == "FIXED":
-        v = float(spec.get("value", spec.get("mode", spec.get("ml", 0.0))))
-        return np.full(n, v, dtype=float)
-
-    # --- LOGNORMAL ---
-    if dist == "LOGNORMAL":
-        mu = float(spec.get("mu", 0.0))
-        sigma = float(spec.get("sigma", 1.0))
-        return rng.lognormal(mean=mu, sigma=max(sigma, 1e-9), size=n)
-
-    # --- PERT ---
-    if dist == "PERT":
-        mn = float(spec.get("min", 0.0))
-        md = float(spec.get("mode", spec.get("ml", mn)))
-        mx = float(spec.get("max", max(md, mn)))
-        if mx == mn:
-            return np.full(n, mn)
-        width = max(mx - mn, 1e-9)
-        a = 1.0 + 4.0 * (md - mn) / width
-        b = 1.0 + 4.0 * (mx - md) / width
-        x = rng.beta(a, b, size=n)
-        return mn + x * (mx - mn)
-
-    # --- TRIANGULAR ---
-    if dist == "TRIANGULAR":
-        mn = float(spec.get("min", 0.0))
-        md = float(spec.get("mode", spec.get("ml", mn)))
-        mx = float(spec.get("max", max(md, mn)))
-        if mx == mn:
-            return np.full(n, mn)
-        # NumPy triangular order: (left, mode, right)
-        return rng.triangular(mn, md, mx, size=n)
-
-    raise ValueError(f"Unsupported dist: {dist}")
-
-def fair_simulate(cf_samples, vuln_samples, loss_spec, n=None):
+    dist = compile_specs([spec], default="PERT")
+    return dist.sample(rng.random((n, 1)))[:, 0]
+
+def fair_simulate(cf_samples, vuln_samples, loss_spec, n=None, seed=None):
     if n is None: n = min(len(cf_samples), len(vuln_samples))
     cf = np.array(cf_samples[:n], float)
     vuln = np.clip(np.array(vuln_samples[:n], float), 0, 1)
-    slm = _sample_spec(loss_spec, n)
+    slm = _sample_spec(loss_spec, n, np.random.default_rng(seed))
     loss = cf * vuln * slm
     loss.sort()
     q = lambda p: float(loss[int(p*(len(loss)-1))])
@@ -0,0 +1,190 @@
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Tuple
+import numpy as np
+from django.conf import settings
+from .compiled import CompiledGraph
+from .simulate import (
+    CHUNK_TRIALS, _any_goal, _chunk_streams, _chunk_uniforms, _propagate, _propagate_chunk, _propagate_dirty,
+    _result, _sample_p, _uniform_width, simulate_plan,
+)
+from .sketch import ReachStats, exact_columns, DEFAULT_EXACT
+
+"""
+Incremental re-simulation for what-if editing.
+
+The vectorized engine is re-run with the uniforms and reach matrix of the
+last run of a graph kept in memory. When a later request only changes some
+nodes' p_succ, the changed columns are re-transformed from the same
+uniforms and only their topological descendants are re-propagated. Chunk k
+uses the same stream as a fresh run, so the output is bit-for-bit what
+simulate_plan would return for the new parameters. The same retained runs
+supply the per-trial any-goal samples that scenario simulation pairs with
+its FAIR loss draws (success_samples).
+"""
+
+# Largest trials * nodes retained per run (two float64 matrices of this size);
+# larger runs are streamed by the vectorized engine and not retained
+MAX_CELLS = 20_000_000
+# Memory for retained runs across graphs; override with settings.SIM_INCREMENTAL_MAX_BYTES
+DEFAULT_MAX_BYTES = 512 << 20
+
+
+@dataclass
+class RunState:
+    plan: CompiledGraph
+    seed: int
+    trials: int
+    u: np.ndarray          # (trials, _uniform_width) uniforms
+    reach: np.ndarray      # (trials, n + 1) reach, last column the zero sentinel
+    any_goal: np.ndarray   # (trials,)
+    exact: str
+    stats: ReachStats
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.u, self.reach, self.any_goal, self.stats.samples, self.stats.counts))
+
+
+_states: "OrderedDict[Tuple[str, int, int], RunState]" = OrderedDict()
+_states_lock = threading.Lock()
+
+
+def dirty_columns(plan: CompiledGraph, changed: np.ndarray) -> np.ndarray:
+    """Mask of changed columns plus all of their descendants."""
+    dirty = np.zeros(plan.n + 1, dtype=bool)  # column n: sentinel, never dirty
+    dirty[:plan.n] = changed
+    for block in plan.blocks:
+        if block.inner.size:
+            dirty[block.inner] |= dirty[block.gather].any(axis=1)
+        g = block.gated
+        if g is not None:
+            dirty[g.cols] |= dirty[g.gather].any(axis=1) | dirty[g.required].any(axis=1)
+    return dirty[:plan.n]
+
+
+def _new_stats(plan: CompiledGraph, trials: int, exact: str) -> ReachStats:
+    return ReachStats(plan.n, trials, exact_columns(exact, plan.n, plan.goal_cols))
+
+
+def _full_run(plan: CompiledGraph, trials: int, seed: int, exact: str, progress) -> RunState:
+    # Column-major like the engine's chunks, so column sums (and results) are bit-identical
+    u = np.empty((trials, _uniform_width(plan)), dtype=float, order="F")
+    reach = np.zeros((trials, plan.n + 1), dtype=float, order="F")
+    stats = _new_stats(plan, trials, exact)
+    for k, stream in enumerate(_chunk_streams(seed, trials)):
+        start = k * CHUNK_TRIALS
+        stop = min(start + CHUNK_TRIALS, trials)
+        u[start:stop] = _chunk_uniforms(plan, stream, stop - start)
+        _propagate(plan, _sample_p(plan, u[start:stop]), out=reach[start:stop])
+        stats.update(start, reach[start:stop, :plan.n])
+        if progress is not None:
+            progress(stop / trials)
+    return RunState(plan, seed, trials, u, reach, _any_goal(plan, reach), exact, stats)
+
+
+def _update_run(state: RunState, plan: CompiledGraph) -> np.ndarray:
+    """Re-propagate the columns affected by parameter changes in place; returns the dirty mask."""
+    changed = plan.dists.changed(state.plan.dists)
+    dirty = dirty_columns(plan, changed)
+    if not dirty.any():
+        return dirty
+
+    cols = np.flatnonzero(dirty)
+    # Only dirty columns are ever read; zeros is a lazy allocation
+    p = np.zeros((state.trials, plan.n), dtype=float)
+    p[:, cols] = _sample_p(plan, state.u, cols)
+    reach = state.reach
+    for start in range(0, state.trials, CHUNK_TRIALS):
+        sl = slice(start, start + CHUNK_TRIALS)
+        _propagate_dirty(plan, reach[sl], p[sl], dirty)
+    state.any_goal = _any_goal(plan, reach)
+    state.stats.refresh(cols, reach, CHUNK_TRIALS)
+    state.plan = plan
+    return dirty
+
+
+def simulate_incremental(
+    graph_key: str,
+    plan: CompiledGraph,
+    trials: int,
+    seed: int,
+    exact: str = DEFAULT_EXACT,
+    progress: Callable[[float], None] | None = None,
+) -> Dict:
+    """
+    simulate_plan(engine="vectorized") for a seeded run, reusing the retained
+    run of `graph_key` when only node parameters changed since. Runs over
+    MAX_CELLS are streamed instead and not retained. The response carries
+    "incremental": {"reused", "recomputed_nodes"}.
+    """
+    key = (graph_key, seed, trials)
+    if trials * plan.n > MAX_CELLS:
+        with _states_lock:
+            _states.pop(key, None)
+        result = simulate_plan(plan, trials=trials, seed=seed, progress=progress, exact=exact)
+        result["incremental"] = {"reused": False, "recomputed_nodes": plan.n}
+        return result
+
+    state, reused, recomputed = _checkout(key, plan, exact, progress)
+    if reused and state.exact != exact:
+        state.exact = exact
+        state.stats = _new_stats(plan, trials, exact)
+        for start in range(0, trials, CHUNK_TRIALS):
+            state.stats.update(start, state.reach[start:start + CHUNK_TRIALS, :plan.n])
+
+    result = _result(plan, trials, state.any_goal, state.stats)
+    result["incremental"] = {"reused": reused, "recomputed_nodes": recomputed}
+    _retain(key, state)
+    return result
+
+
+def success_samples(
+    graph_key: str, plan: CompiledGraph, trials: int, seed: int | None
+) -> Tuple[np.ndarray, bool]:
+    """
+    Per-trial any-goal probabilities of the vectorized engine (the samples
+    behind success_distribution) and whether a retained run was reused.
+    Seeded runs up to MAX_CELLS share the retained state of
+    simulate_incremental, so a graph simulated with the same seed and trials
+    is not sampled again; larger ones are streamed.
+    """
+    key = (graph_key, seed, trials)
+    if seed is None or trials * plan.n > MAX_CELLS:
+        # Nothing to retain: only any-goal is kept, chunk by chunk
+        with _states_lock:
+            _states.pop(key, None)
+        any_goal = np.empty(trials, dtype=float)
+        for k, stream in enumerate(_chunk_streams(seed, trials)):
+            start = k * CHUNK_TRIALS
+            stop = min(start + CHUNK_TRIALS, trials)
+            _, any_goal[start:stop] = _propagate_chunk(plan, stream, stop - start)
+        return any_goal, False
+
+    state, reused, _ = _checkout(key, plan, DEFAULT_EXACT, None)
+    _retain(key, state)
+    return state.any_goal, reused
+
+
+def _checkout(key: Tuple[str, int, int], plan: CompiledGraph, exact: str, progress) -> Tuple[RunState, bool, int]:
+    """The retained run for `key` brought up to date with `plan`, or a fresh one; (state, reused, recomputed nodes)."""
+    with _states_lock:
+        state = _states.pop(key, None)
+    if state is not None and state.plan.structure_digest == plan.structure_digest:
+        return state, True, int(_update_run(state, plan).sum())
+    _, seed, trials = key
+    return _full_run(plan, trials, seed, exact, progress), False, plan.n
+
+
+def _retain(key: Tuple[str, int, int], state: RunState) -> None:
+    limit = getattr(settings, "SIM_INCREMENTAL_MAX_BYTES", DEFAULT_MAX_BYTES)
+    if state.nbytes > limit:
+        return
+    with _states_lock:
+        _states[key] = state
+        total = sum(s.nbytes for s in _states.values())
+        while total > limit:
+            _, dropped = _states.popitem(last=False)
+            total -= dropped.nbytes
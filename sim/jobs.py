@@ -0,0 +1,177 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from sim.models import AttackGraph, SimulationJob
+from .compiled import graph_plan, graph_revision
+from .optimize import control_costs, optimize_controls
+from .results import simulate_and_store
+from .simulate import DEFAULT_ENGINE, shutdown_pool
+from .sketch import DEFAULT_EXACT
+
+"""
+Database-backed queue for simulate requests.
+
+The API enqueues a SimulationJob row and returns immediately; worker
+processes started by `manage.py simworker` claim queued rows, run the
+simulation and write the outcome to AttackGraphResult. No broker needed.
+Control optimization jobs (kind "optimize") go through the same queue and
+keep their response in SimulationJob.output.
+
+A running job's worker refreshes heartbeat_at with every progress write. A
+job whose heartbeat is older than settings.SIM_JOB_TIMEOUT (its worker was
+killed) is requeued for another worker, or failed once it has been claimed
+SIM_JOB_MAX_ATTEMPTS times. Writes of a worker whose claim was taken over
+that way are dropped.
+"""
+
+log = logging.getLogger(__name__)
+
+# Minimum seconds between progress writes for a running job
+PROGRESS_INTERVAL = 0.5
+DEFAULT_JOB_TIMEOUT = 600
+DEFAULT_MAX_ATTEMPTS = 3
+# Minimum seconds between stale-job sweeps of one process
+RECLAIM_INTERVAL = 30.0
+
+_last_reclaim = [float("-inf")]
+
+
+def submit_job(
+    graph: AttackGraph,
+    owner,
+    *,
+    trials: int,
+    seed=None,
+    engine: str = DEFAULT_ENGINE,
+    workers: int = 1,
+    exact: str = DEFAULT_EXACT,
+    adaptive=None,
+    incremental: bool = False,
+) -> SimulationJob:
+    return SimulationJob.objects.create(
+        graph=graph,
+        owner=owner,
+        params={
+            "trials": trials, "seed": seed, "engine": engine,
+            "workers": workers, "exact": exact, "adaptive": adaptive,
+            "incremental": incremental,
+        },
+    )
+
+
+def submit_optimize_job(graph: AttackGraph, owner, params: dict) -> SimulationJob:
+    """Queue an optimize_controls run; `params` are its keyword arguments except plan, costs and cache_key."""
+    return SimulationJob.objects.create(graph=graph, owner=owner, kind="optimize", params=params)
+
+
+def _run_optimize(job: SimulationJob, report) -> dict:
+    params = dict(job.params or {})
+    plan = graph_plan(job.graph)
+    costs = control_costs(plan, job.graph.metadata, params.pop("costs", None))
+    return optimize_controls(
+        plan, costs=costs, cache_key=(str(job.graph.pk), graph_revision(job.graph)), progress=report, **params
+    )
+
+
+def reclaim_stale_jobs() -> int:
+    """
+    Requeue running jobs whose worker stopped writing heartbeats, or fail
+    them once they have used up their attempts. Returns the number of jobs
+    touched.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=getattr(settings, "SIM_JOB_TIMEOUT", DEFAULT_JOB_TIMEOUT))
+    stale = SimulationJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff), status="running"
+    )
+    max_attempts = getattr(settings, "SIM_JOB_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status="failed", error=f"The worker stopped responding ({max_attempts} attempts).", finished_at=now
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status="queued", progress=0.0, started_at=None, heartbeat_at=None
+    )
+    if failed or requeued:
+        log.warning("Reclaimed stale simulation jobs: %d requeued, %d failed", requeued, failed)
+    return failed + requeued
+
+
+def claim_next_job() -> SimulationJob | None:
+    """
+    Atomically move the oldest queued job to "running", after requeueing
+    stale ones (at most every RECLAIM_INTERVAL seconds).
+    The conditional UPDATE is the lock, so several workers can poll safely.
+    """
+    if time.monotonic() - _last_reclaim[0] >= RECLAIM_INTERVAL:
+        _last_reclaim[0] = time.monotonic()
+        reclaim_stale_jobs()
+    for job in SimulationJob.objects.filter(status="queued").order_by("created_at")[:8]:
+        now = timezone.now()
+        claimed = SimulationJob.objects.filter(pk=job.pk, status="queued").update(
+            status="running", started_at=now, heartbeat_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_job(job: SimulationJob) -> None:
+    """Execute a claimed job and record its result or error."""
+    params = job.params or {}
+    last_write = [0.0]
+    # Only while this claim stands; a reclaimed job belongs to its next worker
+    mine = SimulationJob.objects.filter(pk=job.pk, status="running", attempts=job.attempts)
+
+    def report(frac: float) -> None:
+        now = time.monotonic()
+        if now - last_write[0] >= PROGRESS_INTERVAL:
+            last_write[0] = now
+            mine.update(progress=round(100.0 * frac, 1), heartbeat_at=timezone.now())
+
+    try:
+        if job.kind == "optimize":
+            output = _run_optimize(job, report)
+            mine.update(status="done", progress=100.0, output=output, finished_at=timezone.now())
+            return
+        plan = graph_plan(job.graph)
+        _, stored, _ = simulate_and_store(
+            job.graph,
+            plan,
+            trials=int(params.get("trials", 5000)),
+            seed=params.get("seed"),
+            engine=params.get("engine", DEFAULT_ENGINE),
+            progress=report,
+            workers=int(params.get("workers", 1)),
+            exact=params.get("exact", DEFAULT_EXACT),
+            adaptive=params.get("adaptive"),
+            incremental=bool(params.get("incremental")),
+        )
+    except Exception:
+        log.exception("Simulation job %s failed", job.pk)
+        mine.update(status="failed", error=traceback.format_exc(limit=5), finished_at=timezone.now())
+        return
+
+    mine.update(status="done", progress=100.0, result=stored, finished_at=timezone.now())
+
+
+def worker_loop(poll_interval: float = 1.0, once: bool = False) -> None:
+    """Claim and run jobs until interrupted (or until the queue is empty if once=True)."""
+    try:
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+    finally:
+        # Pool processes started for jobs with "workers" > 1 go with the worker
+        shutdown_pool()
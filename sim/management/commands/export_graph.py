@@ -0,0 +1,27 @@
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from sim.bulk import export_graph
+from sim.models import AttackGraph
+
+
+class Command(BaseCommand):
+    help = "Export an attack graph as NDJSON (see sim.bulk)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("graph", help="Graph id")
+        parser.add_argument("--output", help="Write here instead of stdout")
+
+    def handle(self, *args, **options):
+        try:
+            graph = AttackGraph.objects.filter(pk=uuid.UUID(options["graph"])).first()
+        except ValueError:
+            graph = None
+        if graph is None:
+            raise CommandError(f"Unknown graph: {options['graph']}")
+        if not options["output"]:
+            for line in export_graph(graph):
+                self.stdout.write(line, ending="")
+            return
+        with open(options["output"], "w", encoding="utf-8") as fh:
+            fh.writelines(export_graph(graph))
+        self.stderr.write(f"Exported graph {graph.pk} to {options['output']}")
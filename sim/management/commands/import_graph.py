@@ -0,0 +1,42 @@
+import sys
+import uuid
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from sim.bulk import import_graph
+from sim.models import AttackGraph
+
+
+class Command(BaseCommand):
+    help = "Import an attack graph from NDJSON (see sim.bulk); '-' reads stdin"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, or - for stdin")
+        parser.add_argument("--owner", required=True, help="Username that owns the new graph")
+        parser.add_argument("--graph", help="Replace the nodes and edges of this graph id instead")
+        parser.add_argument("--title", help="Graph title (overrides the graph record)")
+
+    def handle(self, *args, **options):
+        try:
+            owner = get_user_model().objects.get(username=options["owner"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown user: {options['owner']}")
+        graph = None
+        if options["graph"]:
+            try:
+                graph = AttackGraph.objects.filter(pk=uuid.UUID(options["graph"]), owner=owner).first()
+            except ValueError:
+                graph = None
+            if graph is None:
+                raise CommandError(f"No graph {options['graph']} owned by {owner}")
+
+        fh = sys.stdin if options["path"] == "-" else open(options["path"], encoding="utf-8")
+        try:
+            out = import_graph(fh, owner, graph=graph, title=options["title"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        finally:
+            if fh is not sys.stdin:
+                fh.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {out['nodes']} nodes and {out['edges']} edges into graph {out['graph'].pk}"
+        ))
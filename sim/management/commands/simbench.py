@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from sim import bench
+
+
+def _ints(value):
+    return tuple(int(v) for v in value.split(",") if v.strip())
+
+
+class Command(BaseCommand):
+    help = "Benchmark the simulation engines, FAIR sampler and simulate API on synthetic graphs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--shapes", default=",".join(bench.SHAPES), help="Comma-separated graph shapes")
+        parser.add_argument("--sizes", type=_ints, default=bench.DEFAULT_SIZES, help="Comma-separated node counts")
+        parser.add_argument("--trials", type=int, default=20000, help="Trials per engine run")
+        parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions (median is reported)")
+        parser.add_argument("--api-max-nodes", type=int, default=1000, help="Largest graph timed through the API")
+        parser.add_argument("--no-api", action="store_true", help="Skip serializer and API latency cases")
+        parser.add_argument("--output", help="Write the JSON report here")
+        parser.add_argument("--baseline", help="JSON report to compare against")
+        parser.add_argument("--threshold", type=float, default=bench.DEFAULT_THRESHOLD,
+                            help="Allowed fractional regression against the baseline")
+
+    def handle(self, *args, **options):
+        shapes = [s.strip() for s in options["shapes"].split(",") if s.strip()]
+        unknown = [s for s in shapes if s not in bench.SHAPES]
+        if unknown:
+            raise CommandError(f"Unknown shape '{unknown[0]}'. Expected one of: {', '.join(bench.SHAPES)}.")
+        baseline = bench.load(options["baseline"]) if options["baseline"] else None
+
+        results = {}
+        for shape in shapes:
+            for n in options["sizes"]:
+                case = f"graph/{shape}/{n}"
+                results[case] = bench.bench_graph(shape, n, trials=options["trials"], repeat=options["repeat"])
+                self._line(case, results[case])
+        results["fair/scenario"] = bench.bench_fair(repeat=options["repeat"])
+        self._line("fair/scenario", results["fair/scenario"])
+
+        if not options["no_api"]:
+            results.update(self._api_cases(shapes, options))
+
+        report = {"environment": bench.environment(), "trials": options["trials"], "results": results}
+        if options["output"]:
+            bench.save(report, options["output"])
+            self.stdout.write(f"Wrote {options['output']}")
+
+        if baseline is not None:
+            regressions = bench.compare(report, baseline, options["threshold"])
+            for r in regressions:
+                self.stdout.write(self.style.ERROR(
+                    f"{r['case']} {r['metric']}: {r['baseline']:.4g} -> {r['current']:.4g} ({r['change']:+.0%})"
+                ))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) beyond {options['threshold']:.0%}")
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+
+    def _api_cases(self, shapes, options):
+        """Serializer and API cases, run against a throwaway test database."""
+        if connection.settings_dict["NAME"] == connection.creation._get_test_db_name():
+            # Already on one (under the test runner): creating it again would drop it
+            return self._run_api_cases(shapes, options)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            return self._run_api_cases(shapes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _run_api_cases(self, shapes, options):
+        results = {}
+        owner = get_user_model().objects.create(username="simbench")
+        for shape in shapes:
+            for n in options["sizes"]:
+                if n > options["api_max_nodes"]:
+                    continue
+                case = f"api/{shape}/{n}"
+                results[case] = bench.bench_api(owner, shape, n, repeat=options["repeat"])
+                self._line(case, results[case])
+        return results
+
+    def _line(self, case, metrics):
+        self.stdout.write(f"{case:<24} " + "  ".join(f"{k}={v:.4g}" for k, v in metrics.items()))
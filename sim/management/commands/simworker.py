@@ -0,0 +1,46 @@
+import multiprocessing
+import signal
+from django.core.management.base import BaseCommand
+from django.db import connections
+from sim.jobs import worker_loop
+
+
+class Command(BaseCommand):
+    help = "Run background workers that execute queued simulation jobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds between queue polls when idle")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        if options["once"] and workers == 1:
+            worker_loop(poll_interval=options["poll"], once=True)
+            return
+
+        # Children must not share the parent's database connection
+        connections.close_all()
+        # Not daemonic: a job with "workers" > 1 starts a process pool in its worker
+        procs = [
+            multiprocessing.Process(target=worker_loop, kwargs={"poll_interval": options["poll"], "once": options["once"]})
+            for _ in range(workers)
+        ]
+        for p in procs:
+            p.start()
+        self.stdout.write(self.style.SUCCESS(f"Started {len(procs)} simulation worker(s)"))
+
+        def stop(signum, frame):
+            # Interrupted jobs are requeued once their heartbeat expires (see sim.jobs)
+            for p in procs:
+                if p.is_alive():
+                    p.terminate()
+
+        # Installed after the fork so the workers keep the default handlers
+        previous = {sig: signal.signal(sig, stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+        try:
+            for p in procs:
+                p.join()
+        finally:
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
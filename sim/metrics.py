@@ -0,0 +1,218 @@
+from __future__ import annotations
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Tuple
+
+try:
+    import resource
+except ImportError:  # not on Windows
+    resource = None
+
+"""
+Timing spans and Prometheus metrics for the simulation hot path.
+
+Spans: code wraps a phase in `with span("propagate"):`. While a Timings
+recorder is active in the current context (the simulate view starts one
+when settings.SIM_TIMINGS is on or the request asks for "timings"), the
+phase's wall time is added to it; otherwise a span costs one context
+variable lookup. Phases seen in a request:
+
+  db           loading nodes and edges for a plan that is not cached
+  compile      compile_graph (includes topo_sort)
+  topo_sort    level assignment inside compile_graph
+  cache        stored-result lookup
+  simulate     the engine run as a whole
+  sample       drawing p_succ (and threat model) values
+  propagate    reachability over the levels
+  stats        folding chunks into ReachStats and reading percentiles
+  store        saving the AttackGraphResult
+  serialize    rendering the response (Server-Timing header only)
+
+Spans inside process-pool workers are not seen; "simulate" still covers
+them. A phase entered several times (once per chunk) is summed.
+
+Metrics: counters and histograms kept in this process, rendered in the
+Prometheus text format by the metrics endpoint. Recording is a no-op unless
+settings.SIM_METRICS is on. Every process (web, simworker) has its own.
+"""
+
+# Upper bounds of the seconds histograms; +Inf is implicit
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_HELP = {
+    "sim_simulations_total": ("counter", "Simulation runs by engine."),
+    "sim_trials_total": ("counter", "Trials simulated by engine."),
+    "sim_engine_seconds_total": ("counter", "Wall time spent in the engines."),
+    "sim_trials_per_second": ("gauge", "Trials per second of the last run by engine."),
+    "sim_simulation_seconds": ("histogram", "Wall time per simulation run."),
+    "sim_phase_seconds": ("histogram", "Wall time per phase of timed simulate requests."),
+    "sim_result_cache_requests_total": ("counter", "Stored-result lookups by outcome (hit or miss)."),
+    "sim_plan_cache_requests_total": ("counter", "Compiled-plan lookups by outcome (hit or miss)."),
+}
+
+_current: ContextVar["Timings | None"] = ContextVar("sim_timings", default=None)
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_gauges: Dict[Tuple[str, Tuple], float] = {}
+_histograms: Dict[Tuple[str, Tuple], List[float]] = {}  # bucket counts, then sum and count
+_enabled: bool | None = None
+
+
+def enabled() -> bool:
+    """settings.SIM_METRICS, read once."""
+    global _enabled
+    if _enabled is None:
+        try:
+            from django.conf import settings
+            _enabled = bool(getattr(settings, "SIM_METRICS", False))
+        except Exception:
+            # Used outside Django (scripts, bench)
+            _enabled = False
+    return _enabled
+
+
+class Timings:
+    """Seconds per phase for one request, in first-seen order."""
+
+    def __init__(self):
+        self.phases: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def as_dict(self) -> Dict[str, float]:
+        """Milliseconds per phase."""
+        return {name: round(seconds * 1e3, 3) for name, seconds in self.phases.items()}
+
+    def header(self) -> str:
+        """Server-Timing header value."""
+        return ", ".join(f"{name};dur={ms}" for name, ms in self.as_dict().items())
+
+
+def start(timings: Timings):
+    """Make `timings` the active recorder; returns the token for stop()."""
+    return _current.set(timings)
+
+
+def stop(token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - t0)
+
+
+def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels: str) -> None:
+    if not enabled():
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def set_gauge(name: str, value: float, **labels: str) -> None:
+    if not enabled():
+        return
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    if not enabled():
+        return
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0.0] * (len(SECONDS_BUCKETS) + 3)
+        hist[bisect_left(SECONDS_BUCKETS, value)] += 1
+        hist[-2] += value
+        hist[-1] += 1
+
+
+def counter_values(name: str) -> Dict[Tuple, float]:
+    """{labels: value} of one counter."""
+    with _lock:
+        return {labels: value for (n, labels), value in _counters.items() if n == name}
+
+
+def record_simulation(engine: str, trials: int, seconds: float) -> None:
+    inc("sim_simulations_total", engine=engine)
+    inc("sim_trials_total", trials, engine=engine)
+    inc("sim_engine_seconds_total", seconds, engine=engine)
+    if seconds > 0:
+        set_gauge("sim_trials_per_second", trials / seconds, engine=engine)
+    observe("sim_simulation_seconds", seconds, engine=engine)
+
+
+def record_timings(timings: Timings) -> None:
+    for name, seconds in timings.phases.items():
+        observe("sim_phase_seconds", seconds, phase=name)
+
+
+def _labels(labels: Tuple, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def peak_rss_bytes() -> float | None:
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss) * 1024
+
+
+def render(extra_gauges: Dict[str, Tuple[str, Dict[Tuple, float]]] | None = None) -> str:
+    """
+    Prometheus text exposition of everything recorded, plus `extra_gauges`
+    ({name: (help, {labels: value})}) sampled by the caller at scrape time.
+    """
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {k: list(v) for k, v in _histograms.items()}
+
+    by_name: Dict[str, List[Tuple[Tuple, object]]] = {}
+    for (name, labels), value in list(counters.items()) + list(gauges.items()) + list(histograms.items()):
+        by_name.setdefault(name, []).append((labels, value))
+
+    lines: List[str] = []
+    for name in sorted(by_name):
+        kind, text = _HELP.get(name, ("untyped", ""))
+        lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+        for labels, value in sorted(by_name[name]):
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+            cumulative = 0.0
+            for bound, count in zip(SECONDS_BUCKETS + (float("inf"),), value[:-2]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{name}_bucket{_labels(labels, le)} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(labels)} {_number(value[-1])}")
+    for name, (text, values) in sorted((extra_gauges or {}).items()):
+        lines += [f"# HELP {name} {text}", f"# TYPE {name} gauge"]
+        for labels, value in sorted(values.items()):
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
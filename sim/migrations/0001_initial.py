@@ -0,0 +1,141 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:17
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttackGraph',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('arrival', models.JSONField(blank=True, default=dict)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('visibility', models.CharField(choices=[('private', 'Private'), ('org', 'Organization'), ('public', 'Public')], default='private', max_length=20)),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attack_graphs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AttackGraphResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('method', models.CharField(default='montecarlo', max_length=32)),
+                ('samples', models.IntegerField(default=20000)),
+                ('mean', models.FloatField()),
+                ('p10', models.FloatField()),
+                ('p50', models.FloatField()),
+                ('p90', models.FloatField()),
+                ('seed', models.IntegerField(blank=True, null=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('engine', models.CharField(blank=True, max_length=32)),
+                ('input_hash', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('graph', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='sim.attackgraph')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Edge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('edge_id', models.CharField(max_length=64)),
+                ('source', models.CharField(max_length=64)),
+                ('target', models.CharField(max_length=64)),
+                ('type', models.CharField(default='follows', max_length=16)),
+                ('graph', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='edges', to='sim.attackgraph')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Scenario',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('tef_min', models.FloatField(default=0.1)),
+                ('tef_ml', models.FloatField(default=0.3)),
+                ('tef_max', models.FloatField(default=0.6)),
+                ('vuln_min', models.FloatField(default=0.05)),
+                ('vuln_ml', models.FloatField(default=0.2)),
+                ('vuln_max', models.FloatField(default=0.5)),
+                ('plm_min', models.FloatField(default=10000.0)),
+                ('plm_ml', models.FloatField(default=50000.0)),
+                ('plm_max', models.FloatField(default=150000.0)),
+                ('slef_min', models.FloatField(default=0.05)),
+                ('slef_ml', models.FloatField(default=0.2)),
+                ('slef_max', models.FloatField(default=0.4)),
+                ('slm_min', models.FloatField(default=5000.0)),
+                ('slm_ml', models.FloatField(default=25000.0)),
+                ('slm_max', models.FloatField(default=100000.0)),
+                ('lef_estimate', models.FloatField(default=0.0)),
+                ('lm_estimate', models.FloatField(default=0.0)),
+                ('ale_estimate', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('vuln_source', models.CharField(choices=[('manual', 'Manual'), ('graph', 'AttackGraph')], default='manual', max_length=16)),
+                ('attack_graphs', models.ManyToManyField(blank=True, related_name='scenarios', to='sim.attackgraph')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scenarios', to=settings.AUTH_USER_MODEL)),
+                ('primary_attack_graph', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='primary_for_scenarios', to='sim.attackgraph')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Node',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.CharField(max_length=64)),
+                ('label', models.CharField(max_length=200)),
+                ('kind', models.CharField(blank='Asset', max_length=24)),
+                ('node_type', models.CharField(choices=[('triangular', 'triangular'), ('foothold', 'foothold'), ('goal', 'goal')], default='triangular', max_length=32)),
+                ('p_succ', models.JSONField(blank=True, default=dict)),
+                ('p_detect', models.JSONField(blank=True, default=dict)),
+                ('controls', models.JSONField(blank=True, default=list)),
+                ('weights', models.JSONField(blank=True, default=dict)),
+                ('gate', models.JSONField(blank=True, default=dict)),
+                ('ui', models.JSONField(blank=True, default=dict)),
+                ('graph', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nodes', to='sim.attackgraph')),
+            ],
+            options={
+                'unique_together': {('graph', 'node_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SimulationJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('simulate', 'Simulate'), ('optimize', 'Optimize controls')], default='simulate', max_length=16)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('progress', models.FloatField(default=0.0)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('output', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('graph', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='sim.attackgraph')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='simulation_jobs', to=settings.AUTH_USER_MODEL)),
+                ('result', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to='sim.attackgraphresult')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='sim_simulat_status_2e193a_idx')],
+            },
+        ),
+    ]
@@ -90,6 +90,9 @@ class AttackGraph(models.Model):
         choices=[("private", "Private"), ("org", "Organization"), ("public", "Public")],
         default="private",
     )
+    # Bumped by every edit of the graph's contents (see sim.changes); compiled plans key on it
+    revision = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return self.title
 
@@ -109,6 +112,56 @@ class AttackGraphResult(models.Model):
     # optional: store seed/config for reproducibility
     seed = models.IntegerField(null=True, blank=True)
 
+    # compact run_trials response (see sim.results.pack_payload)
+    payload = models.JSONField(default=dict, blank=True)
+    engine = models.CharField(max_length=32, blank=True)
+    # sha256 of (compiled graph, trials, seed, engine version); blank for unseeded runs
+    input_hash = models.CharField(max_length=64, blank=True, db_index=True)
+
+
+class SimulationJob(models.Model):
+    """A simulate (or control optimization) request queued for a background worker (manage.py simworker)."""
+    STATUS_CHOICES = (
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    )
+    KIND_CHOICES = (
+        ("simulate", "Simulate"),
+        ("optimize", "Optimize controls"),
+    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    graph = models.ForeignKey("AttackGraph", on_delete=models.CASCADE, related_name="jobs")
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="simulation_jobs",
+    )
+    kind = models.CharField(max_length=16, choices=KIND_CHOICES, default="simulate")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued")
+    progress = models.FloatField(default=0.0)  # percent, 0..100
+    params = models.JSONField(default=dict, blank=True)  # {"trials", "seed", "engine"}
+    result = models.ForeignKey(
+        "AttackGraphResult", null=True, blank=True, on_delete=models.SET_NULL,
+        related_name="jobs"
+    )
+    # Response of jobs that do not produce an AttackGraphResult (kind "optimize")
+    output = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    # Times a worker claimed the job; a job whose worker dies is requeued (see sim.jobs.reclaim_stale_jobs)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last write by the worker running the job
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "created_at"])]
+
 class Node(models.Model):
     graph = models.ForeignKey(AttackGraph, related_name="nodes", on_delete=models.CASCADE)
     #graph = models.ForeignKey(AttackGraph, related_name="nodes", on_delete=models.CASCADE)
@@ -124,6 +177,7 @@ class Node(models.Model):
     p_detect = models.JSONField(default=dict, blank=True)
     controls = models.JSONField(default=list, blank=True)  # ["email","waf"]
     weights = models.JSONField(default=dict, blank=True)   # {"cap":1,"ctrl":1,"k":5}
+    gate = models.JSONField(default=dict, blank=True)      # {"type":"or"|"and"|"k_of_n","k":2}
     ui = models.JSONField(default=dict, blank=True)
 
     class Meta:
@@ -0,0 +1,291 @@
+from __future__ import annotations
+import bisect
+import heapq
+import math
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, List, Sequence, Tuple
+import numpy as np
+from .analytic import _point_values
+from .compiled import CompiledGraph
+from .incremental import dirty_columns
+from .simulate import CHUNK_TRIALS, _any_goal, _chunk_streams, _chunk_uniforms, _propagate, _propagate_dirty
+
+"""
+Budget-constrained control placement.
+
+Candidates are controls defined in AttackGraph.metadata["controls"] and
+listed by some node's Node.controls. A control's cost is the "cost" key of
+its spec (default 1), or the request's override. Deploying a set S means
+the candidates outside S have no strength; controls that are not
+candidates keep their modeled strength. The risk of S is
+success_rate_any_goal under that deployment.
+
+Evaluators:
+
+  monte_carlo  low-trial Monte Carlo on common random numbers: the p_succ,
+               capability, strength and detection draws are sampled once,
+               and only the columns the candidates touch (and their
+               descendants) are re-propagated per set, so differences between
+               sets are not sampling noise
+  analytic     the same on the sim.analytic point estimate (one row)
+
+Search:
+
+  greedy  lazy greedy on risk reduction per unit cost, re-evaluating a
+          candidate only when its stale gain could still be the best
+  exact   depth-first branch-and-bound over affordable sets, pruning a
+          branch when deploying everything still affordable in it cannot
+          beat a cheaper set already found (risk only falls as controls are
+          added)
+  auto    exact up to EXACT_MAX_CONTROLS candidates, greedy beyond
+
+Every evaluated set is memoized; memos are kept per (graph revision,
+evaluator, trials, seed, candidates) across runs, so a later run with
+another budget re-evaluates only sets it has not seen. The response is the
+Pareto frontier of cost against risk over all evaluated sets within budget.
+"""
+
+EVALUATORS = ("monte_carlo", "analytic")
+METHODS = ("auto", "greedy", "exact")
+DEFAULT_TRIALS = 2000
+MAX_TRIALS = 50_000
+DEFAULT_COST = 1.0
+EXACT_MAX_CONTROLS = 12
+# Memos retained across runs
+MEMO_CACHE_SIZE = 16
+
+_memos: "OrderedDict[Tuple, Dict[FrozenSet[str], float]]" = OrderedDict()
+_memos_lock = threading.Lock()
+
+
+def control_costs(plan: CompiledGraph, metadata: Dict | None, overrides: Dict | None = None) -> Dict[str, float]:
+    """Cost of every control the graph uses; raises ValueError on a bad cost."""
+    defined = (metadata or {}).get("controls") or {}
+    names = plan.threat.control_names if plan.threat is not None else ()
+    overrides = overrides or {}
+    unknown = sorted(set(overrides) - set(names))
+    if unknown:
+        raise ValueError(f"costs names a control no node uses: {unknown[0]}")
+    costs = {}
+    for name in names:
+        value = overrides.get(name, (defined.get(name) or {}).get("cost", DEFAULT_COST))
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"controls.{name}: cost must be a number.")
+        if not math.isfinite(value) or value < 0:
+            raise ValueError(f"controls.{name}: cost must be a finite number >= 0.")
+        costs[name] = value
+    return costs
+
+
+def check_options(
+    costs: Dict[str, float], budget: float, candidates: Sequence[str] | None, evaluator: str, method: str
+) -> List[str]:
+    """Sorted candidate names; raises ValueError on an unknown control, evaluator or method, or a bad budget."""
+    if evaluator not in EVALUATORS:
+        raise ValueError(f"Unknown evaluator '{evaluator}'. Expected one of: {', '.join(EVALUATORS)}.")
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}'. Expected one of: {', '.join(METHODS)}.")
+    if not math.isfinite(budget) or budget < 0:
+        raise ValueError("budget must be a finite number >= 0.")
+    candidates = sorted(costs) if candidates is None else sorted(set(candidates))
+    unknown = [c for c in candidates if c not in costs]
+    if unknown:
+        raise ValueError(f"Unknown control: {unknown[0]}")
+    if not candidates:
+        raise ValueError("The graph has no controls to place: define them in metadata.controls and list them on nodes.")
+    return candidates
+
+
+class _Evaluator:
+    """Memoized risk of a deployed candidate set on fixed draws."""
+
+    def __init__(self, plan: CompiledGraph, candidates: Sequence[str], evaluator: str, trials: int, seed: int):
+        threat = plan.threat
+        self.plan = plan
+        self.slot = {name: i for i, name in enumerate(threat.control_names)}
+        self.fixed = np.ones(len(threat.control_names))
+        self.fixed[[self.slot[c] for c in candidates]] = 0.0
+        # Columns whose p depends on a candidate; their descendants are re-propagated
+        member = threat.membership[[self.slot[c] for c in candidates]].any(axis=0)
+        self.cols = np.flatnonzero(member & (threat.ctrl_shift != 0.0))
+        changed = np.zeros(plan.n, dtype=bool)
+        changed[self.cols] = True
+        self.dirty = dirty_columns(plan, changed)
+
+        if evaluator == "analytic":
+            p = np.clip(_point_values(plan, "mean"), 0.0, 1.0)[None, :]
+            blocks = [(p, *threat.means())]
+        else:
+            blocks = []
+            for k, stream in enumerate(_chunk_streams(seed, trials)):
+                rows = min(CHUNK_TRIALS, trials - k * CHUNK_TRIALS)
+                u = _chunk_uniforms(plan, stream, rows)
+                p = np.clip(plan.dists.sample(u[:, :plan.n]), 0.0, 1.0)
+                blocks.append((p, *threat.draws(u[:, plan.n:])))
+        # Per block: p_succ, threat draws, and p / reach with no candidate deployed
+        self.blocks = []
+        for p, cap, strength, detect in blocks:
+            eff = threat.combine(p, None, cap, strength * self.fixed, detect)
+            self.blocks.append((p, cap, strength, detect, eff, _propagate(plan, eff)))
+        self.rows = sum(b[0].shape[0] for b in self.blocks)
+        self.memo: Dict[FrozenSet[str], float] = {}
+        self.evaluated = 0
+
+    def __call__(self, deployed: FrozenSet[str]) -> float:
+        risk = self.memo.get(deployed)
+        if risk is not None:
+            return risk
+        mask = self.fixed.copy()
+        mask[[self.slot[c] for c in deployed]] = 1.0
+        total = 0.0
+        for p, cap, strength, detect, eff, reach in self.blocks:
+            if deployed and self.cols.size:
+                eff = eff.copy()
+                eff[:, self.cols] = self.plan.threat.combine(p[:, self.cols], self.cols, cap, strength * mask, detect)
+                reach = reach.copy()
+                _propagate_dirty(self.plan, reach, eff, self.dirty)
+            total += float(_any_goal(self.plan, reach).sum())
+        risk = total / self.rows
+        self.memo[deployed] = risk
+        self.evaluated += 1
+        return risk
+
+
+class _Frontier:
+    """Non-dominated (cost, risk) points, cost ascending and risk strictly descending."""
+
+    def __init__(self):
+        self.costs: List[float] = []
+        self.risks: List[float] = []
+
+    def best_within(self, cost: float) -> float:
+        """Lowest risk among points costing at most `cost`."""
+        i = bisect.bisect_right(self.costs, cost)
+        return self.risks[i - 1] if i else math.inf
+
+    def add(self, cost: float, risk: float) -> None:
+        if self.best_within(cost) <= risk:
+            return
+        i = bisect.bisect_left(self.costs, cost)
+        j = i
+        while j < len(self.costs) and self.risks[j] >= risk:
+            j += 1
+        self.costs[i:j] = [cost]
+        self.risks[i:j] = [risk]
+
+
+def _greedy(ev: _Evaluator, costs: Dict[str, float], budget: float, progress) -> None:
+    chosen: FrozenSet[str] = frozenset()
+    spent = 0.0
+    risk = ev(chosen)
+    # (-gain per cost, name); gains only shrink as controls are added, so a stale entry is an upper bound
+    heap = [(-math.inf, name) for name in sorted(costs)]
+    while heap:
+        _, name = heapq.heappop(heap)
+        if spent + costs[name] > budget:
+            continue
+        gain = risk - ev(chosen | {name})
+        ratio = gain / costs[name] if costs[name] > 0 else (math.inf if gain > 0 else 0.0)
+        if heap and ratio < -heap[0][0]:
+            heapq.heappush(heap, (-ratio, name))
+            continue
+        if gain <= 0:
+            break
+        chosen |= {name}
+        spent += costs[name]
+        risk -= gain
+        if progress is not None and budget > 0:
+            progress(min(spent / budget, 1.0))
+
+
+def _exact(ev: _Evaluator, costs: Dict[str, float], budget: float, progress) -> None:
+    order = sorted(costs, key=lambda c: (costs[c], c))
+    frontier = _Frontier()
+
+    def visit(start: int, chosen: FrozenSet[str], spent: float) -> None:
+        frontier.add(spent, ev(chosen))
+        rest = [c for c in order[start:] if spent + costs[c] <= budget]
+        if not rest:
+            return
+        # Lower bound for every extension; prune if a set costing no more already does as well
+        if frontier.best_within(spent) <= ev(chosen | frozenset(rest)):
+            return
+        for i in range(start, len(order)):
+            name = order[i]
+            if spent + costs[name] > budget:
+                break
+            visit(i + 1, chosen | {name}, spent + costs[name])
+            if progress is not None and not chosen:
+                progress((i + 1) / len(order))
+
+    visit(0, frozenset(), 0.0)
+
+
+def _entry(deployed: FrozenSet[str], costs: Dict[str, float], risk: float) -> Dict:
+    return {"controls": sorted(deployed), "cost": sum((costs[c] for c in deployed), 0.0), "risk": risk}
+
+
+def optimize_controls(
+    plan: CompiledGraph,
+    budget: float,
+    costs: Dict[str, float],
+    candidates: Sequence[str] | None = None,
+    evaluator: str = "monte_carlo",
+    method: str = "auto",
+    trials: int = DEFAULT_TRIALS,
+    seed: int = 0,
+    cache_key: Tuple | None = None,
+    progress: Callable[[float], None] | None = None,
+) -> Dict:
+    """
+    Search control sets costing at most `budget` for the lowest risk (see the
+    module docstring). `costs` comes from control_costs; `candidates`
+    defaults to every control in it. `cache_key` identifies the graph
+    revision for reusing memos across runs. Raises ValueError on bad options.
+    """
+    candidates = check_options(costs, budget, candidates, evaluator, method)
+    if method == "auto":
+        method = "exact" if len(candidates) <= EXACT_MAX_CONTROLS else "greedy"
+    trials = 0 if evaluator == "analytic" else trials
+    costs = {c: costs[c] for c in candidates}
+
+    ev = _Evaluator(plan, candidates, evaluator, trials, seed)
+    key = None if cache_key is None else (cache_key, evaluator, trials, seed, tuple(candidates))
+    if key is not None:
+        with _memos_lock:
+            ev.memo = dict(_memos.get(key, {}))
+    reused = len(ev.memo)
+
+    (_exact if method == "exact" else _greedy)(ev, costs, budget, progress)
+
+    if key is not None:
+        with _memos_lock:
+            _memos[key] = ev.memo
+            _memos.move_to_end(key)
+            while len(_memos) > MEMO_CACHE_SIZE:
+                _memos.popitem(last=False)
+
+    feasible = sorted(
+        ((sum(costs[c] for c in s), r, s) for s, r in ev.memo.items() if sum(costs[c] for c in s) <= budget),
+        key=lambda t: (t[0], t[1], sorted(t[2])),
+    )
+    frontier = []
+    for cost, risk, deployed in feasible:
+        if not frontier or risk < frontier[-1]["risk"]:
+            frontier.append(_entry(deployed, costs, risk))
+    return {
+        "budget": budget,
+        "evaluator": evaluator,
+        "method": method,
+        "trials": trials,
+        "seed": seed,
+        "costs": costs,
+        "baseline": _entry(frozenset(), costs, ev(frozenset())),
+        "best": frontier[-1],
+        "frontier": frontier,
+        "evaluations": ev.evaluated,
+        "reused_evaluations": reused,
+    }
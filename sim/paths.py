@@ -0,0 +1,151 @@
+from __future__ import annotations
+import heapq
+import math
+from itertools import islice
+from typing import Dict, List, Sequence, Tuple
+import numpy as np
+from scipy import sparse
+from .analytic import POINTS, _point_values
+from .compiled import CompiledGraph
+from .simulate import CHUNK_TRIALS, _chunk_streams, _chunk_uniforms, _sample_p
+from .sketch import ReachStats
+
+"""
+Most likely foothold -> goal paths.
+
+A path's probability is the product of p over its nodes (foothold included),
+with p at a point estimate of p_succ as in sim.analytic, so with weights
+-log(p) the k most likely paths are the k shortest. Columns of the compiled
+graph are already in topological order, so one forward pass keeps the k
+cheapest partial paths into every node: a node's list is a lazy heap merge of
+its parents' sorted lists, O(edges * k * log(degree)) overall, and paths are
+read back through (parent, rank) links. Nothing is enumerated beyond the k
+per node.
+
+A path only asks that its own steps succeed: parents an AND or k-of-n gate
+needs besides the one on the path are not part of it, and a node on several
+paths counts once per path. Path probabilities are therefore not additive
+and are not the goal reach.
+
+With trials, every returned path's probability is also evaluated on the
+vectorized engine's p_succ samples (threat model included), giving its
+spread across trials: log p of a chunk times a sparse (nodes, paths)
+incidence matrix gives every path's log probability at once.
+"""
+
+DEFAULT_K = 5
+MAX_K = 50
+# Largest paths * trials for which path percentiles keep every sample by default
+EXACT_SAMPLES = 5_000_000
+
+# (cost, parent column, rank in the parent's list); parent -1 starts the path
+_Entry = Tuple[float, int, int]
+
+
+def _weights(plan: CompiledGraph, point: str) -> np.ndarray:
+    p = np.clip(_point_values(plan, point), 0.0, 1.0)
+    if plan.threat is not None:
+        p = plan.threat.combine(p[None, :], None, *plan.threat.means())[0]
+    with np.errstate(divide="ignore"):
+        return -np.log(p)
+
+
+def _extend(entries: List[_Entry], parent: int, w: float):
+    for rank, (cost, _, _) in enumerate(entries):
+        yield cost + w, parent, rank
+
+
+def k_best(plan: CompiledGraph, k: int, weights: np.ndarray) -> List[List[_Entry]]:
+    """Per column, up to k cheapest paths from a foothold ending there, sorted by cost."""
+    best: List[List[_Entry]] = [[] for _ in range(plan.n)]
+    for j in range(plan.n):
+        w = float(weights[j])
+        if not math.isfinite(w):
+            continue
+        if plan.foothold[j]:
+            # A foothold is reached on its own (reach = p), whatever its parents
+            best[j] = [(w, -1, -1)]
+            continue
+        sources = [_extend(best[u], u, w) for u in np.unique(plan.parents_of(j)).tolist() if best[u]]
+        if sources:
+            best[j] = list(islice(heapq.merge(*sources), k))
+    return best
+
+
+def _walk(best: List[List[_Entry]], col: int, rank: int) -> List[int]:
+    cols = []
+    while col >= 0:
+        cols.append(col)
+        _, col, rank = best[col][rank]
+    return cols[::-1]
+
+
+def _path_stats(plan: CompiledGraph, paths: List[List[int]], trials: int, seed, exact: bool) -> ReachStats:
+    """ReachStats over the per-trial product of sampled p along each path."""
+    # Only the columns on some path are sampled; `local` renumbers them
+    used, local = np.unique(np.concatenate([np.asarray(cols, dtype=np.intp) for cols in paths]), return_inverse=True)
+    owner = np.repeat(np.arange(len(paths)), [len(cols) for cols in paths])
+    incidence = sparse.csr_matrix((np.ones(local.size), (owner, local)), shape=(len(paths), used.size))
+    stats = ReachStats(len(paths), trials, np.arange(len(paths)) if exact else ())
+    for i, stream in enumerate(_chunk_streams(seed, trials)):
+        start = i * CHUNK_TRIALS
+        stop = min(start + CHUNK_TRIALS, trials)
+        p = _sample_p(plan, _chunk_uniforms(plan, stream, stop - start), used)
+        with np.errstate(divide="ignore"):
+            # Only stored entries are multiplied, so log(0) = -inf just zeroes its paths
+            log_p = np.log(p)
+        stats.update(start, np.exp(incidence @ log_p.T).T)
+    return stats
+
+
+def top_paths(
+    plan: CompiledGraph,
+    k: int = DEFAULT_K,
+    goals: Sequence[str] | None = None,
+    point: str = "mean",
+    trials: int = 0,
+    seed: int | None = None,
+    exact: bool | None = None,
+) -> Dict:
+    """
+    The k most likely foothold -> goal paths per goal (all goals by default),
+    most likely first. trials > 0 adds each path's distribution over sampled
+    p_succ; its percentiles keep every sample when exact is True, use the
+    histogram sketch when False and, when None, keep the samples only up to
+    EXACT_SAMPLES of them.
+    Raises ValueError on an unknown goal, point or k.
+    """
+    if point not in POINTS:
+        raise ValueError(f"Unknown point estimate '{point}'. Expected one of: {', '.join(POINTS)}.")
+    if not 1 <= k <= MAX_K:
+        raise ValueError(f"k must be between 1 and {MAX_K}.")
+    goals = list(plan.goal_ids) if goals is None else list(dict.fromkeys(goals))
+    unknown = [g for g in goals if g not in plan.index]
+    if unknown:
+        raise ValueError(f"Unknown goal node: {unknown[0]}")
+
+    best = k_best(plan, k, _weights(plan, point))
+    found = {g: [_walk(best, plan.index[g], r) for r in range(len(best[plan.index[g]]))] for g in goals}
+    paths = {
+        g: [
+            {"nodes": [plan.ids[c] for c in cols], "probability": math.exp(-best[plan.index[g]][r][0])}
+            for r, cols in enumerate(found[g])
+        ]
+        for g in goals
+    }
+
+    if trials > 0:
+        flat = [cols for g in goals for cols in found[g]]
+        if flat:
+            if exact is None:
+                exact = len(flat) * trials <= EXACT_SAMPLES
+            stats = _path_stats(plan, flat, trials, seed, exact)
+            means = stats.means()
+            pct = stats.quantiles([0.10, 0.50, 0.90])
+            entries = [entry for g in goals for entry in paths[g]]
+            for i, entry in enumerate(entries):
+                entry["distribution"] = {
+                    "mean": float(means[i]), "p10": float(pct[0, i]), "p50": float(pct[1, i]), "p90": float(pct[2, i]),
+                }
+
+    return {"k": k, "point": point, "trials": trials, "paths": paths}
@@ -0,0 +1,177 @@
+import hashlib
+from typing import Callable, Dict, Optional, Tuple
+from django.conf import settings
+from sim.models import AttackGraph, AttackGraphResult
+from . import metrics
+from .compiled import CompiledGraph
+from .metrics import span
+from .simulate import simulate_plan, simulate_adaptive, ENGINE_VERSION
+from .sketch import DEFAULT_EXACT
+from .incremental import simulate_incremental
+
+"""
+Persistence of simulation output into AttackGraphResult.
+
+Every run is stored with a compact payload. Seeded runs also carry a content
+hash of their inputs, so repeating one is answered from the table instead of
+re-running Monte Carlo. Only the newest SIM_RESULTS_PER_GRAPH rows per graph
+are kept.
+"""
+
+# Stored results kept per graph; override with settings.SIM_RESULTS_PER_GRAPH
+DEFAULT_RESULTS_PER_GRAPH = 20
+
+_SUMMARY_KEYS = ("mean", "p10", "p50", "p90")
+_SCHEMA_KEYS = (
+    "trials", "success_rate_any_goal", "success_distribution", "goal_success_rates",
+    "goal_distributions", "node_activation_rates", "node_distributions",
+)
+
+
+def input_hash(
+    plan: CompiledGraph,
+    *,
+    trials: int,
+    seed,
+    engine: str,
+    exact: str = DEFAULT_EXACT,
+    adaptive: Optional[Dict] = None,
+) -> str:
+    """
+    Content hash of a simulate request; blank when the run is not reproducible
+    (unseeded, or adaptive with a wall-clock budget).
+    """
+    if seed is None or (adaptive and adaptive.get("time_budget") is not None):
+        return ""
+    options = sorted((adaptive or {}).items())
+    key = f"{plan.digest}|{trials}|{seed}|{engine}|{exact}|{options}|{ENGINE_VERSION}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def pack_payload(result: Dict) -> Dict:
+    """
+    Compact form of a run_trials response: node statistics as rows of
+    [mean, p10, p50, p90] and goals as ids, since goal_* and
+    node_activation_rates are all views of node_distributions.
+    """
+    ids = list(result["node_distributions"])
+    return {
+        "v": 1,
+        "trials": result["trials"],
+        "success": [result["success_distribution"][k] for k in _SUMMARY_KEYS],
+        "ids": ids,
+        "nodes": [[result["node_distributions"][nid][k] for k in _SUMMARY_KEYS] for nid in ids],
+        "goals": list(result["goal_distributions"]),
+        "extra": {k: v for k, v in result.items() if k not in _SCHEMA_KEYS},
+    }
+
+
+def unpack_payload(payload: Dict) -> Dict:
+    """Inverse of pack_payload: the full run_trials response schema."""
+    if not payload:
+        return {}
+    nodes = {nid: dict(zip(_SUMMARY_KEYS, row)) for nid, row in zip(payload["ids"], payload["nodes"])}
+    success = dict(zip(_SUMMARY_KEYS, payload["success"]))
+    goals = payload["goals"]
+    return {
+        "trials": payload["trials"],
+        "success_rate_any_goal": success["mean"],
+        "success_distribution": success,
+        "goal_success_rates": {g: nodes[g]["mean"] for g in goals},
+        "goal_distributions": {g: dict(nodes[g]) for g in goals},
+        "node_activation_rates": {nid: d["mean"] for nid, d in nodes.items()},
+        "node_distributions": nodes,
+        **payload.get("extra", {}),
+    }
+
+
+def store_result(
+    graph: AttackGraph,
+    result: Dict,
+    *,
+    seed=None,
+    method: str = "montecarlo",
+    engine: str = "",
+    key: str = "",
+) -> AttackGraphResult:
+    """Save a run_trials response (summary columns plus compact payload) and apply retention."""
+    dist = result["success_distribution"]
+    stored = AttackGraphResult.objects.create(
+        graph=graph,
+        method=method,
+        samples=result["trials"],
+        mean=dist["mean"],
+        p10=dist["p10"],
+        p50=dist["p50"],
+        p90=dist["p90"],
+        seed=seed,
+        payload=pack_payload(result),
+        engine=engine,
+        input_hash=key,
+    )
+    prune_results(graph)
+    return stored
+
+
+def prune_results(graph: AttackGraph) -> int:
+    """
+    Delete all but the newest SIM_RESULTS_PER_GRAPH results of a graph.
+    Results a SimulationJob points to are kept as long as the job, and do
+    not count towards the limit.
+    """
+    keep = int(getattr(settings, "SIM_RESULTS_PER_GRAPH", DEFAULT_RESULTS_PER_GRAPH))
+    stale = list(
+        graph.results.filter(jobs__isnull=True).order_by("-created_at", "-id").values_list("id", flat=True)[keep:]
+    )
+    if not stale:
+        return 0
+    deleted, _ = AttackGraphResult.objects.filter(id__in=stale).delete()
+    return deleted
+
+
+def cached_result(graph: AttackGraph, key: str) -> AttackGraphResult | None:
+    if not key:
+        return None
+    return graph.results.filter(input_hash=key).order_by("-created_at").first()
+
+
+def simulate_and_store(
+    graph: AttackGraph,
+    plan: CompiledGraph,
+    *,
+    trials: int,
+    seed=None,
+    engine: str,
+    progress: Callable[[float], None] | None = None,
+    workers: int = 1,
+    exact: str = DEFAULT_EXACT,
+    adaptive: Optional[Dict] = None,
+    incremental: bool = False,
+) -> Tuple[Dict, AttackGraphResult, bool]:
+    """
+    Serve a seeded repeat from the stored result, otherwise simulate and store.
+    `adaptive` holds simulate_adaptive options ({"tolerance", "time_budget"});
+    `trials` is then the budget. `incremental` reuses the retained samples of
+    the graph's last seeded vectorized run (sim.incremental); the numbers are
+    the same as a fresh run. Returns (response, stored row, served_from_cache).
+    """
+    key = input_hash(plan, trials=trials, seed=seed, engine=engine, exact=exact, adaptive=adaptive)
+    with span("cache"):
+        hit = cached_result(graph, key)
+    metrics.inc("sim_result_cache_requests_total", outcome="miss" if hit is None else "hit")
+    if hit is not None:
+        return unpack_payload(hit.payload), hit, True
+
+    if incremental and seed is not None and engine == "vectorized" and not adaptive:
+        result = simulate_incremental(str(graph.pk), plan, trials, seed, exact=exact, progress=progress)
+    elif adaptive:
+        result = simulate_adaptive(
+            plan, max_trials=trials, seed=seed, progress=progress, exact=exact, **adaptive
+        )
+    else:
+        result = simulate_plan(
+            plan, trials=trials, seed=seed, engine=engine, progress=progress, workers=workers, exact=exact
+        )
+    with span("store"):
+        stored = store_result(graph, result, seed=seed, engine=engine, key=key)
+    return result, stored, False
@@ -1,16 +1,75 @@
+from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
-from .models import AttackGraph, AttackGraphResult, Node, Edge, Scenario
+from .models import AttackGraph, AttackGraphResult, Node, Edge, Scenario, SimulationJob
+from .results import unpack_payload
+from .changes import replace_rows
 
 class NodeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Node
-        fields = ("node_id","label","kind","node_type","p_succ","p_detect","controls","weights","ui")
+        fields = ("node_id","label","kind","node_type","p_succ","p_detect","controls","weights","gate","ui")
 
 class EdgeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Edge
         fields = ("edge_id","source","target","type")
 
+def _count(model):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(graph=OuterRef("pk")).order_by().values("graph")
+            .annotate(n=Count("pk")).values("n")[:1]
+        ),
+        0,
+    )
+
+
+def graph_summaries(queryset):
+    """
+    `queryset` with what AttackGraphSummarySerializer reads: node / edge counts
+    as subquery annotations and the latest result (without its payload) in
+    one prefetch, so listing any number of graphs takes a fixed number of queries.
+    """
+    latest = AttackGraphResult.objects.filter(
+        pk=Subquery(
+            AttackGraphResult.objects.filter(graph=OuterRef("graph")).order_by("-created_at", "-id").values("pk")[:1]
+        )
+    ).defer("payload")
+    return queryset.annotate(node_count=_count(Node), edge_count=_count(Edge)).prefetch_related(
+        Prefetch("results", queryset=latest, to_attr="latest_results")
+    )
+
+
+def _latest_result(obj):
+    if hasattr(obj, "latest_results"):
+        r = obj.latest_results[0] if obj.latest_results else None
+    else:
+        r = obj.results.defer("payload").order_by("-created_at", "-id").first()
+    return AttackGraphResultSerializer(r).data if r else None
+
+
+class AttackGraphSummarySerializer(serializers.ModelSerializer):
+    """List form of a graph: counts and the latest result instead of nodes and edges."""
+    node_count = serializers.SerializerMethodField()
+    edge_count = serializers.SerializerMethodField()
+    latest_result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AttackGraph
+        fields = ("id","title","visibility","revision","updated_at","node_count","edge_count","latest_result")
+
+    def get_node_count(self, obj):
+        return obj.node_count if hasattr(obj, "node_count") else obj.nodes.count()
+
+    def get_edge_count(self, obj):
+        return obj.edge_count if hasattr(obj, "edge_count") else obj.edges.count()
+
+    def get_latest_result(self, obj):
+        return _latest_result(obj)
+
+
 class AttackGraphSerializer(serializers.ModelSerializer):
     nodes = NodeSerializer(many=True)
     edges = EdgeSerializer(many=True)
@@ -18,7 +77,8 @@ class AttackGraphSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = AttackGraph
-        fields = ("id","title","arrival","metadata","nodes","edges","updated_at","latest_result")
+        fields = ("id","title","arrival","metadata","nodes","edges","revision","updated_at","latest_result")
+        read_only_fields = ("revision",)
 
     def create(self, data):
         title = (data.get("title") or "").strip()
@@ -45,40 +105,56 @@ class AttackGraphSerializer(serializers.ModelSerializer):
     def update(self, inst, data):
         # Only overwrite title if the new one is non-empty *and different*
         new_title = (data.get("title") or "").strip()
-        if new_title and new_title != inst.title:
+        changed = bool(new_title) and new_title != inst.title
+        if changed:
             inst.title = new_title
 
-        inst.arrival = data.get("arrival", inst.arrival)
-        inst.metadata = data.get("metadata", inst.metadata)
-        inst.save()
-
-        # Only replace nodes/edges if actually sent
-        nodes = data.get("nodes")
-        edges = data.get("edges")
-
-        if nodes is not None:
-            inst.nodes.all().delete()
-            Node.objects.bulk_create([Node(graph=inst, **n) for n in nodes])
-
-        if edges is not None:
-            inst.edges.all().delete()
-            Edge.objects.bulk_create([Edge(graph=inst, **e) for e in edges])
+        for field in ("arrival", "metadata"):
+            if field in data and data[field] != getattr(inst, field):
+                setattr(inst, field, data[field])
+                changed = True
+
+        # Only sync nodes/edges if actually sent; unchanged rows are not rewritten
+        with transaction.atomic():
+            for model, field in ((Node, "nodes"), (Edge, "edges")):
+                if data.get(field) is not None:
+                    upserted, deleted = replace_rows(inst, model, [dict(r) for r in data[field]])
+                    changed |= bool(upserted or deleted)
+            if changed:
+                inst.revision += 1
+                inst.save()
 
         return inst
 
     def get_latest_result(self, obj):
-        r = obj.results.order_by("-created_at").first()
-        return AttackGraphResultSerializer(r).data if r else None
+        return _latest_result(obj)
 
 
 class AttackGraphResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = AttackGraphResult
-        fields = ["id","created_at","method","samples","mean","p10","p50","p90","seed"]
+        fields = ["id","created_at","method","samples","mean","p10","p50","p90","seed","engine"]
+
+
+class SimulationJobSerializer(serializers.ModelSerializer):
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SimulationJob
+        fields = [
+            "id","graph","kind","status","progress","params","error","attempts",
+            "created_at","started_at","heartbeat_at","finished_at","result",
+        ]
+
+    def get_result(self, obj):
+        # Full run_trials payload once the job is done; optimizer jobs store their response directly
+        if obj.kind == "optimize":
+            return obj.output
+        return unpack_payload(obj.result.payload) if obj.result_id else None
 
 
 class ScenarioSerializer(serializers.ModelSerializer):
-    attack_graphs = AttackGraphSerializer(many=True, read_only=True)
+    attack_graphs = AttackGraphSummarySerializer(many=True, read_only=True)
     attack_graph_ids = serializers.PrimaryKeyRelatedField(
         queryset=AttackGraph.objects.all(),
         many=True,
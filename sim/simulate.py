@@ -1,8 +1,19 @@
 from __future__ import annotations
+import multiprocessing
+import os
 import random
-from dataclasses import dataclass
-from typing import Dict, List, Tuple
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Tuple
 import numpy as np
+from . import metrics
+from .compiled import CompiledGraph, GateBlock, compile_graph
+from .distributions import Distributions, compile_specs
+from .metrics import span
+from .sketch import ReachStats, exact_columns, DEFAULT_EXACT
 
 @dataclass
 class SimNode:
@@ -10,7 +21,11 @@ class SimNode:
     node_name: str
     node_type: str         # 'foothold' | 'triangular' | 'goal'
     kind: str              # 'Asset' | 'Control' | ...
-    p_succ: Dict[str, float]  # {min, mode, max}
+    p_succ: Dict[str, float]  # {dist, min, mode, max, ...}, see sim.distributions
+    gate: Dict = field(default_factory=dict)  # {"type": "or"|"and"|"k_of_n", "k": int}
+    p_detect: Dict = field(default_factory=dict)  # spec; see sim.threat
+    controls: List[str] = field(default_factory=list)
+    weights: Dict = field(default_factory=dict)   # {"cap", "ctrl", "k"}
 
 def topo_sort(nodes, edges):
     """
@@ -43,179 +58,709 @@ def topo_sort(nodes, edges):
     return ordered, children
 
 def draw_p(pdef: Dict[str, float]) -> float:
-    """Draw a Bernoulli probability from a (min, mode, max) triangular/PERT."""
-    if not pdef:
-        return 0.0
-    mn = float(pdef.get("min", 0.0))
-    md = float(pdef.get("mode", pdef.get("ml", 0.0)))  # tolerate 'ml' or 'mode'
-    mx = float(pdef.get("max", 1.0))
-    # Python's triangular(low, high, mode)
-    return max(0.0, min(1.0, random.triangular(mn, mx, md)))
+    """Draw a Bernoulli probability from a p_succ spec (triangular unless "dist" says otherwise)."""
+    try:
+        dist = _draw_p_spec(tuple(sorted((pdef or {}).items())))
+    except TypeError:
+        # Unhashable values: compile uncached (and let compile_spec report them)
+        dist = compile_specs([pdef], default="TRIANGULAR", max_default=1.0)
+    return max(0.0, min(1.0, float(dist.sample(np.array([[random.random()]]))[0, 0])))
+
+
+@lru_cache(maxsize=1024)
+def _draw_p_spec(items: Tuple) -> Distributions:
+    # Specs repeat across nodes and trials; compiling builds quantile tables
+    return compile_specs([dict(items)], default="TRIANGULAR", max_default=1.0)
+
+ENGINES = ("vectorized", "scalar", "discrete")
+DEFAULT_ENGINE = "vectorized"
+# Bump whenever a change alters the numbers produced for a given seed, so that
+# stored results keyed on it (sim.results) are not served for the new engine.
+ENGINE_VERSION = 5
+
+# Rows of the (trials, nodes) matrix processed at once by the vectorized engine.
+# Bounds the size of the temporaries used while gathering parent columns, and
+# is the unit of work (and of random stream) handed to parallel workers.
+CHUNK_TRIALS = 8192
+# Values (rows * nodes) sampled and propagated at once inside a chunk, so the
+# per-level temporaries stay in cache; rows are independent, so this does not
+# change any draw or result
+BLOCK_VALUES = 1 << 18
+
+# Discrete engine: worlds per packed word, words per chunk (and per random stream),
+# and the precision of each Bernoulli draw (p is rounded to a multiple of 2**-BERNOULLI_BITS)
+WORD_BITS = 64
+DISCRETE_CHUNK_WORDS = 1024
+BERNOULLI_BITS = 16
+
 
 def run_trials(
     nodes: List[SimNode],
-    edges: List[Tuple[str, str]],
+    edges: List[Tuple[str, ...]],
+    trials: int = 20000,
+    seed: int | None = None,
+    engine: str = DEFAULT_ENGINE,
+    workers: int = 1,
+    exact: str = DEFAULT_EXACT,
+    metadata: Dict | None = None,
+) -> Dict:
+    """
+    Run the Monte Carlo simulation with the selected engine.
+
+    engine="vectorized" samples every node for a block of trials at once with
+    a seeded numpy Generator; engine="scalar" is the original per-trial loop.
+    Both return the same result schema and agree statistically, but they
+    consume random numbers differently so a fixed seed gives different draws.
+
+    Both propagate probabilities as if a node's parents were independent,
+    which overstates reachability when paths share an ancestor.
+    engine="discrete" instead samples whether every node succeeds in every
+    trial and propagates the actual outcomes (see _run_trials_discrete),
+    which stays exact under shared ancestors; trials are rounded up to a
+    multiple of WORD_BITS.
+
+    workers > 1 spreads the vectorized engine's chunks over a process pool;
+    the output is identical to workers=1 for the same seed.
+
+    exact selects which nodes keep every sample for exact percentiles
+    ("goals", "all" or "none"); the others use the histogram sketch in
+    sim.sketch, accurate to 1/DEFAULT_BINS.
+
+    metadata is the graph's AttackGraph.metadata (controls and
+    attacker_capability); with the nodes' p_detect, controls and weights it
+    enables the threat model in sim.threat.
+    """
+    return simulate_plan(
+        compile_graph(nodes, edges, metadata), trials=trials, seed=seed, engine=engine, workers=workers, exact=exact
+    )
+
+
+def simulate_plan(
+    plan: CompiledGraph,
+    trials: int = 20000,
+    seed: int | None = None,
+    engine: str = DEFAULT_ENGINE,
+    progress: Callable[[float], None] | None = None,
+    workers: int = 1,
+    exact: str = DEFAULT_EXACT,
+) -> Dict:
+    """
+    run_trials over an already compiled graph (see sim.compiled.graph_plan).
+
+    `progress`, if given, is called with the completed fraction (0..1) as the
+    engine works through the trials. `workers` only applies to the vectorized
+    engine.
+    """
+    exact_cols = exact_columns(exact, plan.n, plan.goal_cols)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+    t0 = time.perf_counter()
+    with span("simulate"):
+        if engine == "vectorized":
+            result = _run_trials_vectorized(
+                plan, trials=trials, seed=seed, progress=progress, workers=workers, exact_cols=exact_cols
+            )
+        elif engine == "scalar":
+            result = _run_trials_scalar(plan, trials=trials, seed=seed, progress=progress, exact_cols=exact_cols)
+        else:
+            result = _run_trials_discrete(plan, trials=trials, seed=seed, progress=progress, exact_cols=exact_cols)
+    metrics.record_simulation(engine, result["trials"], time.perf_counter() - t0)
+    return result
+
+
+def _run_trials_scalar(
+    plan: CompiledGraph,
     trials: int = 20000,
     seed: int | None = None,
+    progress: Callable[[float], None] | None = None,
+    exact_cols: np.ndarray = (),
 ) -> Dict:
     """
     Deterministic Monte Carlo over node success probabilities.
 
     For each trial:
-      - Sample a p_succ for every node from its (min, mode, max) spec.
+      - Sample a p_succ for every node from its spec (sim.distributions).
       - Propagate *probabilities* through the graph (no inner Bernoulli).
       - Compute the probability that any goal is reached in that world.
 
     The result is a distribution over "probability attacker reaches any goal",
-    which reflects uncertainty in the input triangular specs instead of
+    which reflects uncertainty in the input p_succ specs instead of
     collapsing to a narrow confidence interval around a single mean.
     """
     if seed is not None:
         random.seed(seed)
 
-    # adjacency & parents
-    children: Dict[str, List[str]] = {}
-    parents: Dict[str, List[str]] = {}
-    indeg: Dict[str, int] = {n.node_id: 0 for n in nodes}
-    # ---- TOPOLOGICAL ORDER (do this ONCE) ----
-    topo, _ = topo_sort(nodes, edges)
-
-    for s, t in edges:
-        children.setdefault(s, []).append(t)
-        parents.setdefault(t, []).append(s)
-        indeg[t] = indeg.get(t, 0) + 1
-
-    by_id = {n.node_id: n for n in nodes}
-
-    footholds = [n.node_id for n in nodes if n.node_type == "foothold"]
-    goals = [n.node_id for n in nodes if n.node_type == "goal"]
-
-    if not footholds:
-        # If no explicit foothold, treat zero-indegree nodes as starting points
-        footholds = [nid for nid, d in indeg.items() if d == 0]
-
-    # Topological order for DAG-style propagation
-    #topo: List[str] = []
-    from collections import deque
-
-    dq = deque([nid for nid, d in indeg.items() if d == 0])
-    indeg_copy = dict(indeg)
-    while dq:
-        u = dq.popleft()
-        topo.append(u)
-        for v in children.get(u, []):
-            indeg_copy[v] -= 1
-            if indeg_copy[v] == 0:
-                dq.append(v)
-
-    # Metrics accumulated across trials
-    any_goal_samples: List[float] = []
-    node_prob_sum: Dict[str, float] = {n.node_id: 0.0 for n in nodes}
-    node_samples: Dict[str, List[float]] = {n.node_id: [] for n in nodes}
-    goal_prob_sum: Dict[str, float] = {g: 0.0 for g in goals}
-    goal_samples: Dict[str, List[float]] = {g: [] for g in goals}
-
-    for _ in range(trials):
-        # 1) Sample p_succ for each node
-        pmap: Dict[str, float] = {
-            n.node_id: draw_p(n.p_succ) for n in nodes
-        }
-
-        # 2) Propagate reachability probabilities
-        reach: Dict[str, float] = {n.node_id: 0.0 for n in nodes}
-
-        for nid in topo:
-            if nid in footholds:
+    n = plan.n
+    width = _uniform_width(plan)
+    parents = [plan.parents_of(j).tolist() for j in range(n)]
+    required = [plan.requires[plan.indptr[j]:plan.indptr[j + 1]].tolist() for j in range(n)]
+    threshold = plan.threshold.tolist()
+    foothold = plan.foothold.tolist()
+    goal_cols = plan.goal_cols.tolist()
+
+    any_goal = np.zeros(trials, dtype=float)
+    stats = ReachStats(n, trials, exact_cols)
+    # Per-trial rows are buffered and handed to the accumulator a chunk at a time
+    buf = np.empty((min(CHUNK_TRIALS, trials), n), dtype=float)
+    # Trials sampled per _sample_p call; the uniforms are drawn in the same order either way
+    step = max(1, BLOCK_VALUES // width)
+
+    for t in range(trials):
+        # 1) Sample p_succ for each node (and the threat model's draws) from one uniform each
+        if t % step == 0:
+            rows = min(step, trials - t)
+            u = np.array([random.random() for _ in range(rows * width)]).reshape(rows, width)
+            pblock = _sample_p(plan, u).tolist()
+        pvec = pblock[t % step]
+
+        # 2) Propagate reachability probabilities in topological order
+        reach = [0.0] * n
+        for j in range(n):
+            if foothold[j]:
                 # foothold: attacker starts here with probability p_succ
-                reach[nid] = pmap.get(nid, 0.0)
+                reach[j] = pvec[j]
+            elif threshold[j] == 1 and not any(required[j]):
+                # Probability that *any* parent is compromised
+                #   P(any parent) = 1 - Π (1 - reach[parent])
+                no_parent = 1.0
+                for p in parents[j]:
+                    no_parent *= (1.0 - reach[p])
+                reach[j] = (1.0 - no_parent) * pvec[j]
             else:
-                ps = parents.get(nid, [])
-                if not ps:
-                    # orphan node with no parents and not a foothold: unreachable
-                    reach[nid] = 0.0
-                else:
-                    # Probability that *any* parent is compromised
-                    #   P(any parent) = 1 - Π (1 - reach[parent])
-                    no_parent = 1.0
-                    for p in ps:
-                        no_parent *= (1.0 - reach[p])
-                    parent_any = 1.0 - no_parent
-
-                    # Node compromise probability given parents
-                    reach[nid] = parent_any * pmap.get(nid, 0.0)
+                # Every required parent, and at least k of the others
+                gate = 1.0
+                dist = [1.0] + [0.0] * threshold[j]  # P(count == c) for c < k; last entry: >= k
+                for p, req in zip(parents[j], required[j]):
+                    if req:
+                        gate *= reach[p]
+                    elif threshold[j]:
+                        r = reach[p]
+                        dist[-1] += dist[-2] * r
+                        for c in range(len(dist) - 2, 0, -1):
+                            dist[c] = dist[c] * (1.0 - r) + dist[c - 1] * r
+                        dist[0] *= (1.0 - r)
+                reach[j] = gate * dist[-1] * pvec[j]
+            # orphan node with no parents and not a foothold: P(any parent) = 0
 
         # 3) Probability any goal is reached in this world
-        if goals:
-            no_goal = 1.0
-            for g in goals:
-                no_goal *= (1.0 - reach[g])
-            any_goal_prob = 1.0 - no_goal
-        else:
-            any_goal_prob = 0.0
-
-        any_goal_samples.append(any_goal_prob)
-
-        # accumulate for node & goal activation "rates" - note - prob_sum deprecated with second order use but still used for color/etc.
-        for nid in reach:
-            node_prob_sum[nid] += reach[nid]
-            node_samples[nid].append(reach[nid])
-        for g in goals:
-            goal_prob_sum[g] += reach[g]
-            goal_samples[g].append(reach[g])
-
-    # Deprecated: Node_prob_sum no longer needed since distributions provides more complete data but kept for legacy reasons - some frontend code depends on it
-    node_activation_rates = {
-        nid: node_prob_sum[nid] / float(trials) for nid in node_prob_sum
-    }
-    goal_success_rates = {
-        g: goal_prob_sum[g] / float(trials) for g in goal_prob_sum
-    }
-
-    arr = np.array(any_goal_samples, dtype=float)
-    mean = float(arr.mean()) if trials > 0 else 0.0
-    p10 = float(np.percentile(arr, 10)) if trials > 0 else 0.0
-    p50 = float(np.percentile(arr, 50)) if trials > 0 else 0.0
-    p90 = float(np.percentile(arr, 90)) if trials > 0 else 0.0
-
-    # Percentile distributions for each goal
-    goal_distributions = {}
-    for g, arr in goal_samples.items():
-        arr = np.array(arr, float)
-        goal_distributions[g] = {
-            "mean": float(arr.mean()) if len(arr) > 0 else 0.0,
-            "p10": float(np.percentile(arr, 10)) if len(arr) > 0 else 0.0,
-            "p50": float(np.percentile(arr, 50)) if len(arr) > 0 else 0.0,
-            "p90": float(np.percentile(arr, 90)) if len(arr) > 0 else 0.0,
+        no_goal = 1.0
+        for g in goal_cols:
+            no_goal *= (1.0 - reach[g])
+        any_goal[t] = 1.0 - no_goal if goal_cols else 0.0
+
+        row = t % CHUNK_TRIALS
+        buf[row] = reach
+        if row == CHUNK_TRIALS - 1 or t == trials - 1:
+            stats.update(t - row, buf[:row + 1])
+            if progress is not None:
+                progress((t + 1) / trials)
+
+    return _result(plan, trials, any_goal, stats)
+
+
+def _distribution(arr: np.ndarray) -> Dict[str, float]:
+    if arr.size == 0:
+        return {"mean": 0.0, "p10": 0.0, "p50": 0.0, "p90": 0.0}
+    p10, p50, p90 = np.percentile(arr, [10, 50, 90])
+    return {"mean": float(arr.mean()), "p10": float(p10), "p50": float(p50), "p90": float(p90)}
+
+
+def _result(plan: CompiledGraph, trials: int, any_goal: np.ndarray, stats: ReachStats) -> Dict:
+    """Assemble the response schema from per-trial any-goal samples and the node accumulator."""
+    with span("stats"):
+        success = _distribution(any_goal)
+        means = stats.means()
+        pct = stats.quantiles([0.10, 0.50, 0.90])
+
+    node_distributions = {
+        nid: {
+            "mean": float(means[j]),
+            "p10": float(pct[0, j]),
+            "p50": float(pct[1, j]),
+            "p90": float(pct[2, j]),
         }
-
-    node_distributions = {}
-    for nid, arr in node_samples.items():
-        arr = np.array(arr, float)
-        if len(arr):
-            node_distributions[nid] = {
-                "mean": float(arr.mean()),
-                "p10": float(np.percentile(arr, 10)),
-                "p50": float(np.percentile(arr, 50)),
-                "p90": float(np.percentile(arr, 90)),
-            }
-        else:
-            node_distributions[nid] = {
-                "mean": 0.0, "p10": 0.0, "p50": 0.0, "p90": 0.0
-            }
+        for j, nid in enumerate(plan.ids)
+    }
+    goal_distributions = {g: dict(node_distributions[g]) for g in plan.goal_ids}
 
     return {
         "trials": trials,
-        "success_rate_any_goal": mean,
-        "success_distribution": {
-            "mean": mean,
-            "p10": p10,
-            "p50": p50,
-            "p90": p90,
-        },
-        "goal_success_rates": goal_success_rates,  # preserved (means)
+        "success_rate_any_goal": success["mean"],
+        "success_distribution": success,
+        "goal_success_rates": {g: node_distributions[g]["mean"] for g in plan.goal_ids},
         "goal_distributions": goal_distributions,
-        "node_activation_rates": node_activation_rates,
+        "node_activation_rates": {nid: float(means[j]) for j, nid in enumerate(plan.ids)},
         "node_distributions": node_distributions,
     }
 
 
+def _chunk_streams(seed: int | None, trials: int) -> List[np.random.SeedSequence]:
+    """
+    One independent stream per CHUNK_TRIALS block, spawned from the request
+    seed. Chunk k always gets stream k, so the draws do not depend on how
+    chunks are distributed over workers.
+    """
+    n_chunks = -(-trials // CHUNK_TRIALS)
+    return np.random.SeedSequence(seed).spawn(n_chunks)
+
+
+def _uniform_width(plan: CompiledGraph) -> int:
+    """Uniforms per trial: one per node, then the threat model's."""
+    return plan.n + (plan.threat.n_uniforms if plan.threat is not None else 0)
+
+
+def _sample_p(
+    plan: CompiledGraph, u: np.ndarray, cols: np.ndarray | None = None, dists: Distributions | None = None
+) -> np.ndarray:
+    """
+    Effective node probabilities from a (rows, _uniform_width) uniform block,
+    for all columns or only `cols`: p_succ clipped to [0, 1] like draw_p, then
+    the threat model if the graph has one. `dists` overrides the plan's p_succ.
+    """
+    out = (dists or plan.dists).sample(u[:, :plan.n] if cols is None else u[:, cols], cols)
+    np.maximum(out, 0.0, out=out)
+    np.minimum(out, 1.0, out=out)
+    if plan.threat is not None:
+        out = plan.threat.apply(out, u[:, plan.n:], cols)
+    return out
+
+
+def _count_dist(reach: np.ndarray, gather: np.ndarray, kmax: int) -> np.ndarray:
+    """
+    Poisson-binomial distribution of reached parents per gather row: the
+    (kmax, rows, len(gather)) P(count == c) for c < kmax, one contiguous
+    plane per count so every slot is a few in-place row operations.
+    """
+    dist = np.zeros((kmax, reach.shape[0], gather.shape[0]), dtype=float)
+    dist[0] = 1.0
+    for s in range(gather.shape[1]):
+        r = reach[:, gather[:, s]]
+        for c in range(kmax - 1, 0, -1):
+            # dist[c] = dist[c] * (1 - r) + dist[c - 1] * r
+            dist[c] += (dist[c - 1] - dist[c]) * r
+        dist[0] *= 1.0 - r
+    return dist
+
+
+def _at_least(dist: np.ndarray, k: np.ndarray) -> np.ndarray:
+    """P(count >= k) per column from a (kmax, rows, cols) distribution, k <= kmax; k == 0 gives 1."""
+    below = np.zeros(dist.shape[1:], dtype=float)
+    for c in range(dist.shape[0]):
+        below += dist[c] * (c < k)
+    return np.where(k > 0, np.clip(1.0 - below, 0.0, 1.0), 1.0)
+
+
+def _gate_parts(g: GateBlock, reach: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(P(all required parents), P(>= k optional parents)), each (rows, len(g.cols))."""
+    rows = reach.shape[0]
+    if not g.req_mask.any():
+        req = np.ones((rows, g.cols.size), dtype=float)
+    elif g.req_mask.all():
+        req = np.prod(reach[:, g.required], axis=2)
+    else:
+        req = np.prod(np.where(g.req_mask, reach[:, g.required], 1.0), axis=2)
+    kmax = int(g.k.max(initial=0))
+    if kmax == 0:
+        return req, np.ones((rows, g.cols.size), dtype=float)
+    # Thresholds 0 and 1 use the plain OR arithmetic; only k >= 2 needs the count distribution
+    opt = np.where(g.k > 0, 1.0 - np.prod(1.0 - reach[:, g.gather], axis=2), 1.0)
+    if kmax > 1:
+        multi = np.flatnonzero(g.k > 1)
+        opt[:, multi] = _at_least(_count_dist(reach, g.gather[multi], kmax), g.k[multi])
+    return req, opt
+
+
+def _propagate(plan: CompiledGraph, p: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    (rows, n + 1) reach for a (rows, n) block of node probabilities, written
+    to `out` (zero-filled, e.g. rows of an np.zeros block) when given.
+    """
+    # Column n is a sentinel that always holds reach 0; gather pads with it.
+    reach = np.zeros((p.shape[0], plan.n + 1), dtype=float) if out is None else out
+    for block in plan.blocks:
+        if block.starts.size:
+            reach[:, block.starts] = p[:, block.starts]
+        if block.inner.size:
+            no_parent = np.prod(1.0 - reach[:, block.gather], axis=2)
+            reach[:, block.inner] = (1.0 - no_parent) * p[:, block.inner]
+        if block.gated is not None:
+            req, opt = _gate_parts(block.gated, reach)
+            reach[:, block.gated.cols] = req * opt * p[:, block.gated.cols]
+    return reach
+
+
+def _propagate_dirty(plan: CompiledGraph, reach: np.ndarray, p: np.ndarray, dirty: np.ndarray) -> None:
+    """
+    Recompute, in place, only the `dirty` columns of a (rows, n + 1) reach
+    block whose other columns are already valid. `dirty` must be closed under
+    descendants (see sim.incremental.dirty_columns); `p` is only read there.
+    """
+    for block in plan.blocks:
+        starts = block.starts[dirty[block.starts]]
+        if starts.size:
+            reach[:, starts] = p[:, starts]
+        rows = dirty[block.inner]
+        if rows.any():
+            inner = block.inner[rows]
+            no_parent = np.prod(1.0 - reach[:, block.gather[rows]], axis=2)
+            reach[:, inner] = (1.0 - no_parent) * p[:, inner]
+        if block.gated is not None:
+            rows = dirty[block.gated.cols]
+            if rows.any():
+                g = block.gated.subset(rows)
+                req, opt = _gate_parts(g, reach)
+                reach[:, g.cols] = req * opt * p[:, g.cols]
+
+
+def _any_goal(plan: CompiledGraph, reach: np.ndarray) -> np.ndarray:
+    if plan.goal_cols.size:
+        return 1.0 - np.prod(1.0 - reach[:, plan.goal_cols], axis=1)
+    return np.zeros(reach.shape[0], dtype=float)
+
+
+def _chunk_uniforms(plan: CompiledGraph, stream: np.random.SeedSequence, rows: int) -> np.ndarray:
+    rng = np.random.default_rng(stream)
+    u = rng.random((plan.n, rows))
+    if plan.threat is None:
+        return u.T
+    # Drawn after the node block so p_succ draws match graphs without a threat model
+    return np.vstack([u, rng.random((plan.threat.n_uniforms, rows))]).T
+
+
+def _propagate_chunk(plan: CompiledGraph, stream: np.random.SeedSequence, rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sample and propagate one chunk; returns ((rows, n) reach, (rows,) any-goal)."""
+    with span("sample"):
+        u = _chunk_uniforms(plan, stream, rows)
+    reach = np.zeros((rows, plan.n + 1), dtype=float, order="F")
+    step = max(64, BLOCK_VALUES // max(plan.n, 1))
+    for start in range(0, rows, step):
+        with span("sample"):
+            p = _sample_p(plan, u[start:start + step])
+        with span("propagate"):
+            _propagate(plan, p, out=reach[start:start + step])
+    with span("propagate"):
+        return reach[:, :plan.n], _any_goal(plan, reach)
+
+
+def _run_trials_vectorized(
+    plan: CompiledGraph,
+    trials: int = 20000,
+    seed: int | None = None,
+    progress: Callable[[float], None] | None = None,
+    workers: int = 1,
+    exact_cols: np.ndarray = (),
+) -> Dict:
+    """
+    Batched version of the scalar engine with identical semantics.
+
+    Node probabilities are drawn as a (trials, nodes) matrix and reachability
+    is propagated one topological level at a time: every node in a level reads
+    its parents' columns in a single gather, so the Python loop runs once per
+    level and per chunk of trials instead of once per node and per trial.
+    Each chunk is folded into a ReachStats accumulator and then dropped.
+    """
+    streams = _chunk_streams(seed, trials)
+    # A daemonic process cannot start a pool; the in-process path gives the same output
+    if workers > 1 and len(streams) > 1 and not multiprocessing.current_process().daemon:
+        return _run_trials_parallel(plan, trials, streams, progress, workers, exact_cols)
+
+    any_goal = np.zeros(trials, dtype=float)
+    stats = ReachStats(plan.n, trials, exact_cols)
+
+    for k, stream in enumerate(streams):
+        start = k * CHUNK_TRIALS
+        stop = min(start + CHUNK_TRIALS, trials)
+        reach, any_goal[start:stop] = _propagate_chunk(plan, stream, stop - start)
+        with span("stats"):
+            stats.update(start, reach)
+        if progress is not None:
+            progress(stop / trials)
+
+    return _result(plan, trials, any_goal, stats)
+
+
+_ALL_BITS = np.uint64(2 ** 64 - 1)
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits of every uint64 element."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return _POPCOUNT8[words.view(np.uint8)].reshape(words.shape + (8,)).sum(axis=-1)
+
+
+def _bernoulli_words(p: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """
+    (cols, words) uint64 of independent Bernoulli bits for a (words, cols)
+    block of probabilities; all bits of word w use p[w]. Binary expansion:
+    from the least significant bit of p up, a fresh random word is ANDed in
+    where the bit is 0 and ORed in where it is 1, so BERNOULLI_BITS random
+    words give 64 draws.
+    """
+    scale = 1 << BERNOULLI_BITS
+    q = np.rint(np.ascontiguousarray(p.T) * scale).astype(np.uint64)
+    out = np.zeros(q.shape, dtype=np.uint64)
+    t = np.empty_like(out)
+    for i in range(BERNOULLI_BITS):
+        r = np.frombuffer(rng.bytes(8 * q.size), dtype=np.uint64).reshape(q.shape)
+        mask = np.uint64(0) - ((q >> np.uint64(i)) & np.uint64(1))
+        # out = bit ? out | r : out & r
+        np.bitwise_xor(out, r, out=t)
+        t &= mask
+        out &= r
+        out |= t
+    out[q >= scale] = _ALL_BITS
+    return out
+
+
+def _gate_bits(g: GateBlock, bits: np.ndarray) -> np.ndarray:
+    """Worlds where all required and at least k optional parents are reached, (len(g.cols), words)."""
+    words = bits.shape[1]
+    if g.req_mask.any():
+        req = bits[g.required]
+        if not g.req_mask.all():
+            req |= np.where(g.req_mask, np.uint64(0), _ALL_BITS)[:, :, None]
+        out = np.bitwise_and.reduce(req, axis=1)
+    else:
+        out = np.full((g.cols.size, words), _ALL_BITS)
+    kmax = int(g.k.max(initial=0))
+    if kmax:
+        # Bit-sliced counter: at_least[j] holds the worlds with >= j optional parents reached
+        at_least = np.zeros((kmax + 1, g.cols.size, words), dtype=np.uint64)
+        at_least[0] = _ALL_BITS
+        for s in range(g.gather.shape[1]):
+            x = bits[g.gather[:, s]]
+            for j in range(kmax, 0, -1):
+                at_least[j] |= at_least[j - 1] & x
+        out &= at_least[g.k, np.arange(g.cols.size)]
+    return out
+
+
+def _propagate_bits(plan: CompiledGraph, success: np.ndarray) -> np.ndarray:
+    """(n + 1, words) reached-world bits from (n, words) success bits; row n is the zero sentinel."""
+    bits = np.zeros((plan.n + 1, success.shape[1]), dtype=np.uint64)
+    for block in plan.blocks:
+        if block.starts.size:
+            bits[block.starts] = success[block.starts]
+        if block.inner.size:
+            bits[block.inner] = np.bitwise_or.reduce(bits[block.gather], axis=1) & success[block.inner]
+        if block.gated is not None:
+            bits[block.gated.cols] = _gate_bits(block.gated, bits) & success[block.gated.cols]
+    return bits
+
+
+def _run_trials_discrete(
+    plan: CompiledGraph,
+    trials: int = 20000,
+    seed: int | None = None,
+    progress: Callable[[float], None] | None = None,
+    exact_cols: np.ndarray = (),
+) -> Dict:
+    """
+    Discrete-world engine: each trial is one world in which every node either
+    succeeds or not, and a node is reached when its gate holds over its
+    parents' actual outcomes, so paths through a shared ancestor stay
+    correlated. Worlds are packed WORD_BITS to a uint64 and propagated with
+    bitwise OR / AND over whole rows of words.
+
+    The worlds of one word share a draw of every p_succ (and of the threat
+    model), so parameter uncertainty is still sampled: the fraction of a
+    word's worlds reaching a node is the sample that feeds the percentiles,
+    and the means are exact fractions of all worlds.
+    """
+    words = -(-trials // WORD_BITS)
+    trials = words * WORD_BITS
+    n_chunks = -(-words // DISCRETE_CHUNK_WORDS)
+    any_goal = np.zeros(words, dtype=float)
+    stats = ReachStats(plan.n, words, exact_cols)
+
+    for k, stream in enumerate(np.random.SeedSequence(seed).spawn(n_chunks)):
+        start = k * DISCRETE_CHUNK_WORDS
+        stop = min(start + DISCRETE_CHUNK_WORDS, words)
+        draws, outcomes = stream.spawn(2)
+        with span("sample"):
+            p = _sample_p(plan, _chunk_uniforms(plan, draws, stop - start))
+            success = _bernoulli_words(p, np.random.default_rng(outcomes))
+        with span("propagate"):
+            bits = _propagate_bits(plan, success)
+        with span("stats"):
+            if plan.goal_cols.size:
+                any_goal[start:stop] = _popcount(np.bitwise_or.reduce(bits[plan.goal_cols], axis=0)) / WORD_BITS
+            stats.update(start, _popcount(bits[:plan.n].T) / WORD_BITS)
+        if progress is not None:
+            progress(stop / words)
+
+    result = _result(plan, trials, any_goal, stats)
+    result["discrete"] = {"worlds_per_draw": WORD_BITS, "parameter_draws": words}
+    return result
+
+
+# Process pool shared by parallel runs; rebuilt when a different size is asked for.
+_pool: ProcessPoolExecutor | None = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # spawn: forking a threaded web worker is not safe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_size = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the shared process pool, if one was started."""
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        _pool, _pool_size = None, 0
+
+
+def _forget_pool() -> None:
+    # A forked child cannot use its parent's pool: the executor's threads are not copied
+    global _pool, _pool_size, _pool_lock
+    _pool, _pool_size, _pool_lock = None, 0, threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_pool)
+
+
+def _parallel_chunk(plan: CompiledGraph, stream, rows: int, exact_cols: np.ndarray) -> Tuple[ReachStats, np.ndarray]:
+    """Worker side: one chunk, returned as a partial accumulator plus its any-goal samples."""
+    reach, any_goal = _propagate_chunk(plan, stream, rows)
+    stats = ReachStats(plan.n, rows, exact_cols)
+    stats.update(0, reach)
+    return stats, any_goal
+
+
+def _run_trials_parallel(
+    plan: CompiledGraph,
+    trials: int,
+    streams: List[np.random.SeedSequence],
+    progress: Callable[[float], None] | None,
+    workers: int,
+    exact_cols: np.ndarray,
+) -> Dict:
+    """
+    Vectorized engine with chunks farmed out to a process pool. Workers send
+    back partial accumulators, which merge exactly (sums and bin counts add,
+    exact samples land at their chunk offset), so the output matches the
+    single-process path bit for bit.
+    """
+    workers = max(1, min(workers, os.cpu_count() or 1, len(streams)))
+    pool = _get_pool(workers)
+    futures = {}
+    for k, stream in enumerate(streams):
+        start = k * CHUNK_TRIALS
+        stop = min(start + CHUNK_TRIALS, trials)
+        futures[pool.submit(_parallel_chunk, plan, stream, stop - start, exact_cols)] = start
+
+    # Partials are merged in chunk order so float sums do not depend on timing
+    partials = {}
+    done = 0
+    for fut in as_completed(futures):
+        partials[futures[fut]] = fut.result()
+        done += partials[futures[fut]][0].trials
+        if progress is not None:
+            progress(done / trials)
+
+    any_goal = np.zeros(trials, dtype=float)
+    stats = ReachStats(plan.n, trials, exact_cols)
+    for start in sorted(partials):
+        part, goal = partials[start]
+        stats.merge(start, part)
+        any_goal[start:start + part.trials] = goal
+    return _result(plan, trials, any_goal, stats)
+
+
+# 95% two-sided normal quantile used by the adaptive stopping rule
+Z_95 = 1.959963984540054
+
+
+def _quantile_halfwidth(sorted_arr: np.ndarray, q: float) -> float:
+    """
+    Half-width of a distribution-free 95% CI for the q-quantile, from the
+    order statistics at ranks N*q -/+ z*sqrt(N*q*(1-q)).
+    """
+    n = sorted_arr.size
+    if n < 2:
+        return float("inf")
+    spread = Z_95 * np.sqrt(n * q * (1.0 - q))
+    lo = int(max(0, np.floor(n * q - spread)))
+    hi = int(min(n - 1, np.ceil(n * q + spread)))
+    return float(sorted_arr[hi] - sorted_arr[lo]) / 2.0
+
+
+def simulate_adaptive(
+    plan: CompiledGraph,
+    tolerance: float = 0.005,
+    max_trials: int = 200_000,
+    min_trials: int = CHUNK_TRIALS,
+    time_budget: float | None = None,
+    seed: int | None = None,
+    progress: Callable[[float], None] | None = None,
+    exact: str = DEFAULT_EXACT,
+) -> Dict:
+    """
+    Vectorized engine that runs chunk by chunk until the 95% CI half-width of
+    success_rate_any_goal and of its p10/p50/p90 (and of every goal's
+    percentiles when goals keep exact samples) is within `tolerance`, or until
+    max_trials / time_budget seconds is reached.
+
+    Chunk k draws from the same stream as in a fixed-size run, so stopping at
+    N trials gives the same numbers as simulate_plan(trials=N) when N is a
+    multiple of CHUNK_TRIALS.
+    """
+    started = time.monotonic()
+    root = np.random.SeedSequence(seed)
+    exact_cols = exact_columns(exact, plan.n, plan.goal_cols)
+    goal_exact = [np.flatnonzero(exact_cols == g)[0] for g in plan.goal_cols if g in exact_cols]
+
+    any_goal = np.zeros(max_trials, dtype=float)
+    stats = ReachStats(plan.n, max_trials, exact_cols)
+    used = 0
+    stop_reason = "max_trials"
+    halfwidths: Dict[str, float] = {}
+
+    while used < max_trials:
+        rows = min(CHUNK_TRIALS, max_trials - used)
+        reach, any_goal[used:used + rows] = _propagate_chunk(plan, root.spawn(1)[0], rows)
+        stats.update(used, reach)
+        used += rows
+        if progress is not None:
+            progress(used / max_trials)
+        if used < min_trials:
+            continue
+
+        arr = np.sort(any_goal[:used])
+        halfwidths = {"mean": float(Z_95 * arr.std(ddof=1) / np.sqrt(used))}
+        for q, name in ((0.10, "p10"), (0.50, "p50"), (0.90, "p90")):
+            halfwidths[name] = _quantile_halfwidth(arr, q)
+        goal_widths = [
+            _quantile_halfwidth(np.sort(stats.samples[i, :used]), q)
+            for i in goal_exact for q in (0.10, 0.50, 0.90)
+        ]
+        if max(list(halfwidths.values()) + goal_widths) <= tolerance:
+            stop_reason = "converged"
+            break
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            stop_reason = "time_budget"
+            break
+
+    result = _result(plan, used, any_goal[:used], stats)
+    result["adaptive"] = {
+        "trials_used": used,
+        "max_trials": max_trials,
+        "tolerance": tolerance,
+        "standard_error": halfwidths.get("mean", float("inf")) / Z_95,
+        "ci95_halfwidth": halfwidths,
+        "stop_reason": stop_reason,
+    }
+    return result
@@ -0,0 +1,157 @@
+from __future__ import annotations
+from typing import Sequence
+import numpy as np
+
+"""
+Streaming per-node statistics for the Monte Carlo engines.
+
+Reach probabilities live in [0, 1], so a fixed-bin histogram per node is an
+exact-mergeable quantile sketch: chunks (or parallel workers) add their bin
+counts and the memory cost is O(nodes * bins) whatever the trial count.
+Quantiles read from it are within one bin width (1 / bins) of the exact
+np.percentile value; means are exact. Selected columns (goals by default)
+can keep their raw samples instead, for exact percentiles where they matter.
+"""
+
+DEFAULT_BINS = 2048
+
+EXACT_MODES = ("goals", "all", "none")
+DEFAULT_EXACT = "goals"
+
+
+class ReachStats:
+    """Mean/quantile accumulator over a (trials, n) stream of reach values."""
+
+    def __init__(self, n: int, trials: int, exact_cols: Sequence[int] = (), bins: int = DEFAULT_BINS):
+        self.n = n
+        self.trials = trials
+        self.bins = bins
+        self.exact_cols = np.asarray(exact_cols, dtype=np.intp)
+        hist = np.ones(n, dtype=bool)
+        hist[self.exact_cols] = False
+        self.hist_cols = np.flatnonzero(hist)
+
+        self.count = 0
+        self.sums = np.zeros(n, dtype=float)
+        self.lo = np.full(n, np.inf)
+        self.hi = np.full(n, -np.inf)
+        self.counts = np.zeros((len(self.hist_cols), bins), dtype=np.int64)
+        self.samples = np.empty((len(self.exact_cols), trials), dtype=float)
+
+    def update(self, start: int, reach: np.ndarray) -> None:
+        """Absorb rows start..start+len(reach) of the (trials, n) reach matrix."""
+        rows = reach.shape[0]
+        if not rows:
+            return
+        self.count += rows
+        self.sums += reach.sum(axis=0)
+        np.minimum(self.lo, reach.min(axis=0), out=self.lo)
+        np.maximum(self.hi, reach.max(axis=0), out=self.hi)
+        if self.exact_cols.size:
+            self.samples[:, start:start + rows] = reach[:, self.exact_cols].T
+        if self.hist_cols.size > self.n // 2:
+            # Histogram every column and drop the few exact ones: cheaper than gathering the rest
+            self.counts += self.chunk_counts(reach)[self.hist_cols]
+        elif self.hist_cols.size:
+            self.counts += self.chunk_counts(reach[:, self.hist_cols])
+
+    def chunk_counts(self, block: np.ndarray) -> np.ndarray:
+        """(k, bins) histogram of a (rows, k) block, one row per column."""
+        k = block.shape[1]
+        # Column-major bin indices, so bincount fills one column's bins at a time
+        idx = np.multiply(block.T, self.bins, order="C").astype(np.intp)
+        np.maximum(idx, 0, out=idx)
+        np.minimum(idx, self.bins - 1, out=idx)
+        idx += (np.arange(k, dtype=np.intp) * self.bins)[:, None]
+        return np.bincount(idx.ravel(), minlength=k * self.bins).reshape(k, self.bins)
+
+    def merge(self, start: int, other: "ReachStats") -> None:
+        """Add a partial accumulator that covered rows start..start+other.trials."""
+        self.count += other.count
+        self.sums += other.sums
+        np.minimum(self.lo, other.lo, out=self.lo)
+        np.maximum(self.hi, other.hi, out=self.hi)
+        self.counts += other.counts
+        self.samples[:, start:start + other.trials] = other.samples
+
+    def refresh(self, cols: np.ndarray, reach: np.ndarray, chunk: int) -> None:
+        """
+        Recompute the statistics of `cols` from the full (trials, >= n) reach
+        matrix, in the same chunking as the original updates so sums match.
+        """
+        cols = np.asarray(cols, dtype=np.intp)
+        if not cols.size:
+            return
+        self.sums[cols] = 0.0
+        self.lo[cols] = np.inf
+        self.hi[cols] = -np.inf
+        exact = np.isin(self.exact_cols, cols)
+        hist = np.isin(self.hist_cols, cols)
+        self.counts[hist] = 0
+        for start in range(0, self.count, chunk):
+            # Summed over the same full-width block as update() so float sums are identical
+            self.sums[cols] += reach[start:start + chunk, :self.n].sum(axis=0)[cols]
+            block = reach[start:start + chunk, cols]
+            self.lo[cols] = np.minimum(self.lo[cols], block.min(axis=0))
+            self.hi[cols] = np.maximum(self.hi[cols], block.max(axis=0))
+        if exact.any():
+            self.samples[exact] = reach[:self.count, self.exact_cols[exact]].T
+        if hist.any():
+            hc = self.hist_cols[hist]
+            for start in range(0, self.count, chunk):
+                self.counts[hist] += self.chunk_counts(reach[start:start + chunk, hc])
+
+    def spliced(self, cols: np.ndarray, other: "ReachStats") -> "ReachStats":
+        """
+        A copy of this accumulator with columns `cols` replaced by `other`,
+        which accumulated just those columns (same order, same exact columns).
+        """
+        cols = np.asarray(cols, dtype=np.intp)
+        out = ReachStats.__new__(ReachStats)
+        out.__dict__.update(self.__dict__)
+        out.count = other.count
+        for name in ("sums", "lo", "hi"):
+            values = getattr(self, name).copy()
+            values[cols] = getattr(other, name)
+            setattr(out, name, values)
+        out.counts = self.counts.copy()
+        out.counts[np.searchsorted(self.hist_cols, cols[other.hist_cols])] = other.counts
+        out.samples = self.samples.copy()
+        out.samples[np.searchsorted(self.exact_cols, cols[other.exact_cols])] = other.samples
+        return out
+
+    def means(self) -> np.ndarray:
+        return self.sums / self.count if self.count else np.zeros(self.n)
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """(len(qs), n) array of quantiles, qs in [0, 1]."""
+        out = np.zeros((len(qs), self.n))
+        if not self.count:
+            return out
+        if self.exact_cols.size:
+            out[:, self.exact_cols] = np.quantile(self.samples[:, :self.count], qs, axis=1)
+        if self.hist_cols.size:
+            cum = np.cumsum(self.counts, axis=1)
+            rows = np.arange(len(self.hist_cols))
+            for i, q in enumerate(qs):
+                # Same rank convention as np.percentile's default (linear)
+                rank = q * (self.count - 1)
+                b = np.argmax(cum > rank, axis=1)
+                in_bin = self.counts[rows, b]
+                before = cum[rows, b] - in_bin
+                frac = np.clip((rank - before + 0.5) / np.maximum(in_bin, 1), 0.0, 1.0)
+                out[i, self.hist_cols] = (b + frac) / self.bins
+            cols = self.hist_cols
+            out[:, cols] = np.clip(out[:, cols], self.lo[cols], self.hi[cols])
+        return out
+
+
+def exact_columns(mode: str, n: int, goal_cols: np.ndarray) -> np.ndarray:
+    """Columns that keep raw samples under an EXACT_MODES setting."""
+    if mode == "all":
+        return np.arange(n, dtype=np.intp)
+    if mode == "goals":
+        return np.unique(goal_cols)
+    if mode == "none":
+        return np.zeros(0, dtype=np.intp)
+    raise ValueError(f"Unknown exact mode: {mode}")
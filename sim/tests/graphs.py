@@ -0,0 +1,130 @@
+import itertools
+import random
+from typing import Dict, List, Tuple
+from sim.compiled import gate_threshold
+from sim.simulate import SimNode
+
+"""
+Small graphs for the tests, and exact answers for them by enumerating every
+combination of node outcomes (feasible up to ~16 nodes).
+"""
+
+
+def node(nid: str, node_type: str = "triangular", p=0.5, **kwargs) -> SimNode:
+    """A SimNode with a FIXED p_succ, or the given spec when p is a dict."""
+    spec = p if isinstance(p, dict) else {"dist": "FIXED", "value": p}
+    return SimNode(node_id=nid, node_name=nid, node_type=node_type, kind="", p_succ=spec, **kwargs)
+
+
+def random_dag(n: int, seed: int, fan: int = 2, footholds: int = 2, goals: int = 1, fixed: bool = True):
+    """(nodes, edges) of a random DAG; fixed p_succ unless fixed=False."""
+    r = random.Random(seed)
+    nodes = []
+    for i in range(n):
+        kind = "foothold" if i < footholds else "goal" if i >= n - goals else "triangular"
+        lo = round(r.uniform(0.2, 0.6), 3)
+        p = round(r.uniform(0.2, 0.95), 3) if fixed else {"min": lo, "mode": lo + 0.1, "max": lo + 0.3}
+        nodes.append(node(f"n{i}", kind, p))
+    edges = []
+    for i in range(footholds, n):
+        for s in r.sample(range(i), min(fan, i)):
+            edges.append((f"n{s}", f"n{i}"))
+    return nodes, edges
+
+
+def gated_graph():
+    """Footholds a, b; OR, AND, k-of-n and requires edges; shared ancestors."""
+    nodes = [
+        node("a", "foothold", 0.9),
+        node("b", "foothold", 0.7),
+        node("c", p=0.8),
+        node("d", p=0.6, gate={"type": "and"}),
+        node("e", p=0.75),
+        node("f", p=0.85, gate={"type": "k_of_n", "k": 2}),
+        node("g", "goal", 0.9),
+        node("h", "goal", 0.5),
+    ]
+    edges = [
+        ("a", "c"), ("b", "c"),
+        ("a", "d"), ("c", "d"),
+        ("b", "e"), ("c", "e", "requires"),
+        ("a", "f"), ("c", "f"), ("d", "f"), ("e", "f"),
+        ("f", "g"), ("e", "h"),
+    ]
+    return nodes, edges
+
+
+def tree_graph():
+    """A polytree: no node has two paths from the same ancestor."""
+    nodes = [
+        node("a", "foothold", 0.9),
+        node("b", "foothold", 0.6),
+        node("c", p=0.7),
+        node("d", p=0.8),
+        node("e", p=0.5, gate={"type": "and"}),
+        node("g", "goal", 0.9),
+    ]
+    edges = [("a", "c"), ("b", "d"), ("c", "e"), ("d", "e"), ("e", "g")]
+    return nodes, edges
+
+
+def exact_reach(nodes: List[SimNode], edges: List[Tuple[str, ...]]) -> Tuple[Dict[str, float], float]:
+    """
+    P(reached) per node and P(any goal) for fixed-p graphs: every node either
+    succeeds or not, and a node is reached when it succeeds and is a foothold
+    or its gate holds over its reached parents.
+    """
+    ids = [n.node_id for n in nodes]
+    p = {n.node_id: float(n.p_succ["value"]) for n in nodes}
+    parents = {nid: [] for nid in ids}
+    for s, t, *kind in edges:
+        parents[t].append((s, bool(kind) and kind[0] == "requires"))
+    order = _topological(ids, edges)
+    rule = {}
+    for n in nodes:
+        req = [s for s, r in parents[n.node_id] if r]
+        opt = [s for s, r in parents[n.node_id] if not r]
+        k, all_required = gate_threshold(n.gate, len(opt), len(req))
+        rule[n.node_id] = (req + opt, [], k) if all_required else (req, opt, k)
+    goals = [n.node_id for n in nodes if n.node_type == "goal"]
+    foothold = {n.node_id for n in nodes if n.node_type == "foothold"}
+
+    reach = dict.fromkeys(ids, 0.0)
+    any_goal = 0.0
+    for outcome in itertools.product((False, True), repeat=len(ids)):
+        weight = 1.0
+        ok = dict(zip(ids, outcome))
+        for nid in ids:
+            weight *= p[nid] if ok[nid] else 1.0 - p[nid]
+        if weight == 0.0:
+            continue
+        reached = {}
+        for nid in order:
+            req, opt, k = rule[nid]
+            if nid in foothold:
+                reached[nid] = ok[nid]
+            else:
+                reached[nid] = ok[nid] and all(reached[s] for s in req) and sum(reached[s] for s in opt) >= k
+            if reached[nid]:
+                reach[nid] += weight
+        if any(reached[g] for g in goals):
+            any_goal += weight
+    return reach, any_goal
+
+
+def _topological(ids: List[str], edges) -> List[str]:
+    indeg = dict.fromkeys(ids, 0)
+    children = {nid: [] for nid in ids}
+    for s, t, *_ in edges:
+        indeg[t] += 1
+        children[s].append(t)
+    queue = [nid for nid in ids if not indeg[nid]]
+    order = []
+    while queue:
+        u = queue.pop()
+        order.append(u)
+        for v in children[u]:
+            indeg[v] -= 1
+            if not indeg[v]:
+                queue.append(v)
+    return order
@@ -0,0 +1,57 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.compiled import compile_graph
+from sim.simulate import CHUNK_TRIALS, simulate_adaptive, simulate_plan
+from .graphs import random_dag
+
+
+class AdaptiveTests(SimpleTestCase):
+    def setUp(self):
+        self.plan = compile_graph(*random_dag(20, seed=4, fixed=False))
+
+    def test_stopping_at_n_trials_matches_a_fixed_run(self):
+        result = simulate_adaptive(self.plan, tolerance=1.0, max_trials=10 * CHUNK_TRIALS, seed=3)
+        self.assertEqual(result["adaptive"]["stop_reason"], "converged")
+        used = result["adaptive"]["trials_used"]
+        self.assertEqual(used, CHUNK_TRIALS)
+        fixed = simulate_plan(self.plan, trials=used, seed=3)
+        self.assertEqual(result["success_distribution"], fixed["success_distribution"])
+        self.assertEqual(result["node_distributions"], fixed["node_distributions"])
+
+    def test_tight_tolerance_runs_to_max_trials(self):
+        result = simulate_adaptive(self.plan, tolerance=1e-9, max_trials=2 * CHUNK_TRIALS + 5, seed=3)
+        self.assertEqual(result["adaptive"]["stop_reason"], "max_trials")
+        self.assertEqual(result["trials"], 2 * CHUNK_TRIALS + 5)
+
+
+class AdaptiveApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/simulate/"
+
+    def test_stops_early_once_converged(self):
+        body = {"adaptive": True, "tolerance": 0.05, "trials": 200_000, "seed": 1}
+        response = self.client.post(self.url, body, format="json")
+        self.assertEqual(response.status_code, 200)
+        adaptive = response.json()["adaptive"]
+        self.assertEqual(adaptive["stop_reason"], "converged")
+        self.assertLess(adaptive["trials_used"], 200_000)
+        self.assertLessEqual(adaptive["ci95_halfwidth"]["mean"], 0.05)
+
+    def test_time_budget_stops_the_run(self):
+        body = {"adaptive": True, "tolerance": 1e-9, "time_budget": 0, "trials": 200_000}
+        adaptive = self.client.post(self.url, body, format="json").json()["adaptive"]
+        self.assertEqual(adaptive["stop_reason"], "time_budget")
+        self.assertEqual(adaptive["trials_used"], CHUNK_TRIALS)
+
+    def test_bad_tolerance_or_budget_is_400(self):
+        for extra in (
+            {"tolerance": 0}, {"tolerance": "x"}, {"tolerance": "nan"}, {"tolerance": "inf"},
+            {"time_budget": -1}, {"time_budget": "nan"}, {"time_budget": "inf"},
+        ):
+            response = self.client.post(self.url, {"adaptive": True, **extra}, format="json")
+            self.assertEqual(response.status_code, 400, extra)
@@ -0,0 +1,56 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim import analytic
+from sim.bench import store_graph
+from sim.compiled import compile_graph
+from sim.simulate import simulate_plan
+from .graphs import exact_reach, gated_graph, node, tree_graph
+
+
+class AnalyticTests(SimpleTestCase):
+    def test_matches_vectorized_on_fixed_p(self):
+        nodes, edges = gated_graph()
+        plan = compile_graph(nodes, edges)
+        point = analytic.analyze(plan)
+        vec = simulate_plan(plan, trials=200, seed=0)
+        for nid, rate in vec["node_activation_rates"].items():
+            self.assertAlmostEqual(point["node_activation_rates"][nid], rate, places=12)
+
+    def test_exact_on_polytrees(self):
+        nodes, edges = tree_graph()
+        reach, any_goal = exact_reach(nodes, edges)
+        point = analytic.analyze(compile_graph(nodes, edges))
+        self.assertEqual(point["exact"], {"nodes": True, "any_goal": True})
+        for nid, rate in point["node_activation_rates"].items():
+            self.assertAlmostEqual(rate, reach[nid], places=12)
+        self.assertAlmostEqual(point["success_rate_any_goal"], any_goal, places=12)
+
+    def test_shared_ancestors_are_not_flagged_exact(self):
+        point = analytic.analyze(compile_graph(*gated_graph()))
+        self.assertEqual(point["exact"], {"nodes": False, "any_goal": False})
+
+    def test_mode_point(self):
+        spec = {"min": 0.1, "mode": 0.7, "max": 0.8}
+        plan = compile_graph([node("a", "foothold", spec), node("g", "goal", spec)], [("a", "g")])
+        point = analytic.analyze(plan, "mode")
+        self.assertAlmostEqual(point["success_rate_any_goal"], 0.49, places=12)
+        self.assertFalse(point["exact"]["nodes"])
+
+
+class AnalyticApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/simulate/"
+
+    def test_point_estimate_is_not_stored(self):
+        response = self.client.post(self.url, {"method": analytic.METHOD, "point": "mode"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["trials"], 0)
+        self.assertFalse(self.graph.results.exists())
+
+    def test_unknown_point_is_400(self):
+        response = self.client.post(self.url, {"method": analytic.METHOD, "point": "median"}, format="json")
+        self.assertEqual(response.status_code, 400)
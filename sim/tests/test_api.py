@@ -0,0 +1,19 @@
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+
+
+class SimulateApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+
+    def url(self, action: str) -> str:
+        return f"/api/graphs/{self.graph.pk}/{action}/"
+
+    def test_bad_options_are_400(self):
+        for body in ({"seed": [1]}, {"seed": {}}, {"seed": "x"}, {"engine": "gpu"}):
+            response = self.client.post(self.url("simulate"), body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn("detail", response.json())
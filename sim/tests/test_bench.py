@@ -0,0 +1,57 @@
+import os
+import tempfile
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase
+from sim import bench
+from sim.compiled import compile_graph
+
+
+class BenchTests(SimpleTestCase):
+    def test_synthetic_graphs_compile(self):
+        for shape in bench.SHAPES:
+            nodes, edges = bench.synthetic_graph(shape, 50, seed=1)
+            plan = compile_graph(nodes, edges)
+            self.assertEqual(plan.n, 50)
+            self.assertTrue(plan.goal_cols.size)
+        with self.assertRaises(ValueError):
+            bench.synthetic_graph("ring", 10)
+
+    def test_compare_flags_regressions_by_direction(self):
+        baseline = {"results": {"c": {"x_per_sec": 100.0, "y_ms": 10.0, "z_mb": 5.0, "count": 1.0}}}
+        current = {"results": {"c": {"x_per_sec": 70.0, "y_ms": 11.0, "z_mb": 8.0, "count": 9.0}, "new": {"y_ms": 1.0}}}
+        flagged = {r["metric"] for r in bench.compare(current, baseline, threshold=0.25)}
+        self.assertEqual(flagged, {"x_per_sec", "z_mb"})
+
+
+class SimbenchCommandTests(TestCase):
+    def run_command(self, *args):
+        out = StringIO()
+        base = ("--shapes", "chain,random", "--sizes", "10,30", "--trials", "500", "--repeat", "1")
+        call_command("simbench", *base, *args, stdout=out)
+        return out.getvalue()
+
+    def test_report_with_api_cases_and_baseline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "report.json")
+            out = self.run_command("--api-max-nodes", "10", "--output", path)
+            report = bench.load(path)
+            self.assertIn("api/chain/10", report["results"])
+            self.assertNotIn("api/chain/30", report["results"])
+            self.assertIn("simulate_cached_latency_ms", report["results"]["api/random/10"])
+            self.assertIn("graph/random/30", out)
+
+            self.assertIn("No regressions", self.run_command("--no-api", "--baseline", path, "--threshold", "1000"))
+
+            for metrics in report["results"].values():
+                for metric in metrics:
+                    if metric.endswith("per_sec"):
+                        metrics[metric] *= 1000
+            bench.save(report, path)
+            with self.assertRaises(CommandError):
+                self.run_command("--no-api", "--baseline", path)
+
+    def test_unknown_shape(self):
+        with self.assertRaises(CommandError):
+            call_command("simbench", "--shapes", "ring", "--no-api", stdout=StringIO())
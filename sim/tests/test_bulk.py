@@ -0,0 +1,88 @@
+import json
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APITestCase
+from sim import bulk
+from sim.bench import store_graph
+from sim.bulk import export_graph, import_graph
+from sim.compiled import graph_plan
+from sim.models import AttackGraph
+
+
+def records(lines):
+    return [json.loads(line) for line in lines]
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "layered", 40)
+        self.graph.metadata = {"controls": {"mfa": {"dist": "FIXED", "value": 0.5}}}
+        self.graph.save()
+        self.graph.nodes.filter(node_id="n20").update(gate={"type": "and"}, controls=["mfa"])
+
+    def test_round_trip(self):
+        lines = list(export_graph(self.graph))
+        # Small batches exercise the incremental bulk_create path
+        with mock.patch.object(bulk, "BULK_BATCH", 7):
+            out = import_graph(lines, self.user)
+        copy = out["graph"]
+        self.assertEqual((out["nodes"], out["edges"]), (40, self.graph.edges.count()))
+        self.assertEqual(records(export_graph(copy)), records(lines))
+        self.assertEqual(graph_plan(copy).digest, graph_plan(self.graph).digest)
+
+    def test_replace_bumps_revision(self):
+        other = store_graph(self.user, "chain", 5)
+        import_graph(export_graph(other), self.user, graph=self.graph)
+        self.graph.refresh_from_db()
+        self.assertEqual(self.graph.revision, 1)
+        self.assertEqual(self.graph.nodes.count(), 5)
+
+    def test_invalid_import_saves_nothing(self):
+        node = '{"node": {"node_id": "a", "node_type": "foothold"}}'
+        for lines, message in (
+            (["{not json"], "Line 1"),
+            ([node, '{"edge": {"source": "a", "target": "b"}}'], "Line 2: edge a -> b references an unknown node b"),
+            ([node, '{"edge": {"source": "a", "target": "a", "type": "blocks"}}'], "Edge type"),
+            ([node, '{"node": {"node_id": "b"}}', '{"edge": {"source": "a", "target": "b"}}',
+              '{"edge": {"source": "b", "target": "a"}}'], "Cycle"),
+            ([node, node], "Line 2: Duplicate"),
+            ([node, '{"graph": {"title": "late"}}'], "Line 2"),
+            (['{"node": {"node_id": "a", "p_succ": [1]}}'], "p_succ"),
+            (['{"node": {"node_id": "a", "colour": "red"}}'], "colour"),
+            ([], "no nodes"),
+        ):
+            before = AttackGraph.objects.count()
+            with self.assertRaisesMessage(ValueError, message):
+                import_graph(lines, self.user)
+            self.assertEqual(AttackGraph.objects.count(), before)
+
+
+class BulkApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 30)
+        self.client.force_authenticate(self.user)
+
+    def test_export_import_round_trip(self):
+        response = self.client.get(f"/api/graphs/{self.graph.pk}/export/")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content)
+        created = self.client.post(
+            "/api/graphs/import/?title=copy", body, content_type="application/x-ndjson"
+        )
+        self.assertEqual(created.status_code, 201)
+        self.assertEqual(created.json()["title"], "copy")
+        copy = AttackGraph.objects.get(pk=created.json()["id"])
+        self.assertEqual(copy.owner, self.user)
+        result = {}
+        for graph in (self.graph, copy):
+            url = f"/api/graphs/{graph.pk}/simulate/"
+            result[graph.pk] = self.client.post(url, {"trials": 1000, "seed": 1}, format="json").json()
+        self.assertEqual(result[self.graph.pk], result[copy.pk])
+
+    def test_bad_import_is_400(self):
+        response = self.client.post("/api/graphs/import/", b'{"node": 1}\n', content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Line 1", response.json()["detail"])
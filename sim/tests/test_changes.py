@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.models import Edge, Node
+
+
+class ChangesApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/changes/"
+
+    def test_upsert_bumps_revision(self):
+        body = {"base_revision": 0, "nodes": {"upsert": [{"node_id": "n3", "p_succ": {"dist": "FIXED", "value": 0.5}}]}}
+        response = self.client.patch(self.url, body, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["revision"], 1)
+        self.assertEqual(Node.objects.get(graph=self.graph, node_id="n3").p_succ, {"dist": "FIXED", "value": 0.5})
+
+    def test_noop_keeps_revision(self):
+        node = Node.objects.get(graph=self.graph, node_id="n3")
+        body = {"title": self.graph.title, "nodes": {"upsert": [{"node_id": "n3", "p_succ": node.p_succ}]}}
+        self.assertEqual(self.client.patch(self.url, body, format="json").json()["revision"], 0)
+
+    def test_deleting_a_node_drops_its_edges(self):
+        touching = set(Edge.objects.filter(graph=self.graph, source="n5").values_list("edge_id", flat=True))
+        touching |= set(Edge.objects.filter(graph=self.graph, target="n5").values_list("edge_id", flat=True))
+        self.assertTrue(touching)
+        response = self.client.patch(self.url, {"nodes": {"delete": ["n5"]}}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Edge.objects.filter(graph=self.graph, edge_id__in=touching).exists())
+        self.assertFalse(Node.objects.filter(graph=self.graph, node_id="n5").exists())
+
+    def test_stale_revision_is_409(self):
+        response = self.client.patch(self.url, {"base_revision": 5, "title": "t"}, format="json")
+        self.assertEqual(response.status_code, 409)
+
+    def test_invalid_changes_are_400(self):
+        for body in (
+            {"nodes": [1]},
+            {"nodes": {"upsert": [{"label": "no id"}]}},
+            {"nodes": {"delete": [1]}},
+            {"edges": {"upsert": [{"edge_id": "x", "source": "n1", "target": "nowhere"}]}},
+            {"edges": {"upsert": [
+                {"edge_id": "x", "source": "n1", "target": "n2"}, {"edge_id": "y", "source": "n2", "target": "n1"},
+            ]}},
+            {"base_revision": "abc"},
+            {"title": ""},
+        ):
+            response = self.client.patch(self.url, body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+        self.graph.refresh_from_db()
+        self.assertEqual(self.graph.revision, 0)
+
+
+class GraphUpdateTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/"
+
+    def test_put_writes_only_the_difference(self):
+        data = self.client.get(self.url).json()
+        pks = dict(Node.objects.filter(graph=self.graph).values_list("node_id", "pk"))
+        self.assertEqual(self.client.put(self.url, data, format="json").json()["revision"], 0)
+
+        data["nodes"][3]["p_succ"] = {"dist": "FIXED", "value": 0.1}
+        dropped = data["edges"].pop()
+        response = self.client.put(self.url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["revision"], 1)
+        # Rows are updated in place rather than deleted and recreated
+        self.assertEqual(dict(Node.objects.filter(graph=self.graph).values_list("node_id", "pk")), pks)
+        self.assertFalse(Edge.objects.filter(graph=self.graph, edge_id=dropped["edge_id"]).exists())
@@ -0,0 +1,101 @@
+import itertools
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim.compiled import compile_graph
+from sim.cuts import goal_cuts, min_cut_sets
+from sim.models import AttackGraph, Edge, Node
+from .graphs import node, random_dag
+
+
+def _reaches(plan, goal: int, removed) -> bool:
+    """Whether some foothold -> goal path avoids `removed` (edges into footholds unused)."""
+    seen = [j for j in np.flatnonzero(plan.foothold) if j not in removed]
+    stack = list(seen)
+    seen = set(seen)
+    children = {j: [] for j in range(plan.n)}
+    for j in range(plan.n):
+        if not plan.foothold[j]:
+            for p in set(plan.parents_of(j).tolist()):
+                children[p].append(j)
+    while stack:
+        u = stack.pop()
+        if u == goal:
+            return True
+        for v in children[u]:
+            if v not in seen and v not in removed:
+                seen.add(v)
+                stack.append(v)
+    return False
+
+
+class CutSetTests(SimpleTestCase):
+    def test_matches_brute_force(self):
+        checked = 0
+        for seed in range(15):
+            nodes, edges = random_dag(9, seed=seed, fan=2, footholds=2)
+            plan = compile_graph(nodes, edges)
+            goal = int(plan.goal_cols[0])
+            smallest, _, _, _ = goal_cuts(plan, goal, None)
+            if smallest is not None and smallest > 3:
+                with self.assertRaises(ValueError):
+                    goal_cuts(plan, goal, 3)
+                continue
+            min_size, cuts, complete, used = goal_cuts(plan, goal, 3)
+            self.assertTrue(complete)
+            self.assertEqual(used, 3)
+
+            others = [j for j in range(plan.n) if j != goal]
+            expected = set()
+            for size in range(0, used + 1):
+                for cut in itertools.combinations(others, size):
+                    removed = set(cut)
+                    if _reaches(plan, goal, removed):
+                        continue
+                    if all(_reaches(plan, goal, removed - {v}) for v in cut):
+                        expected.add(tuple(sorted(cut)))
+            self.assertEqual(set(cuts), expected - {()}, f"seed {seed}")
+            smallest = min((len(c) for c in expected), default=None)
+            if smallest:
+                self.assertEqual(min_size, smallest)
+            checked += 1
+        self.assertGreater(checked, 10)
+
+    def test_max_size_below_minimum_is_rejected(self):
+        nodes = [node("a", "foothold", 0.5), node("b", "foothold", 0.5), node("g", "goal", 0.5)]
+        plan = compile_graph(nodes, [("a", "g"), ("b", "g")])
+        with self.assertRaisesRegex(ValueError, "minimum cut size 2"):
+            min_cut_sets(plan, max_size=1)
+        result = min_cut_sets(plan, max_size=2)["goals"]["g"]
+        self.assertEqual((result["min_size"], result["max_size"]), (2, 2))
+        self.assertEqual([c["nodes"] for c in result["cuts"]], [["a", "b"]])
+
+
+class CutApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = AttackGraph.objects.create(title="fan-in", owner=self.user)
+        Node.objects.bulk_create([
+            Node(graph=self.graph, node_id=nid, label=nid, node_type=kind, p_succ={"dist": "FIXED", "value": 0.5})
+            for nid, kind in (("a", "foothold"), ("b", "foothold"), ("c", "triangular"), ("g", "goal"))
+        ])
+        Edge.objects.bulk_create([
+            Edge(graph=self.graph, edge_id=f"e{i}", source=s, target=t)
+            for i, (s, t) in enumerate((("a", "c"), ("b", "c"), ("c", "g"), ("b", "g")))
+        ])
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/cuts/"
+
+    def test_lists_minimal_cuts(self):
+        response = self.client.post(self.url, {"goals": ["g"]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        result = response.json()["goals"]["g"]
+        self.assertEqual((result["min_size"], result["max_size"], result["complete"]), (2, 3, True))
+        self.assertEqual(sorted(c["nodes"] for c in result["cuts"]), [["a", "b"], ["b", "c"]])
+
+    def test_bad_options_are_400(self):
+        for body in ({"max_size": 1}, {"max_size": 0}, {"limit": 0}, {"limit": "x"}, {"goals": ["missing"]}):
+            response = self.client.post(self.url, body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+        self.assertIn("minimum cut size 2", self.client.post(self.url, {"max_size": 1}, format="json").json()["detail"])
@@ -0,0 +1,30 @@
+import numpy as np
+from django.test import SimpleTestCase
+from sim.compiled import compile_graph
+from sim.simulate import WORD_BITS, run_trials, simulate_plan
+from .graphs import exact_reach, gated_graph, random_dag, tree_graph
+
+
+class DiscreteEngineTests(SimpleTestCase):
+    def test_discrete_matches_enumeration_with_shared_ancestors(self):
+        for nodes, edges in (gated_graph(), random_dag(10, seed=5, goals=2)):
+            reach, any_goal = exact_reach(nodes, edges)
+            trials = WORD_BITS * 4000
+            result = run_trials(nodes, edges, trials=trials, seed=2, engine="discrete")
+            self.assertEqual(result["trials"], trials)
+            # Bernoulli draws are rounded to 16 bits; 5 standard errors of the world count
+            for nid, rate in result["node_activation_rates"].items():
+                se = np.sqrt(reach[nid] * (1.0 - reach[nid]) / trials)
+                self.assertAlmostEqual(rate, reach[nid], delta=5 * se + 1e-4)
+            se = np.sqrt(any_goal * (1.0 - any_goal) / trials)
+            self.assertAlmostEqual(result["success_rate_any_goal"], any_goal, delta=5 * se + 1e-4)
+
+    def test_discrete_rounds_trials_up_to_whole_words(self):
+        nodes, edges = tree_graph()
+        result = run_trials(nodes, edges, trials=WORD_BITS + 1, seed=0, engine="discrete")
+        self.assertEqual(result["trials"], 2 * WORD_BITS)
+
+    def test_same_seed_same_result(self):
+        plan = compile_graph(*random_dag(30, seed=1, fixed=False))
+        first = simulate_plan(plan, trials=3000, seed=9, engine="discrete")
+        self.assertEqual(first, simulate_plan(plan, trials=3000, seed=9, engine="discrete"))
@@ -0,0 +1,79 @@
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from scipy.special import betaincinv, ndtri
+from sim.bench import store_graph
+from sim.compiled import compile_graph
+from sim.distributions import compile_spec, compile_specs
+from sim.simulate import simulate_plan
+from .graphs import node
+
+U = np.concatenate([np.linspace(1e-6, 1.0 - 1e-6, 20001), [1e-12, 1e-9, 1.0 - 1e-9]])
+
+
+class QuantileTableTests(SimpleTestCase):
+    def test_pert_and_beta_within_table_accuracy(self):
+        for spec in (
+            {"dist": "PERT", "min": 0.0, "mode": 0.3, "max": 1.0},
+            # Mode between two rows of the shared PERT table
+            {"dist": "PERT", "min": 0.2, "mode": 0.2137, "max": 0.9},
+            {"dist": "PERT", "min": 0.0, "mode": 1.0, "max": 1.0},
+            {"dist": "BETA", "alpha": 0.5, "beta": 2.0},
+            {"dist": "BETA", "alpha": 30.0, "beta": 3.0, "min": 2.0, "max": 5.0},
+        ):
+            dists = compile_specs([spec])
+            lo, _, hi, a, b = dists.params[0]
+            exact = lo + (hi - lo) * betaincinv(a, b, U)
+            np.testing.assert_allclose(dists.sample(U[:, None])[:, 0], exact, rtol=0, atol=2e-5 * (hi - lo), err_msg=spec)
+
+    def test_closed_form_families_are_exact(self):
+        dists = compile_specs([
+            {"dist": "TRIANGULAR", "min": 0.1, "mode": 0.4, "max": 0.9},
+            {"dist": "LOGNORMAL", "mu": 1.0, "sigma": 0.5},
+            {"dist": "FIXED", "value": 0.25},
+        ])
+        x = dists.sample(np.repeat(U[:, None], 3, axis=1))
+        c = (0.4 - 0.1) / 0.8
+        tri = np.where(U < c, 0.1 + np.sqrt(U * 0.8 * 0.3), 0.9 - np.sqrt((1.0 - U) * 0.8 * 0.5))
+        np.testing.assert_allclose(x[:, 0], tri, rtol=1e-12)
+        np.testing.assert_allclose(x[:, 1], np.exp(1.0 + 0.5 * ndtri(U)), rtol=1e-12)
+        np.testing.assert_array_equal(x[:, 2], 0.25)
+
+    def test_invalid_specs(self):
+        for spec in (
+            {"dist": "NOPE"}, {"dist": "BETA", "alpha": 1.0}, {"dist": "BETA", "alpha": 0, "beta": 1},
+            {"dist": "LOGNORMAL", "sigma": -1}, {"dist": "PERT", "min": "x"}, {"dist": "FIXED", "value": "nan"},
+        ):
+            with self.assertRaises(ValueError, msg=spec):
+                compile_spec(spec)
+
+
+class SamplerTests(SimpleTestCase):
+    def test_engines_sample_every_family(self):
+        # With no footholds declared a parentless goal is one, so its reach is its p_succ
+        for spec, mean in (
+            ({"dist": "PERT", "min": 0.2, "mode": 0.5, "max": 0.9}, (0.2 + 4 * 0.5 + 0.9) / 6),
+            ({"dist": "BETA", "alpha": 2.0, "beta": 5.0}, 2.0 / 7.0),
+            ({"dist": "FIXED", "value": 0.3}, 0.3),
+        ):
+            plan = compile_graph([node("g", "goal", spec)], [])
+            result = simulate_plan(plan, trials=50000, seed=1)
+            self.assertAlmostEqual(result["success_rate_any_goal"], mean, delta=0.005, msg=spec)
+
+
+class DistributionApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+
+    def test_pert_and_beta_nodes_simulate(self):
+        edit = {"nodes": {"upsert": [
+            {"node_id": "n5", "p_succ": {"dist": "PERT", "min": 0.1, "mode": 0.3, "max": 0.6}},
+            {"node_id": "n6", "p_succ": {"dist": "BETA", "alpha": 2, "beta": 3}},
+        ]}}
+        self.assertEqual(self.client.patch(f"/api/graphs/{self.graph.pk}/changes/", edit, format="json").status_code, 200)
+        response = self.client.post(f"/api/graphs/{self.graph.pk}/simulate/", {"trials": 1000, "seed": 1}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.json()["node_distributions"]["n6"]["p90"], 0.0)
@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase
+from sim.compiled import compile_graph
+from sim.simulate import run_trials, simulate_plan
+from .graphs import exact_reach, gated_graph, random_dag, tree_graph
+
+
+class EngineAgreementTests(SimpleTestCase):
+    def test_scalar_and_vectorized_match_exactly_on_fixed_p(self):
+        # With fixed p_succ every trial is the same, so the random streams do not matter
+        nodes, edges = gated_graph()
+        vec = run_trials(nodes, edges, trials=500, seed=1, engine="vectorized")
+        sca = run_trials(nodes, edges, trials=500, seed=1, engine="scalar")
+        for nid, rate in vec["node_activation_rates"].items():
+            self.assertAlmostEqual(rate, sca["node_activation_rates"][nid], places=12)
+        self.assertAlmostEqual(vec["success_rate_any_goal"], sca["success_rate_any_goal"], places=12)
+
+    def test_scalar_and_vectorized_agree_statistically(self):
+        nodes, edges = random_dag(12, seed=3, fixed=False)
+        vec = run_trials(nodes, edges, trials=20000, seed=1, engine="vectorized")
+        sca = run_trials(nodes, edges, trials=4000, seed=1, engine="scalar")
+        for nid, rate in vec["node_activation_rates"].items():
+            self.assertAlmostEqual(rate, sca["node_activation_rates"][nid], delta=0.01)
+
+    def test_vectorized_is_exact_on_polytrees(self):
+        nodes, edges = tree_graph()
+        reach, any_goal = exact_reach(nodes, edges)
+        result = run_trials(nodes, edges, trials=200, seed=0)
+        for nid, rate in result["node_activation_rates"].items():
+            self.assertAlmostEqual(rate, reach[nid], places=12)
+        self.assertAlmostEqual(result["success_rate_any_goal"], any_goal, places=12)
+
+
+class ReproducibilityTests(SimpleTestCase):
+    def test_same_seed_same_result(self):
+        nodes, edges = random_dag(30, seed=1, fixed=False)
+        plan = compile_graph(nodes, edges)
+        for engine, trials in (("vectorized", 3000), ("scalar", 300)):
+            first = simulate_plan(plan, trials=trials, seed=9, engine=engine)
+            self.assertEqual(first, simulate_plan(plan, trials=trials, seed=9, engine=engine))
@@ -0,0 +1,78 @@
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+from sim.fair_run import simulate_portfolio_mc, simulate_scenario_mc
+from sim.models import Scenario
+
+SPECS = {
+    "tef_spec": {"min": 0.1, "mode": 0.3, "max": 0.6},
+    "vuln_spec": {"min": 0.05, "mode": 0.2, "max": 0.5},
+    "plm_spec": {"min": 1e4, "mode": 5e4, "max": 1.5e5},
+    "slef_spec": {"min": 0.05, "mode": 0.2, "max": 0.4},
+    "slm_spec": {"dist": "LOGNORMAL", "mu": 10.0, "sigma": 0.5},
+}
+
+
+class FairTests(SimpleTestCase):
+    def test_seeded_runs_repeat(self):
+        first = simulate_scenario_mc(**SPECS, trials=5000, seed=7)
+        self.assertEqual(first, simulate_scenario_mc(**SPECS, trials=5000, seed=7))
+        self.assertNotEqual(first, simulate_scenario_mc(**SPECS, trials=5000, seed=8))
+
+    def test_mean_matches_independent_factors(self):
+        # PERT means (min + 4 mode + max) / 6; lognormal exp(mu + sigma^2 / 2)
+        tef, vuln, slef = 1.9 / 6.0, 1.35 / 6.0, 1.25 / 6.0
+        plm, slm = 3.6e5 / 6.0, np.exp(10.125)
+        result = simulate_scenario_mc(**SPECS, trials=200_000, seed=1)
+        self.assertAlmostEqual(result["mean"] / (tef * vuln * (plm + slef * slm)), 1.0, delta=0.01)
+
+    def test_portfolio_sums_independent_scenarios(self):
+        other = {**SPECS, "tef_spec": {"dist": "FIXED", "value": 2.0}}
+        out = simulate_portfolio_mc([SPECS, other], trials=20000, seed=3)
+        self.assertEqual(out, simulate_portfolio_mc([SPECS, other], trials=20000, seed=3))
+        self.assertAlmostEqual(
+            out["portfolio"]["mean"], sum(s["mean"] for s in out["scenarios"]), delta=1e-9 * out["portfolio"]["mean"]
+        )
+        # Adding a scenario leaves the earlier ones' streams alone
+        more = simulate_portfolio_mc([SPECS, other, SPECS], trials=20000, seed=3)
+        self.assertEqual(more["scenarios"][:2], out["scenarios"])
+
+
+class ScenarioApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.client.force_authenticate(self.user)
+        self.scenarios = [Scenario.objects.create(title=t, owner=self.user) for t in ("a", "b")]
+
+    def simulate(self, body, scenario=None):
+        url = f"/api/scenarios/{(scenario or self.scenarios[0]).pk}/simulate/"
+        return self.client.post(url, body, format="json")
+
+    def test_seeded_simulate_repeats(self):
+        first = self.simulate({"trials": 5000, "seed": 4})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json(), self.simulate({"trials": 5000, "seed": 4}).json())
+        self.scenarios[0].refresh_from_db()
+        self.assertEqual(self.scenarios[0].ale_estimate, first.json()["summary"]["p50"])
+
+    def test_portfolio(self):
+        response = self.client.post("/api/scenarios/portfolio/", {"trials": 5000, "seed": 1}, format="json")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(set(body["scenarios"]), {str(s.pk) for s in self.scenarios})
+        self.assertGreater(body["portfolio"]["mean"], max(s["mean"] for s in body["scenarios"].values()))
+
+    @override_settings(SIM_MAX_TRIALS=1000)
+    def test_trials_are_capped(self):
+        response = self.client.post("/api/scenarios/portfolio/", {"trials": 10 ** 9}, format="json")
+        self.assertEqual(response.json()["trials"], 1000)
+        self.assertEqual(self.simulate({"trials": 10 ** 9}).status_code, 200)
+
+    def test_bad_options_are_400(self):
+        for body in ({"trials": 0}, {"trials": -5}, {"trials": "x"}, {"seed": "x"}):
+            self.assertEqual(self.simulate(body).status_code, 400, body)
+            response = self.client.post("/api/scenarios/portfolio/", body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+        response = self.client.post("/api/scenarios/portfolio/", {"scenarios": ["nope"]}, format="json")
+        self.assertEqual(response.status_code, 400)
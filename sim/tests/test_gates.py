@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.compiled import compile_graph
+from sim.models import Node
+from sim.simulate import run_trials
+from .graphs import exact_reach, gated_graph, node
+
+
+def star(gate, kinds=("follows", "follows", "follows")):
+    """Three independent footholds feeding one gated goal; polytree, so propagation is exact."""
+    nodes = [node(f"s{i}", "foothold", p) for i, p in enumerate((0.9, 0.6, 0.3))]
+    nodes.append(node("g", "goal", 0.8, gate=gate))
+    return nodes, [(f"s{i}", "g", kind) for i, kind in enumerate(kinds)]
+
+
+class GateTests(SimpleTestCase):
+    def test_gates_match_enumeration(self):
+        for gate, kinds in (
+            (None, ("follows",) * 3),
+            ({"type": "and"}, ("follows",) * 3),
+            ({"type": "k_of_n", "k": 2}, ("follows",) * 3),
+            ({"type": "k_of_n", "k": 3}, ("follows",) * 3),
+            (None, ("requires", "follows", "follows")),
+            ({"type": "k_of_n", "k": 1}, ("requires", "requires", "follows")),
+            (None, ("requires",) * 3),
+        ):
+            nodes, edges = star(gate, kinds)
+            reach, _ = exact_reach(nodes, edges)
+            for engine in ("vectorized", "scalar"):
+                result = run_trials(nodes, edges, trials=200, seed=0, engine=engine)
+                self.assertAlmostEqual(result["node_activation_rates"]["g"], reach["g"], places=12, msg=(gate, kinds))
+
+    def test_scalar_and_vectorized_match_with_shared_ancestors(self):
+        nodes, edges = gated_graph()
+        vec = run_trials(nodes, edges, trials=500, seed=1, engine="vectorized")
+        sca = run_trials(nodes, edges, trials=500, seed=1, engine="scalar")
+        for nid, rate in vec["node_activation_rates"].items():
+            self.assertAlmostEqual(rate, sca["node_activation_rates"][nid], places=12)
+
+    def test_invalid_gates_are_rejected(self):
+        for gate in ({"type": "xor"}, {"type": "k_of_n"}, {"type": "k_of_n", "k": 0}, {"type": "k_of_n", "k": True}):
+            with self.assertRaises(ValueError):
+                compile_graph(*star(gate))
+
+
+class GateApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+
+    def test_invalid_gate_is_400(self):
+        Node.objects.filter(graph=self.graph, node_id="n10").update(gate={"type": "xor"})
+        self.graph.revision += 1
+        self.graph.save()
+        response = self.client.post(f"/api/graphs/{self.graph.pk}/simulate/", {"trials": 500}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("gate", response.json()["detail"])
@@ -0,0 +1,79 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+from sim import incremental
+from sim.bench import store_graph
+from sim.compiled import compile_graph, graph_plan
+from sim.simulate import CHUNK_TRIALS, simulate_plan
+from .graphs import random_dag
+
+
+class IncrementalTests(SimpleTestCase):
+    def setUp(self):
+        incremental._states.clear()
+        self.addCleanup(incremental._states.clear)
+        self.nodes, self.edges = random_dag(30, seed=1, fixed=False, goals=2)
+        self.trials = 2 * CHUNK_TRIALS + 77
+
+    def run_incremental(self, key="g", exact="goals"):
+        plan = compile_graph(self.nodes, self.edges)
+        result = incremental.simulate_incremental(key, plan, self.trials, 5, exact=exact)
+        return plan, result.pop("incremental"), result
+
+    def test_parameter_edit_equals_a_fresh_run(self):
+        plan, info, result = self.run_incremental()
+        self.assertFalse(info["reused"])
+        self.assertEqual(result, simulate_plan(plan, trials=self.trials, seed=5))
+
+        self.nodes[10].p_succ = {"min": 0.1, "mode": 0.2, "max": 0.3}
+        for exact in ("goals", "all"):
+            plan, info, result = self.run_incremental(exact=exact)
+            self.assertTrue(info["reused"])
+            self.assertLess(info["recomputed_nodes"], plan.n)
+            self.assertEqual(result, simulate_plan(plan, trials=self.trials, seed=5, exact=exact))
+
+    def test_structure_change_starts_over(self):
+        self.run_incremental()
+        self.edges = self.edges[:-1]
+        plan, info, result = self.run_incremental()
+        self.assertFalse(info["reused"])
+        self.assertEqual(result, simulate_plan(plan, trials=self.trials, seed=5))
+
+    def test_large_runs_are_streamed(self):
+        with mock.patch.object(incremental, "MAX_CELLS", self.trials):
+            plan, info, result = self.run_incremental()
+        self.assertFalse(info["reused"])
+        self.assertFalse(incremental._states)
+        self.assertEqual(result, simulate_plan(plan, trials=self.trials, seed=5))
+
+    def test_retained_runs_fit_the_byte_budget(self):
+        self.run_incremental("a")
+        size = next(iter(incremental._states.values())).nbytes
+        with override_settings(SIM_INCREMENTAL_MAX_BYTES=2 * size):
+            self.run_incremental("b")
+            self.run_incremental("c")
+            self.assertEqual([key[0] for key in incremental._states], ["b", "c"])
+        with override_settings(SIM_INCREMENTAL_MAX_BYTES=size - 1):
+            self.run_incremental("d")
+            self.assertNotIn("d", [key[0] for key in incremental._states])
+
+
+class IncrementalApiTests(APITestCase):
+    def setUp(self):
+        incremental._states.clear()
+        self.addCleanup(incremental._states.clear)
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/simulate/"
+
+    def test_edit_reuses_the_last_run(self):
+        body = {"trials": 3000, "seed": 2, "incremental": True}
+        self.client.post(self.url, body, format="json")
+        edit = {"nodes": {"upsert": [{"node_id": "n12", "p_succ": {"dist": "FIXED", "value": 0.05}}]}}
+        self.client.patch(f"/api/graphs/{self.graph.pk}/changes/", edit, format="json")
+        result = self.client.post(self.url, body, format="json").json()
+        self.assertTrue(result.pop("incremental")["reused"])
+        self.graph.refresh_from_db()
+        self.assertEqual(result, simulate_plan(graph_plan(self.graph), trials=3000, seed=2))
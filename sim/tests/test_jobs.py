@@ -0,0 +1,129 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.jobs import claim_next_job, reclaim_stale_jobs, run_job, submit_job, worker_loop
+from sim.models import Edge, SimulationJob
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 30)
+
+    def test_claim_takes_oldest_queued_job_once(self):
+        first = submit_job(self.graph, self.user, trials=500, seed=1)
+        second = submit_job(self.graph, self.user, trials=500, seed=2)
+        claimed = claim_next_job()
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual(claimed.status, "running")
+        self.assertIsNotNone(claimed.started_at)
+        self.assertEqual(claim_next_job().pk, second.pk)
+        self.assertIsNone(claim_next_job())
+
+    def test_run_job_stores_result(self):
+        job = submit_job(self.graph, self.user, trials=500, seed=1)
+        run_job(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done")
+        self.assertEqual(job.progress, 100.0)
+        self.assertIsNotNone(job.result)
+        self.assertEqual(job.result.samples, 500)
+
+    def test_failed_job_records_error(self):
+        # A cycle makes graph_plan raise inside the worker
+        Edge.objects.create(graph=self.graph, edge_id="loop", source="n29", target="n0")
+        self.graph.revision += 1
+        self.graph.save()
+        job = submit_job(self.graph, self.user, trials=500, seed=1)
+        with self.assertLogs("sim.jobs", "ERROR"):
+            run_job(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertIn("Cycle", job.error)
+
+
+@override_settings(SIM_JOB_TIMEOUT=60, SIM_JOB_MAX_ATTEMPTS=2)
+class StaleJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 30)
+        self.job = submit_job(self.graph, self.user, trials=500, seed=1)
+
+    def expire(self):
+        SimulationJob.objects.filter(pk=self.job.pk).update(heartbeat_at=timezone.now() - timedelta(seconds=120))
+
+    def test_live_job_is_left_alone(self):
+        claim_next_job()
+        self.assertEqual(reclaim_stale_jobs(), 0)
+
+    def test_stale_job_is_requeued_and_rerun(self):
+        claim_next_job()
+        self.expire()
+        self.assertEqual(reclaim_stale_jobs(), 1)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "queued")
+        retry = claim_next_job()
+        self.assertEqual(retry.attempts, 2)
+        run_job(retry)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "done")
+
+    def test_superseded_worker_does_not_write(self):
+        lost = claim_next_job()
+        self.expire()
+        reclaim_stale_jobs()
+        claim_next_job()
+        run_job(lost)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "running")
+        self.assertEqual(self.job.attempts, 2)
+
+    def test_fails_after_max_attempts(self):
+        for _ in range(2):
+            claim_next_job()
+            self.expire()
+            reclaim_stale_jobs()
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, "failed")
+        self.assertIn("stopped responding", self.job.error)
+
+
+class WorkerTests(TransactionTestCase):
+    # Workers commit as they go (and may be other processes), so no wrapping transaction
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 30)
+
+    def test_worker_loop_once_drains_queue(self):
+        jobs = [submit_job(self.graph, self.user, trials=500, seed=s) for s in range(3)]
+        worker_loop(once=True)
+        self.assertEqual(
+            list(SimulationJob.objects.filter(pk__in=[j.pk for j in jobs]).values_list("status", flat=True)),
+            ["done"] * 3,
+        )
+
+
+class JobApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+
+    def test_async_simulate_is_polled_to_completion(self):
+        body = {"async": True, "trials": 500, "seed": 1}
+        response = self.client.post(f"/api/graphs/{self.graph.pk}/simulate/", body, format="json")
+        self.assertEqual(response.status_code, 202)
+        url = f"/api/jobs/{response.json()['id']}/"
+        self.assertEqual(self.client.get(url).json()["status"], "queued")
+        run_job(claim_next_job())
+        job = self.client.get(url).json()
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["result"]["trials"], 500)
+
+    def test_other_users_jobs_are_hidden(self):
+        job = submit_job(self.graph, self.user, trials=500, seed=1)
+        self.client.force_authenticate(User.objects.create(username="other"))
+        self.assertEqual(self.client.get(f"/api/jobs/{job.pk}/").status_code, 404)
@@ -0,0 +1,79 @@
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APITestCase
+from sim import metrics
+from sim.bench import store_graph
+
+
+@mock.patch.object(metrics, "_enabled", True)
+@mock.patch.dict(metrics._counters, clear=True)
+@mock.patch.dict(metrics._gauges, clear=True)
+@mock.patch.dict(metrics._histograms, clear=True)
+class RenderTests(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        metrics.record_simulation("vectorized", 1000, 0.02)
+        metrics.record_simulation("vectorized", 3000, 0.3)
+        text = metrics.render()
+        self.assertIn('sim_simulations_total{engine="vectorized"} 2', text)
+        self.assertIn('sim_trials_total{engine="vectorized"} 4000', text)
+        self.assertIn('sim_simulation_seconds_bucket{engine="vectorized",le="0.01"} 0', text)
+        self.assertIn('sim_simulation_seconds_bucket{engine="vectorized",le="0.025"} 1', text)
+        self.assertIn('sim_simulation_seconds_bucket{engine="vectorized",le="0.5"} 2', text)
+        self.assertIn('sim_simulation_seconds_bucket{engine="vectorized",le="+Inf"} 2', text)
+        self.assertIn('sim_simulation_seconds_count{engine="vectorized"} 2', text)
+        self.assertIn("# TYPE sim_trials_per_second gauge", text)
+
+    def test_disabled_records_nothing(self):
+        with mock.patch.object(metrics, "_enabled", False):
+            metrics.record_simulation("vectorized", 1000, 0.02)
+        self.assertEqual(metrics.render(), "\n")
+
+
+class TimingsApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/simulate/"
+
+    def test_timings_on_request(self):
+        response = self.client.post(self.url, {"trials": 500, "seed": 1, "timings": True}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("simulate", response.json()["timings"])
+        self.assertIn("simulate;dur=", response["Server-Timing"])
+        self.assertIn("serialize;dur=", response["Server-Timing"])
+
+    def test_no_timings_by_default(self):
+        response = self.client.post(self.url, {"trials": 500, "seed": 1}, format="json")
+        self.assertNotIn("timings", response.json())
+        self.assertFalse(response.has_header("Server-Timing"))
+
+
+@override_settings(SIM_METRICS_TOKEN="s3cret")
+@mock.patch.object(metrics, "_enabled", True)
+class MetricsViewTests(TestCase):
+    url = "/api/metrics/"
+
+    def test_loopback_is_not_trusted(self):
+        # A same-host reverse proxy makes every client look local
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR="127.0.0.1").status_code, 403)
+        self.client.force_login(User.objects.create(username="user"))
+        self.assertEqual(self.client.get(self.url, REMOTE_ADDR="::1").status_code, 403)
+
+    def test_token_or_staff(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        response = self.client.get(self.url, HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"sim_jobs", response.content)
+        self.client.force_login(User.objects.create(username="admin", is_staff=True))
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    @override_settings(SIM_METRICS_TOKEN="")
+    def test_no_token_configured(self):
+        self.assertEqual(self.client.get(self.url, HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+    def test_disabled_is_404(self):
+        with mock.patch.object(metrics, "_enabled", False):
+            response = self.client.get(self.url, HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,124 @@
+import itertools
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim.analytic import _point_values
+from sim.bench import store_graph
+from sim.compiled import compile_graph
+from sim.jobs import claim_next_job, run_job
+from sim.models import Node
+from sim.optimize import control_costs, optimize_controls
+from sim.simulate import _any_goal, _propagate
+from .graphs import random_dag
+
+CONTROLS = ["c0", "c1", "c2", "c3", "c4", "c5"]
+
+
+def controlled_plan(seed: int):
+    nodes, edges = random_dag(16, seed=seed, fixed=False, goals=2)
+    rng = np.random.default_rng(seed)
+    for n in nodes[2:]:
+        n.controls = sorted(rng.choice(CONTROLS, size=2, replace=False).tolist())
+    metadata = {
+        "controls": {
+            name: {"dist": "BETA", "alpha": 2 + i, "beta": 3, "cost": float(1 + i % 3)}
+            for i, name in enumerate(CONTROLS)
+        }
+    }
+    plan = compile_graph(nodes, edges, metadata)
+    return plan, control_costs(plan, metadata)
+
+
+def analytic_risk(plan, deployed):
+    """Full re-propagation of the point estimate with only `deployed` in force."""
+    threat = plan.threat
+    p = np.clip(_point_values(plan, "mean"), 0.0, 1.0)[None, :]
+    cap, strength, detect = threat.means()
+    mask = np.array([float(name in deployed) for name in threat.control_names])
+    eff = threat.combine(p, None, cap, strength * mask, detect)
+    return float(_any_goal(plan, _propagate(plan, eff))[0])
+
+
+class OptimizerTests(SimpleTestCase):
+    def test_exact_matches_brute_force(self):
+        for seed in range(4):
+            plan, costs = controlled_plan(seed)
+            for budget in (2.0, 5.0):
+                result = optimize_controls(plan, budget, costs, evaluator="analytic", method="exact")
+                best = min(
+                    analytic_risk(plan, s)
+                    for r in range(len(CONTROLS) + 1)
+                    for s in itertools.combinations(CONTROLS, r)
+                    if sum(costs[c] for c in s) <= budget
+                )
+                self.assertAlmostEqual(result["best"]["risk"], best, places=12)
+                self.assertAlmostEqual(result["best"]["risk"], analytic_risk(plan, result["best"]["controls"]), places=12)
+                self.assertLessEqual(result["best"]["cost"], budget)
+
+    def test_greedy_is_no_better_than_exact(self):
+        for seed in range(4):
+            plan, costs = controlled_plan(seed)
+            exact = optimize_controls(plan, 4.0, costs, trials=500, seed=1, method="exact")
+            greedy = optimize_controls(plan, 4.0, costs, trials=500, seed=1, method="greedy")
+            self.assertGreaterEqual(greedy["best"]["risk"], exact["best"]["risk"])
+            self.assertEqual(exact["baseline"], greedy["baseline"])
+            self.assertLess(exact["best"]["risk"], exact["baseline"]["risk"])
+
+    def test_frontier_is_non_dominated(self):
+        plan, costs = controlled_plan(1)
+        result = optimize_controls(plan, 6.0, costs, trials=500, seed=2)
+        self.assertEqual(result["method"], "exact")
+        frontier = result["frontier"]
+        self.assertEqual(frontier[0]["controls"], [])
+        self.assertEqual(frontier[-1], result["best"])
+        for a, b in zip(frontier, frontier[1:]):
+            self.assertLess(a["cost"], b["cost"])
+            self.assertGreater(a["risk"], b["risk"])
+
+    def test_memo_is_reused_across_budgets(self):
+        plan, costs = controlled_plan(2)
+        key = ("optimizer-test", 0)
+        first = optimize_controls(plan, 3.0, costs, trials=500, seed=3, cache_key=key)
+        again = optimize_controls(plan, 3.0, costs, trials=500, seed=3, cache_key=key)
+        self.assertEqual(again["reused_evaluations"], first["evaluations"])
+        self.assertEqual(again["evaluations"], 0)
+        self.assertEqual(again["frontier"], first["frontier"])
+
+
+class OptimizeApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.graph.metadata = {
+            "controls": {"mfa": {"dist": "FIXED", "value": 0.8, "cost": 2}, "edr": {"dist": "FIXED", "value": 0.5}}
+        }
+        self.graph.save()
+        Node.objects.filter(graph=self.graph, node_type="triangular").update(controls=["mfa", "edr"])
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/optimize/"
+
+    def test_queues_and_returns_frontier(self):
+        response = self.client.post(self.url, {"budget": 2, "trials": 500, "seed": 1}, format="json")
+        self.assertEqual(response.status_code, 202)
+        run_job(claim_next_job())
+        body = self.client.get(f"/api/jobs/{response.json()['id']}/").json()
+        self.assertEqual(body["status"], "done")
+        result = body["result"]
+        self.assertEqual(result["costs"], {"edr": 1.0, "mfa": 2.0})
+        self.assertLessEqual(result["best"]["cost"], 2)
+        self.assertLess(result["best"]["risk"], result["baseline"]["risk"])
+
+    def test_bad_options_are_400(self):
+        for body in (
+            {},
+            {"budget": -1},
+            {"budget": 1, "costs": {"nope": 1}},
+            {"budget": 1, "costs": {"mfa": -1}},
+            {"budget": 1, "candidates": ["nope"]},
+            {"budget": 1, "method": "anneal"},
+            {"budget": 1, "evaluator": "x"},
+            {"budget": 1, "trials": "x"},
+        ):
+            response = self.client.post(self.url, body, format="json")
+            self.assertEqual(response.status_code, 400, body)
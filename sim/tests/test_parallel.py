@@ -0,0 +1,35 @@
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TransactionTestCase
+from sim.bench import store_graph
+from sim.compiled import compile_graph, graph_plan
+from sim.jobs import submit_job
+from sim.simulate import CHUNK_TRIALS, simulate_plan
+from .graphs import random_dag
+
+
+class ParallelTests(SimpleTestCase):
+    def test_workers_give_bit_identical_results(self):
+        nodes, edges = random_dag(40, seed=2, fixed=False, goals=3)
+        plan = compile_graph(nodes, edges)
+        trials = 3 * CHUNK_TRIALS + 100
+        serial = simulate_plan(plan, trials=trials, seed=4, workers=1, exact="all")
+        parallel = simulate_plan(plan, trials=trials, seed=4, workers=2, exact="all")
+        self.assertEqual(serial, parallel)
+
+
+class WorkerCommandTests(TransactionTestCase):
+    # simworker forks processes that read and commit through the test database
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 30)
+
+    def test_command_runs_parallel_job(self):
+        # Worker processes are not daemonic, so a job can start its own pool
+        job = submit_job(self.graph, self.user, trials=2 * CHUNK_TRIALS, seed=1, workers=2)
+        call_command("simworker", "--workers", "2", "--once", stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "done", job.error)
+        serial = simulate_plan(graph_plan(self.graph), trials=2 * CHUNK_TRIALS, seed=1, workers=1)
+        self.assertEqual(job.result.mean, serial["success_distribution"]["mean"])
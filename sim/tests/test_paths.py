@@ -0,0 +1,80 @@
+import math
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.compiled import compile_graph
+from sim.paths import top_paths
+from .graphs import random_dag
+
+
+def _all_paths(plan, goal: int):
+    """Every foothold -> goal path as a list of columns."""
+    children = {j: [] for j in range(plan.n)}
+    for j in range(plan.n):
+        if not plan.foothold[j]:
+            for p in set(plan.parents_of(j).tolist()):
+                children[p].append(j)
+    out = []
+
+    def walk(path):
+        if path[-1] == goal:
+            out.append(list(path))
+            return
+        for v in children[path[-1]]:
+            walk(path + [v])
+
+    for s in np.flatnonzero(plan.foothold):
+        walk([int(s)])
+    return out
+
+
+class TopPathTests(SimpleTestCase):
+    def test_matches_brute_force(self):
+        for seed in range(10):
+            nodes, edges = random_dag(10, seed=seed, fan=2, footholds=2)
+            plan = compile_graph(nodes, edges)
+            goal = plan.goal_ids[0]
+            p = plan.dists.means()
+            expected = sorted(
+                (math.prod(p[c] for c in path) for path in _all_paths(plan, plan.index[goal])), reverse=True
+            )[:5]
+            got = [entry["probability"] for entry in top_paths(plan, k=5)["paths"][goal]]
+            self.assertEqual(len(got), len(expected))
+            for a, b in zip(got, expected):
+                self.assertAlmostEqual(a, b, places=12)
+
+    def test_distributions_centre_on_the_point_estimate(self):
+        plan = compile_graph(*random_dag(10, seed=1, fan=2, footholds=2, fixed=False))
+        for exact in (True, False):
+            result = top_paths(plan, k=3, trials=4000, seed=2, exact=exact)
+            for entry in result["paths"][plan.goal_ids[0]]:
+                dist = entry["distribution"]
+                self.assertLessEqual(dist["p10"], dist["p50"])
+                self.assertLessEqual(dist["p50"], dist["p90"])
+                self.assertAlmostEqual(dist["mean"], entry["probability"], delta=0.2 * entry["probability"] + 1e-3)
+
+
+class PathApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/paths/"
+
+    def test_returns_ranked_paths(self):
+        response = self.client.post(self.url, {"k": 3, "distributions": True, "trials": 500, "seed": 1}, format="json")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["trials"], 500)
+        for entries in body["paths"].values():
+            self.assertLessEqual(len(entries), 3)
+            probs = [e["probability"] for e in entries]
+            self.assertEqual(probs, sorted(probs, reverse=True))
+            self.assertTrue(all("distribution" in e for e in entries))
+
+    def test_bad_options_are_400(self):
+        for body in ({"k": 0}, {"k": "x"}, {"goals": "g"}, {"goals": ["missing"]}, {"point": "max"}):
+            response = self.client.post(self.url, body, format="json")
+            self.assertEqual(response.status_code, 400, body)
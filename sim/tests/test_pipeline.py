@@ -0,0 +1,81 @@
+from unittest import mock
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim import incremental
+from sim.bench import store_graph
+from sim.compiled import compile_graph, graph_plan
+from sim.fair_run import simulate_graph_scenario_mc
+from sim.incremental import success_samples
+from sim.models import Scenario
+from sim.simulate import CHUNK_TRIALS, simulate_plan
+from .graphs import random_dag
+
+
+class SuccessSampleTests(SimpleTestCase):
+    def setUp(self):
+        incremental._states.clear()
+        self.addCleanup(incremental._states.clear)
+        self.plan = compile_graph(*random_dag(20, seed=2, fixed=False, goals=2))
+        self.trials = CHUNK_TRIALS + 500
+
+    def test_samples_are_the_engines_any_goal(self):
+        vuln, reused = success_samples("g", self.plan, self.trials, 3)
+        self.assertFalse(reused)
+        fresh = simulate_plan(self.plan, trials=self.trials, seed=3, exact="none")
+        self.assertEqual(float(vuln.mean()), fresh["success_rate_any_goal"])
+        self.assertTrue(success_samples("g", self.plan, self.trials, 3)[1])
+
+    def test_large_runs_stream_without_retaining(self):
+        retained, _ = success_samples("g", self.plan, self.trials, 3)
+        incremental._states.clear()
+        with mock.patch.object(incremental, "MAX_CELLS", self.trials):
+            streamed, reused = success_samples("g", self.plan, self.trials, 3)
+        self.assertFalse(reused)
+        self.assertFalse(incremental._states)
+        np.testing.assert_array_equal(streamed, retained)
+
+    def test_loss_draws_pair_with_vulnerability(self):
+        vuln, _ = success_samples("g", self.plan, self.trials, 3)
+        fixed = {"dist": "FIXED", "value": 2.0}
+        out = simulate_graph_scenario_mc(vuln, tef_spec=fixed, plm_spec=fixed, slef_spec=fixed, slm_spec=fixed, seed=1)
+        # ALE = 2 * vuln * (2 + 2 * 2) per trial
+        for key in ("mean", "p10", "p50", "p90"):
+            self.assertAlmostEqual(out["ale"][key], 12.0 * out["vulnerability"][key], places=9)
+
+
+class GraphScenarioApiTests(APITestCase):
+    def setUp(self):
+        incremental._states.clear()
+        self.addCleanup(incremental._states.clear)
+        self.user = User.objects.create(username="owner")
+        self.client.force_authenticate(self.user)
+        self.graph = store_graph(self.user, "random", 20)
+        self.scenario = Scenario.objects.create(
+            title="s", owner=self.user, vuln_source="graph", primary_attack_graph=self.graph
+        )
+        self.url = f"/api/scenarios/{self.scenario.pk}/simulate/"
+
+    def test_graph_run_feeds_the_scenario(self):
+        graph_run = self.client.post(
+            f"/api/graphs/{self.graph.pk}/simulate/", {"trials": 3000, "seed": 5, "incremental": True}, format="json"
+        ).json()
+        body = self.client.post(self.url, {"trials": 3000, "seed": 5}, format="json").json()
+        self.assertEqual(body["graph"], {"id": str(self.graph.pk), "trials": 3000, "reused": True})
+        self.assertEqual(body["vulnerability"]["mean"], graph_run["success_rate_any_goal"])
+
+        manual = self.client.post(self.url, {"trials": 3000, "seed": 5, "vuln_source": "manual"}, format="json").json()
+        self.assertNotIn("vulnerability", manual)
+        self.assertNotEqual(manual["summary"], body["summary"])
+
+    def test_matches_a_fresh_graph_run(self):
+        body = self.client.post(self.url, {"trials": 2000, "seed": 1}, format="json").json()
+        self.assertFalse(body["graph"]["reused"])
+        fresh = simulate_plan(graph_plan(self.graph), trials=2000, seed=1)
+        self.assertEqual(body["vulnerability"]["mean"], fresh["success_rate_any_goal"])
+
+    def test_missing_graph_is_400(self):
+        self.scenario.primary_attack_graph = None
+        self.scenario.save()
+        self.assertEqual(self.client.post(self.url, {}, format="json").status_code, 400)
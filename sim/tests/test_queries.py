@@ -0,0 +1,48 @@
+from django.contrib.auth.models import User
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.compiled import graph_plan
+from sim.models import Scenario
+from sim.results import simulate_and_store
+
+
+class ListQueryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.client.force_authenticate(self.user)
+
+    def add_graphs(self, count):
+        graphs = [store_graph(self.user, "random", 10, seed=i) for i in range(count)]
+        for graph in graphs[::2]:
+            for seed in (1, 2):
+                simulate_and_store(graph, graph_plan(graph), trials=200, seed=seed, engine="vectorized")
+        scenario = Scenario.objects.create(title="s", owner=self.user, primary_attack_graph=graphs[0])
+        scenario.attack_graphs.set(graphs)
+        return graphs
+
+    def test_graph_list_is_a_fixed_number_of_queries(self):
+        graphs = []
+        for count, total in ((2, 2), (8, 10)):
+            graphs = self.add_graphs(count) + graphs
+            # The graphs and their latest results
+            with self.assertNumQueries(2):
+                response = self.client.get("/api/graphs/")
+            self.assertEqual(len(response.json()), total)
+        # Paged: plus the count
+        with self.assertNumQueries(3):
+            page = self.client.get("/api/graphs/?limit=3").json()
+        self.assertEqual((page["count"], len(page["results"])), (10, 3))
+
+        body = {g["id"]: g for g in self.client.get("/api/graphs/").json()}
+        summary = body[str(graphs[0].pk)]
+        self.assertEqual((summary["node_count"], summary["edge_count"]), (10, graphs[0].edges.count()))
+        self.assertEqual(summary["latest_result"]["seed"], 2)
+        self.assertIsNone(body[str(graphs[1].pk)]["latest_result"])
+
+    def test_scenario_list_is_a_fixed_number_of_queries(self):
+        for count in (1, 4):
+            self.add_graphs(count)
+            # Scenarios, their graphs and the graphs' latest results
+            with self.assertNumQueries(3):
+                response = self.client.get("/api/scenarios/")
+            self.assertEqual(len(response.json()), 1 if count == 1 else 2)
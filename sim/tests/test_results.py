@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.compiled import graph_plan
+from sim.jobs import claim_next_job, run_job, submit_job
+from sim.results import pack_payload, simulate_and_store, unpack_payload
+
+
+class ResultStorageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 30)
+
+    def test_payload_round_trip(self):
+        result, _, _ = simulate_and_store(self.graph, graph_plan(self.graph), trials=500, seed=1, engine="vectorized")
+        self.assertEqual(unpack_payload(pack_payload(result)), result)
+
+    def test_unseeded_runs_are_stored_but_not_reused(self):
+        plan = graph_plan(self.graph)
+        for _ in range(2):
+            _, _, hit = simulate_and_store(self.graph, plan, trials=500, seed=None, engine="vectorized")
+            self.assertFalse(hit)
+        self.assertEqual(self.graph.results.count(), 2)
+
+    @override_settings(SIM_RESULTS_PER_GRAPH=1)
+    def test_retention_keeps_job_results(self):
+        job = submit_job(self.graph, self.user, trials=500, seed=1)
+        run_job(claim_next_job())
+        for seed in range(2, 5):
+            simulate_and_store(self.graph, graph_plan(self.graph), trials=500, seed=seed, engine="vectorized")
+        job.refresh_from_db()
+        self.assertIsNotNone(job.result)
+        self.assertEqual(job.result.seed, 1)
+        # The job's result plus the newest other run
+        self.assertEqual(self.graph.results.count(), 2)
+
+
+class ResultCacheApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/simulate/"
+
+    def test_seeded_repeat_served_from_storage(self):
+        body = {"trials": 500, "seed": 3}
+        first = self.client.post(self.url, body, format="json")
+        second = self.client.post(self.url, body, format="json")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first["X-Result-Cache"], "miss")
+        self.assertEqual(second["X-Result-Cache"], "hit")
+        self.assertEqual(first.json(), second.json())
+
+    def test_graph_edit_misses_the_cache(self):
+        body = {"trials": 500, "seed": 3}
+        self.client.post(self.url, body, format="json")
+        edit = {"nodes": {"upsert": [{"node_id": "n3", "p_succ": {"dist": "FIXED", "value": 0.5}}]}}
+        self.assertEqual(self.client.patch(f"/api/graphs/{self.graph.pk}/changes/", edit, format="json").status_code, 200)
+        self.assertEqual(self.client.post(self.url, body, format="json")["X-Result-Cache"], "miss")
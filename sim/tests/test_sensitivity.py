@@ -0,0 +1,61 @@
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.compiled import compile_graph
+from sim.sensitivity import reach_gradient, sensitivity
+from sim.simulate import _any_goal, _chunk_uniforms, _propagate, _sample_p
+from .graphs import gated_graph, node
+
+
+class GradientTests(SimpleTestCase):
+    def test_adjoint_matches_finite_differences(self):
+        nodes, edges = gated_graph()
+        for n in nodes:
+            n.p_succ = {"min": 0.3, "mode": 0.6, "max": 0.9}
+        plan = compile_graph(nodes, edges)
+        p = _sample_p(plan, _chunk_uniforms(plan, np.random.SeedSequence(0), 4))
+        grad = reach_gradient(plan, p, _propagate(plan, p))
+        h = 1e-6
+        for j in range(plan.n):
+            up, down = p.copy(), p.copy()
+            up[:, j] += h
+            down[:, j] -= h
+            numeric = (_any_goal(plan, _propagate(plan, up)) - _any_goal(plan, _propagate(plan, down))) / (2 * h)
+            np.testing.assert_allclose(grad[:, j], numeric, atol=1e-7)
+
+
+class SensitivityTests(SimpleTestCase):
+    def test_chokepoint_ranks_first(self):
+        # Every path runs through "c"; on a single chain potential equals the success rate
+        spec = {"min": 0.4, "mode": 0.6, "max": 0.8}
+        nodes = [node("a", "foothold", spec), node("b", "foothold", 0.9), node("c", p=spec), node("g", "goal", 0.5)]
+        edges = [("a", "c"), ("b", "c"), ("c", "g")]
+        result = sensitivity(compile_graph(nodes, edges), trials=5000, seed=1)
+        self.assertEqual(result["ranking"][0], "c")
+        self.assertAlmostEqual(result["nodes"]["c"]["potential"], result["success_rate_any_goal"], places=12)
+        self.assertEqual(result["nodes"]["b"]["rank_correlation"], 0.0)
+        self.assertGreater(result["nodes"]["c"]["rank_correlation"], 0.5)
+
+
+class SensitivityApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/sensitivity/"
+
+    def test_ranks_every_node(self):
+        response = self.client.post(self.url, {"trials": 2000, "seed": 1}, format="json")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body["trials"], 2000)
+        self.assertEqual(sorted(body["ranking"]), sorted(body["nodes"]))
+        potentials = [body["nodes"][nid]["potential"] for nid in body["ranking"]]
+        self.assertEqual(potentials, sorted(potentials, reverse=True))
+
+    def test_bad_options_are_400(self):
+        for body in ({"trials": "x"}, {"trials": [1]}, {"seed": "x"}):
+            response = self.client.post(self.url, body, format="json")
+            self.assertEqual(response.status_code, 400, body)
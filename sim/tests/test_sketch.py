@@ -0,0 +1,64 @@
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.sketch import DEFAULT_BINS, ReachStats
+
+
+class SketchTests(SimpleTestCase):
+    def test_quantiles_within_one_bin(self):
+        rng = np.random.default_rng(0)
+        reach = rng.beta(0.5, 2.0, size=(20000, 6))
+        reach[:, 5] = 0.25
+        stats = ReachStats(6, reach.shape[0])
+        for start in range(0, reach.shape[0], 3000):
+            stats.update(start, reach[start:start + 3000])
+        qs = [0.1, 0.5, 0.9]
+        np.testing.assert_allclose(stats.quantiles(qs), np.percentile(reach, [10, 50, 90], axis=0), atol=1.0 / DEFAULT_BINS)
+        np.testing.assert_allclose(stats.means(), reach.mean(axis=0), rtol=1e-12)
+
+    def test_exact_columns_keep_samples(self):
+        rng = np.random.default_rng(1)
+        reach = rng.random((5000, 3))
+        stats = ReachStats(3, 5000, exact_cols=[1])
+        stats.update(0, reach)
+        np.testing.assert_allclose(stats.quantiles([0.5])[0, 1], np.percentile(reach[:, 1], 50))
+
+    def test_merged_parts_equal_one_pass(self):
+        rng = np.random.default_rng(2)
+        reach = rng.random((4000, 8))
+        # Mostly exact and mostly histogrammed columns take different update paths
+        for exact in ([0], [0, 1, 2, 3, 4, 5]):
+            whole = ReachStats(8, 4000, exact_cols=exact)
+            whole.update(0, reach)
+            merged = ReachStats(8, 4000, exact_cols=exact)
+            for start in (0, 1500):
+                part = ReachStats(8, 1500 if start == 0 else 2500, exact_cols=exact)
+                part.update(0, reach[start:start + part.trials])
+                merged.merge(start, part)
+            np.testing.assert_array_equal(merged.counts, whole.counts)
+            np.testing.assert_array_equal(merged.samples, whole.samples)
+            np.testing.assert_array_equal(merged.quantiles([0.25, 0.75]), whole.quantiles([0.25, 0.75]))
+
+
+class ExactModeApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/simulate/"
+
+    def test_exact_modes_agree_within_one_bin(self):
+        runs = {
+            mode: self.client.post(self.url, {"trials": 2000, "seed": 1, "exact": mode}, format="json").json()
+            for mode in ("all", "none")
+        }
+        for nid, dist in runs["all"]["node_distributions"].items():
+            for key in ("p10", "p50", "p90"):
+                self.assertAlmostEqual(dist[key], runs["none"]["node_distributions"][nid][key], delta=1.0 / DEFAULT_BINS)
+
+    def test_unknown_exact_mode_is_400(self):
+        response = self.client.post(self.url, {"exact": "some"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("exact", response.json()["detail"])
@@ -0,0 +1,89 @@
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+from rest_framework.test import APITestCase
+from scipy.special import expit, logit
+from sim.bench import store_graph
+from sim.models import Node
+from sim.simulate import run_trials
+from .graphs import node, random_dag
+
+
+def chain(**c_kwargs):
+    nodes = [node("a", "foothold", 0.9), node("c", p=0.6, **c_kwargs), node("g", "goal", 0.8)]
+    return nodes, [("a", "c"), ("c", "g")]
+
+
+def goal_rate(nodes, edges, metadata=None, engine="vectorized", trials=200):
+    return run_trials(nodes, edges, trials=trials, seed=0, engine=engine, metadata=metadata)["success_rate_any_goal"]
+
+
+class ThreatModelTests(SimpleTestCase):
+    def test_detection_stops_paths(self):
+        nodes, edges = chain(p_detect={"dist": "FIXED", "value": 0.4})
+        for engine in ("vectorized", "scalar"):
+            self.assertAlmostEqual(goal_rate(nodes, edges, engine=engine), 0.9 * 0.6 * 0.6 * 0.8, places=12)
+
+    def test_controls_shift_the_logit(self):
+        nodes, edges = chain(controls=["mfa", "undefined"])
+        metadata = {"controls": {"mfa": {"dist": "FIXED", "value": 0.5}}}
+        expected = 0.9 * expit(logit(0.6) - 4.0 * 0.5) * 0.8
+        for engine in ("vectorized", "scalar"):
+            self.assertAlmostEqual(goal_rate(nodes, edges, metadata, engine), expected, places=12)
+
+    def test_average_attacker_leaves_p_succ_unchanged(self):
+        nodes, edges = chain()
+        average = goal_rate(nodes, edges, {"attacker_capability": {"dist": "FIXED", "value": 0.5}})
+        self.assertAlmostEqual(average, goal_rate(nodes, edges), places=12)
+        strong = goal_rate(nodes, edges, {"attacker_capability": {"dist": "FIXED", "value": 1.0}})
+        self.assertAlmostEqual(strong, np.prod(expit(logit([0.9, 0.6, 0.8]) + 2.0)), places=12)
+
+    def test_controls_and_detection_lower_reach(self):
+        nodes, edges = random_dag(20, seed=3, fixed=False)
+        base = run_trials(nodes, edges, trials=5000, seed=1)
+        for n in nodes[5:15]:
+            n.controls = ["edr"]
+        nodes[10].p_detect = {"min": 0.1, "mode": 0.3, "max": 0.5}
+        metadata = {"controls": {"edr": {"dist": "BETA", "alpha": 4, "beta": 4}}}
+        hardened = run_trials(nodes, edges, trials=5000, seed=1, metadata=metadata)
+        self.assertLess(hardened["success_rate_any_goal"], base["success_rate_any_goal"])
+        for nid in ("n5", "n10", "n14"):
+            self.assertLess(hardened["node_activation_rates"][nid], base["node_activation_rates"][nid])
+        # Footholds no control touches keep their draws
+        self.assertEqual(hardened["node_activation_rates"]["n0"], base["node_activation_rates"]["n0"])
+
+    def test_shared_control_correlates_nodes(self):
+        nodes = [node(f"s{i}", "foothold", 0.5, controls=["waf"]) for i in range(2)]
+        nodes.append(node("g", "goal", 1.0, gate={"type": "and"}))
+        edges = [("s0", "g"), ("s1", "g")]
+        metadata = {"controls": {"waf": {"dist": "BETA", "alpha": 0.5, "beta": 0.5}}}
+        # One strength per trial shared by both footholds: E[p^2] > E[p]^2
+        result = run_trials(nodes, edges, trials=50000, seed=2, metadata=metadata)
+        p = result["node_activation_rates"]["s0"]
+        self.assertGreater(result["success_rate_any_goal"], p * p + 0.01)
+
+    def test_invalid_threat_specs(self):
+        nodes, edges = chain(weights={"k": "x"})
+        with self.assertRaises(ValueError):
+            goal_rate(nodes, edges, {"attacker_capability": {"dist": "FIXED", "value": 0.5}})
+        nodes, edges = chain(controls=["mfa"])
+        for metadata in ({"controls": [1]}, {"controls": {"mfa": {"dist": "NOPE"}}}):
+            with self.assertRaises(ValueError):
+                goal_rate(nodes, edges, metadata)
+
+
+class ThreatApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/simulate/"
+
+    def test_metadata_controls_lower_reach(self):
+        base = self.client.post(self.url, {"trials": 2000, "seed": 1}, format="json").json()
+        Node.objects.filter(graph=self.graph).exclude(node_type="foothold").update(controls=["edr"])
+        self.graph.metadata = {**(self.graph.metadata or {}), "controls": {"edr": {"dist": "FIXED", "value": 0.8}}}
+        self.graph.revision += 1
+        self.graph.save()
+        hardened = self.client.post(self.url, {"trials": 2000, "seed": 1}, format="json").json()
+        self.assertLess(hardened["success_rate_any_goal"], base["success_rate_any_goal"])
@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+from sim.bench import store_graph
+from sim.compiled import compile_graph
+from sim.simulate import CHUNK_TRIALS, simulate_plan
+from sim.whatif import run_whatif
+from .graphs import random_dag
+
+
+class WhatIfTests(SimpleTestCase):
+    def test_variants_equal_fresh_runs_on_the_same_seed(self):
+        nodes, edges = random_dag(25, seed=6, fixed=False, goals=2)
+        plan = compile_graph(nodes, edges)
+        trials = CHUNK_TRIALS + 300
+        spec = {"min": 0.05, "mode": 0.1, "max": 0.2}
+        out = run_whatif(plan, [{"name": "v", "overrides": {"n8": spec}}], trials=trials, seed=3)
+        self.assertEqual(out["base"], simulate_plan(plan, trials=trials, seed=3))
+
+        nodes[8].p_succ = spec
+        fresh = simulate_plan(compile_graph(nodes, edges), trials=trials, seed=3)
+        variant = out["variants"][0]["result"]
+        for nid, dist in fresh["node_distributions"].items():
+            for key, value in dist.items():
+                self.assertAlmostEqual(variant["node_distributions"][nid][key], value, places=12)
+        self.assertAlmostEqual(variant["success_rate_any_goal"], fresh["success_rate_any_goal"], places=12)
+
+    def test_pairing_shrinks_the_standard_error(self):
+        plan = compile_graph(*random_dag(25, seed=6, fixed=False))
+        variants = [{"overrides": {"n20": {"min": 0.1, "mode": 0.15, "max": 0.2}}}]
+        delta = run_whatif(plan, variants, trials=5000, seed=1)["variants"][0]["delta"]["success_rate_any_goal"]
+        self.assertLess(delta["standard_error"], delta["independent_standard_error"])
+
+
+class WhatIfApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="owner")
+        self.graph = store_graph(self.user, "random", 20)
+        self.client.force_authenticate(self.user)
+        self.url = f"/api/graphs/{self.graph.pk}/whatif/"
+
+    def test_variant_deltas(self):
+        variants = [{"name": "harden", "overrides": {"n5": {"dist": "FIXED", "value": 0}}}, {"name": "same"}]
+        response = self.client.post(self.url, {"trials": 1000, "seed": 1, "variants": variants}, format="json")
+        self.assertEqual(response.status_code, 200)
+        harden, same = response.json()["variants"]
+        self.assertEqual(harden["name"], "harden")
+        self.assertLessEqual(harden["delta"]["success_rate_any_goal"]["mean"], 0.0)
+        self.assertEqual(same["result"], response.json()["base"])
+
+    @override_settings(SIM_WHATIF_MAX_STATS_BYTES=1 << 20)
+    def test_statistics_budget(self):
+        variants = [{"overrides": {"n0": {"dist": "FIXED", "value": 0}}}] * 64
+        response = self.client.post(self.url, {"trials": 1000, "variants": variants}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("MB", response.json()["detail"])
+
+    def test_invalid_variants_are_400(self):
+        for variants in (
+            None,
+            "x",
+            [1],
+            [{"overrides": {"missing": {"dist": "FIXED", "value": 0}}}],
+            [{"overrides": {"n5": {"dist": "NOPE"}}}],
+            [{"overrides": [1]}],
+            [{"overrides": {"n5": 0.5}}],
+        ):
+            response = self.client.post(self.url, {"variants": variants}, format="json")
+            self.assertEqual(response.status_code, 400, variants)
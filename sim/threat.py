@@ -0,0 +1,207 @@
+from __future__ import annotations
+import hashlib
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List
+import numpy as np
+from .distributions import Distributions, compile_spec
+
+"""
+Attacker capability, controls and detection on top of node p_succ.
+
+Per trial, AttackGraph.metadata["attacker_capability"] and every control in
+metadata["controls"] are sampled once and shared by all nodes that use them,
+so their effects stay correlated across the graph. A node's effective
+probability of completing its step undetected is
+
+    p = expit(logit(p_succ) + k * (cap_w * (capability - 0.5) - ctrl_w * control)) * (1 - p_detect)
+
+where control = 1 - prod(1 - strength) over the node's Node.controls and
+Node.weights = {"cap": cap_w, "ctrl": ctrl_w, "k": k} (defaults 1, 1, 4).
+An average attacker (capability 0.5) against no controls leaves p_succ
+unchanged. A detected step stops the attacker there, so detection cuts every
+path through the node. Controls a node lists that metadata does not define
+have no strength.
+
+The draws are inverse-CDF transforms of extra uniform columns appended after
+the p_succ ones (capability, then controls, then detected nodes), so the
+engines' streams for p_succ are unchanged.
+"""
+
+DEFAULT_WEIGHTS = {"cap": 1.0, "ctrl": 1.0, "k": 4.0}
+
+
+def _weight(node, key: str) -> float:
+    value = (getattr(node, "weights", None) or {}).get(key, DEFAULT_WEIGHTS[key])
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Node {node.node_id}: weights.{key} must be a number.")
+    if not np.isfinite(value):
+        raise ValueError(f"Node {node.node_id}: weights.{key} must be finite.")
+    return value
+
+
+@dataclass(frozen=True)
+class ThreatModel:
+    capability: Distributions | None  # one column, or None without attacker_capability
+    controls: Distributions           # one column per control name
+    control_names: tuple
+    membership: np.ndarray            # (controls, n) 1.0 where a node lists the control
+    cap_shift: np.ndarray             # (n,) k * cap_w
+    ctrl_shift: np.ndarray            # (n,) k * ctrl_w
+    shifted: np.ndarray               # columns whose p_succ is moved by capability or controls
+    combo: np.ndarray                 # (n,) distinct (cap_shift, ctrl_shift, controls) row of each column
+    combo_cap: np.ndarray             # per combo: cap_shift
+    combo_ctrl: np.ndarray            # per combo: ctrl_shift
+    combo_members: np.ndarray         # (controls, combos) membership
+    detect: Distributions             # one column per node in detect_cols
+    detect_cols: np.ndarray
+
+    @property
+    def n_uniforms(self) -> int:
+        return int(self.capability is not None) + self.controls.n + self.detect.n
+
+    @cached_property
+    def digest(self) -> bytes:
+        h = hashlib.sha256("\x1f".join(self.control_names).encode())
+        for arr in (
+            self.membership, self.cap_shift, self.ctrl_shift, self.shifted, self.detect_cols,
+            self.controls.family, self.controls.params, self.detect.family, self.detect.params,
+        ):
+            h.update(np.ascontiguousarray(arr).tobytes())
+        if self.capability is not None:
+            h.update(self.capability.family.tobytes() + self.capability.params.tobytes())
+        return h.digest()
+
+    @cached_property
+    def detect_pos(self) -> np.ndarray:
+        """(n,) index of each column in detect_cols, -1 for undetected columns."""
+        pos = np.full(self.cap_shift.size, -1, dtype=np.intp)
+        pos[self.detect_cols] = np.arange(self.detect_cols.size)
+        return pos
+
+    def draws(self, extra: np.ndarray):
+        """(capability (rows, 1) or None, control strengths, detection) from the extra uniforms."""
+        i = 0
+        cap = None
+        if self.capability is not None:
+            cap = np.clip(self.capability.sample(extra[:, :1]), 0.0, 1.0)
+            i = 1
+        strength = np.clip(self.controls.sample(extra[:, i:i + self.controls.n]), 0.0, 1.0)
+        i += self.controls.n
+        detect = np.clip(self.detect.sample(extra[:, i:i + self.detect.n]), 0.0, 1.0)
+        return cap, strength, detect
+
+    def means(self):
+        """draws() at the distribution means, for point estimates."""
+        cap = None if self.capability is None else np.clip(self.capability.means(), 0.0, 1.0)[None, :]
+        return (
+            cap,
+            np.clip(self.controls.means(), 0.0, 1.0)[None, :],
+            np.clip(self.detect.means(), 0.0, 1.0)[None, :],
+        )
+
+    def combine(self, p: np.ndarray, cols: np.ndarray | None, cap, strength, detect) -> np.ndarray:
+        """Effective probabilities for a (rows, len(cols)) block of p_succ (all columns if cols is None)."""
+        n = self.cap_shift.size
+        cols = np.arange(n) if cols is None else cols
+        out = p.copy()
+        local = np.flatnonzero(self.shifted[cols])
+        if local.size:
+            # The logit shift only depends on the column's combo, so exp() runs once per combo;
+            # expit(logit(p) + shift) = p * e / (1 - p + p * e) with e = exp(shift)
+            shift = np.zeros((p.shape[0], self.combo_cap.size))
+            if cap is not None:
+                shift += (cap - 0.5) * self.combo_cap
+            if self.controls.n:
+                # control = 1 - prod(1 - s) over the node's controls, as a sum of logs
+                miss = np.log1p(-np.minimum(strength, 1.0 - 1e-12)) @ self.combo_members
+                shift -= (1.0 - np.exp(miss)) * self.combo_ctrl
+            np.clip(shift, -700.0, 700.0, out=shift)
+            e = np.exp(shift)[:, self.combo[cols[local]]]
+            pl = p[:, local]
+            out[:, local] = pl * e / (1.0 - pl + pl * e)
+        if self.detect.n:
+            which = self.detect_pos[cols]
+            local = np.flatnonzero(which >= 0)
+            if local.size:
+                out[:, local] *= 1.0 - detect[:, which[local]]
+        return out
+
+    def apply(self, p: np.ndarray, extra: np.ndarray, cols: np.ndarray | None = None) -> np.ndarray:
+        return self.combine(p, cols, *self.draws(extra))
+
+
+def _compile(labelled: List, default: str) -> Distributions:
+    """Distributions for (label, spec) pairs; errors name the label."""
+    family = np.zeros(len(labelled), dtype=np.int8)
+    params = np.zeros((len(labelled), 5), dtype=float)
+    for i, (label, spec) in enumerate(labelled):
+        try:
+            family[i], params[i] = compile_spec(spec, default=default, max_default=1.0)
+        except ValueError as exc:
+            raise ValueError(f"{label}: {exc}")
+    return Distributions.from_arrays(family, params)
+
+
+def compile_threat(nodes: List, metadata: Dict | None) -> ThreatModel | None:
+    """
+    ThreatModel for nodes in column order and the graph metadata, or None
+    when nothing in the graph uses capability, controls or detection.
+    Raises ValueError on invalid specs or weights.
+    """
+    metadata = metadata or {}
+    n = len(nodes)
+    cap_spec = metadata.get("attacker_capability") or None
+    defined = metadata.get("controls") or {}
+    if not isinstance(defined, dict):
+        raise ValueError("metadata.controls must be an object of control specs.")
+
+    used: List[str] = sorted({
+        c for node in nodes for c in (getattr(node, "controls", None) or []) if c in defined
+    })
+    detect_cols = np.array(
+        [j for j, node in enumerate(nodes) if getattr(node, "p_detect", None)], dtype=np.intp
+    )
+    if cap_spec is None and not used and not detect_cols.size:
+        return None
+
+    capability = _compile([("attacker_capability", cap_spec)], "BETA") if cap_spec is not None else None
+    controls = _compile([(f"controls.{c}", defined[c]) for c in used], "BETA")
+
+    membership = np.zeros((len(used), n), dtype=float)
+    slot = {c: i for i, c in enumerate(used)}
+    for j, node in enumerate(nodes):
+        for c in getattr(node, "controls", None) or []:
+            if c in slot:
+                membership[slot[c], j] = 1.0
+
+    k = np.array([_weight(node, "k") for node in nodes], dtype=float).reshape(n)
+    cap_shift = k * np.array([_weight(node, "cap") for node in nodes], dtype=float).reshape(n)
+    ctrl_shift = k * np.array([_weight(node, "ctrl") for node in nodes], dtype=float).reshape(n)
+    if capability is None:
+        cap_shift[:] = 0.0
+    shifted = (cap_shift != 0.0) | ((membership.sum(axis=0) > 0) & (ctrl_shift != 0.0))
+    keys = np.column_stack([cap_shift, ctrl_shift, membership.T])
+    uniq, combo = np.unique(keys, axis=0, return_inverse=True)
+
+    detect = _compile(
+        [(f"Node {nodes[j].node_id}: p_detect", nodes[j].p_detect) for j in detect_cols.tolist()], "TRIANGULAR"
+    )
+
+    return ThreatModel(
+        capability=capability,
+        controls=controls,
+        control_names=tuple(used),
+        membership=membership,
+        cap_shift=cap_shift,
+        ctrl_shift=ctrl_shift,
+        shifted=shifted,
+        combo=combo.reshape(n).astype(np.intp),
+        combo_cap=uniq[:, 0].copy(),
+        combo_ctrl=uniq[:, 1].copy(),
+        combo_members=np.ascontiguousarray(uniq[:, 2:].T),
+        detect=detect,
+        detect_cols=detect_cols,
+    )
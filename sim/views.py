@@ -1,10 +1,36 @@
+import hmac
+import math
+import os
+import time
+import uuid
+from django.conf import settings
+from django.db.models import Prefetch
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound, StreamingHttpResponse
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
-from sim.models import AttackGraph, Scenario
-from sim.serializers import AttackGraphSerializer, ScenarioSerializer
-from .simulate import SimNode, run_trials
-from sim.fair_run import simulate_scenario_mc
+from sim.models import AttackGraph, Scenario, SimulationJob
+from sim.serializers import (
+    AttackGraphSerializer, AttackGraphSummarySerializer, ScenarioSerializer, SimulationJobSerializer, graph_summaries,
+)
+from .simulate import ENGINES, DEFAULT_ENGINE
+from .sketch import EXACT_MODES, DEFAULT_EXACT
+from .compiled import graph_plan
+from .jobs import submit_job, submit_optimize_job
+from .results import simulate_and_store
+from . import analytic
+from .whatif import run_whatif
+from .bulk import export_graph, import_graph
+from .changes import RevisionConflict, apply_changes
+from .sensitivity import sensitivity as node_sensitivity
+from .paths import DEFAULT_K, top_paths
+from .cuts import DEFAULT_LIMIT, min_cut_sets
+from . import optimize
+from . import metrics
+from .incremental import success_samples
+from sim.fair_run import simulate_scenario_mc, simulate_graph_scenario_mc, simulate_portfolio_mc
 
 class IsOwner(permissions.BasePermission):
     """Custom permission: only owners can view/edit their graphs."""
@@ -21,95 +47,499 @@ class IsOwner(permissions.BasePermission):
         # Default: deny access if ownership cannot be determined
         return False
 
+# Largest "trials" a simulate request may ask for; override with settings.SIM_MAX_TRIALS
+DEFAULT_MAX_TRIALS = 200_000
+
+
+def _truthy(value) -> bool:
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def _max_trials() -> int:
+    return getattr(settings, "SIM_MAX_TRIALS", DEFAULT_MAX_TRIALS)
+
+
+def simulation_options(data) -> dict:
+    """
+    Validate the simulate request body into keyword arguments for
+    simulate_and_store / submit_job. Raises ValueError with a user-facing message.
+    """
+    try:
+        runs = int(data.get("trials", 5000))
+    except (TypeError, ValueError):
+        raise ValueError("trials must be an integer.")
+    runs = max(100, min(runs, _max_trials()))  # guardrails
+
+    seed = data.get("seed")
+    try:
+        seed = int(seed) if seed is not None else None
+    except (TypeError, ValueError):
+        raise ValueError("seed must be an integer.")
+
+    engine = data.get("engine", DEFAULT_ENGINE)
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Expected one of: {', '.join(ENGINES)}.")
+
+    # Nodes whose percentiles use every sample; the rest use histogram sketches
+    exact = data.get("exact", DEFAULT_EXACT)
+    if exact not in EXACT_MODES:
+        raise ValueError(f"Unknown exact mode '{exact}'. Expected one of: {', '.join(EXACT_MODES)}.")
+
+    # Process-pool size for the vectorized engine; results do not depend on it
+    try:
+        workers = int(data.get("workers", 1))
+    except (TypeError, ValueError):
+        workers = 1
+    max_workers = getattr(settings, "SIM_MAX_WORKERS", None) or os.cpu_count() or 1
+    workers = max(1, min(workers, max_workers))
+
+    # Adaptive mode: "trials" becomes the budget, stop early once converged
+    adaptive = None
+    if _truthy(data.get("adaptive", "")):
+        try:
+            tolerance = float(data.get("tolerance", 0.005))
+            budget = data.get("time_budget")
+            budget = float(budget) if budget is not None else None
+        except (TypeError, ValueError):
+            raise ValueError("tolerance and time_budget must be numbers.")
+        if not math.isfinite(tolerance) or tolerance <= 0:
+            raise ValueError("tolerance must be a positive number.")
+        if budget is not None and not (math.isfinite(budget) and budget >= 0):
+            raise ValueError("time_budget must be a non-negative number of seconds.")
+        adaptive = {"tolerance": tolerance, "time_budget": budget}
+
+    # What-if editing: reuse the last seeded run's samples, re-propagate changed nodes only
+    incremental = _truthy(data.get("incremental", ""))
+
+    return {
+        "trials": runs, "seed": seed, "engine": engine,
+        "workers": workers, "exact": exact, "adaptive": adaptive,
+        "incremental": incremental,
+    }
+
+
+def fair_options(data) -> tuple:
+    """
+    (trials, seed) of a scenario simulate or portfolio body, with trials
+    capped like simulation_options. Raises ValueError with a user-facing message.
+    """
+    try:
+        trials = int(data.get("trials", 20000))
+        seed = data.get("seed")
+        seed = int(seed) if seed is not None else None
+    except (TypeError, ValueError):
+        raise ValueError("trials and seed must be integers.")
+    if trials < 1:
+        raise ValueError("trials must be at least 1.")
+    return min(trials, _max_trials()), seed
+
+
+def optimize_options(data, plan, metadata) -> dict:
+    """
+    Validate an optimize request body into submit_optimize_job params.
+    Raises ValueError with a user-facing message.
+    """
+    try:
+        budget = float(data.get("budget"))
+    except (TypeError, ValueError):
+        raise ValueError("budget is required and must be a number.")
+    costs = data.get("costs") or {}
+    if not isinstance(costs, dict):
+        raise ValueError("costs must be an object of control name -> cost.")
+    candidates = data.get("candidates")
+    if candidates is not None and (not isinstance(candidates, list) or not all(isinstance(c, str) for c in candidates)):
+        raise ValueError("candidates must be a list of control names.")
+    try:
+        trials = int(data.get("trials", optimize.DEFAULT_TRIALS))
+    except (TypeError, ValueError):
+        raise ValueError("trials must be an integer.")
+    seed = data.get("seed")
+    try:
+        seed = int(seed) if seed is not None else 0
+    except (TypeError, ValueError):
+        raise ValueError("seed must be an integer.")
+    params = {
+        "budget": budget,
+        "costs": costs,
+        "candidates": candidates,
+        "evaluator": data.get("evaluator", "monte_carlo"),
+        "method": data.get("method", "auto"),
+        # Every set is evaluated on the same draws, so a fixed seed is always used
+        "trials": max(100, min(trials, optimize.MAX_TRIALS)),
+        "seed": seed,
+    }
+    # Fail now rather than in the worker
+    all_costs = optimize.control_costs(plan, metadata, costs)
+    optimize.check_options(all_costs, budget, candidates, params["evaluator"], params["method"])
+    return params
+
+
+class ListPagination(LimitOffsetPagination):
+    """?limit=&offset= pages; without ?limit= the list is returned whole, as before."""
+    default_limit = None
+    max_limit = 500
+
+
 class AttackGraphViewSet(viewsets.ModelViewSet):
     serializer_class = AttackGraphSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    pagination_class = ListPagination
 
     def get_queryset(self):
         # Only allow access to this user's graphs
-        return AttackGraph.objects.filter(owner=self.request.user) or self.request.user.is_superuser
+        qs = AttackGraph.objects.filter(owner=self.request.user)
+        qs = AttackGraph.objects.all() if self.request.user.is_superuser else qs
+        if self.action == "list":
+            # Summaries only; nodes and edges are served by the detail view
+            return graph_summaries(qs).order_by("-updated_at", "id")
+        return qs
+
+    def get_serializer_class(self):
+        return AttackGraphSummarySerializer if self.action == "list" else AttackGraphSerializer
 
     def perform_create(self, serializer):
         # Automatically set the owner when a new graph is created
         serializer.save(owner=self.request.user)
 
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Phase timings of simulate requests, see sim.metrics
+        request.sim_timings = None
+        if self.action == "simulate":
+            asked = _truthy(request.data.get("timings", ""))
+            if asked or getattr(settings, "SIM_TIMINGS", False):
+                request.sim_timings = (metrics.Timings(), asked)
+                request.sim_timings_token = metrics.start(request.sim_timings[0])
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(request, "sim_timings", None) is None:
+            return response
+        timings, asked = request.sim_timings
+        metrics.stop(request.sim_timings_token)
+        if asked and response.status_code == status.HTTP_200_OK and isinstance(response.data, dict):
+            response.data["timings"] = timings.as_dict()
+        # Rendered here rather than by the handler so the header can include it
+        t0 = time.perf_counter()
+        response.render()
+        timings.add("serialize", time.perf_counter() - t0)
+        response["Server-Timing"] = timings.header()
+        metrics.record_timings(timings)
+        return response
+
     # Correct, current simulation
     @action(detail=True, methods=["post"])
     def simulate(self, request, pk=None):
         graph: AttackGraph = self.get_object()
 
         try:
-            runs = int(request.data.get("trials", 5000))
-            runs = max(100, min(runs, 200_000))  # guardrails
-        except Exception:
-            runs = 5000
+            options = simulation_options(request.data)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        seed = request.data.get("seed")
-        seed = int(seed) if seed is not None else None
+        # Point-estimate pass for interactive editing; cheap, so nothing is stored
+        if request.data.get("method", "montecarlo") == analytic.METHOD:
+            point = request.data.get("point", "mean")
+            if point not in analytic.POINTS:
+                return Response(
+                    {"detail": f"Unknown point estimate '{point}'. Expected one of: {', '.join(analytic.POINTS)}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                plan = graph_plan(graph)
+            except ValueError as exc:
+                return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(analytic.analyze(plan, point), status=status.HTTP_200_OK)
 
-        # Map DB -> SimNode
-        nodes = [
-            SimNode(
-                node_id=n.node_id,
-                node_name=getattr(n, "label"),
-                node_type=getattr(n, "node_type", "triangular"),
-                kind=getattr(n, "kind", "Asset"),
-                p_succ=(n.p_succ or {}),
-            )
-            for n in graph.nodes.all()
-        ]
-        edges = [(e.source, e.target) for e in graph.edges.all()]
+        # Background mode: enqueue for `manage.py simworker` and poll /api/jobs/{id}/
+        if _truthy(request.data.get("async", "")):
+            job = submit_job(graph, request.user, **options)
+            return Response(SimulationJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+        # Compiled once per graph revision; raises ValueError on a cycle
+        try:
+            plan = graph_plan(graph)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not nodes:
+        if not plan.n:
             return Response(
                 {"detail": "Graph has no nodes."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        result = run_trials(nodes, edges, trials=runs, seed=seed)
+        # Stored with every run; a seeded repeat is served from AttackGraphResult
+        result, _, hit = simulate_and_store(graph, plan, **options)
+        return Response(result, status=status.HTTP_200_OK, headers={"X-Result-Cache": "hit" if hit else "miss"})
+
+    @action(detail=True, methods=["patch"])
+    def changes(self, request, pk=None):
+        """
+        Upsert / delete nodes and edges by id without resending the graph (see sim.changes).
+        Responds with the new revision and only the changed entities; 409 if base_revision is stale.
+        """
+        graph: AttackGraph = self.get_object()
+        if not isinstance(request.data, dict):
+            return Response({"detail": "Expected a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = apply_changes(graph, request.data)
+        except RevisionConflict as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_409_CONFLICT)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def bulk_import(self, request):
+        """Create a graph from an NDJSON body (see sim.bulk); ?title= overrides the graph record's title."""
+        return self._import(request, None, status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["post"], url_path="import")
+    def bulk_replace(self, request, pk=None):
+        """Replace the graph's nodes and edges with an NDJSON body (see sim.bulk)."""
+        return self._import(request, self.get_object(), status.HTTP_200_OK)
+
+    def _import(self, request, graph, code):
+        try:
+            out = import_graph(
+                request.stream or (), request.user, graph=graph, title=request.query_params.get("title")
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {"id": str(out["graph"].pk), "title": out["graph"].title, "nodes": out["nodes"], "edges": out["edges"]},
+            status=code,
+        )
+
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        """Stream the graph as NDJSON (see sim.bulk)."""
+        graph: AttackGraph = self.get_object()
+        response = StreamingHttpResponse(export_graph(graph), content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="graph-{graph.pk}.ndjson"'
+        return response
+
+    @action(detail=True, methods=["post"])
+    def whatif(self, request, pk=None):
+        """
+        Evaluate variants of the graph on common random numbers.
+        Body: {"variants": [{"name", "overrides": {node_id: p_succ}}], "trials", "seed", "exact"}
+        """
+        graph: AttackGraph = self.get_object()
+        variants = request.data.get("variants")
+        if not isinstance(variants, list) or not all(isinstance(v, dict) for v in variants):
+            return Response({"detail": "variants must be a list of objects."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            options = simulation_options(request.data)
+            plan = graph_plan(graph)
+            result = run_whatif(
+                plan, variants, trials=options["trials"], seed=options["seed"], exact=options["exact"]
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["post"])
+    def sensitivity(self, request, pk=None):
+        """Per-node importance (rank correlation, Birnbaum derivative) from one set of trials."""
+        graph: AttackGraph = self.get_object()
+        try:
+            options = simulation_options(request.data)
+            plan = graph_plan(graph)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        result = node_sensitivity(plan, trials=options["trials"], seed=options["seed"])
+        return Response(result, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=["post"])
+    def cuts(self, request, pk=None):
+        """
+        Minimal sets of nodes whose removal disconnects every foothold from a goal,
+        ranked by the reach they intercept.
+        Body: {"goals": [node_id], "max_size", "limit"}
+        """
+        graph: AttackGraph = self.get_object()
+        goals = request.data.get("goals")
+        if goals is not None and (not isinstance(goals, list) or not all(isinstance(g, str) for g in goals)):
+            return Response({"detail": "goals must be a list of node ids."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            try:
+                limit = int(request.data.get("limit", DEFAULT_LIMIT))
+                max_size = request.data.get("max_size")
+                max_size = int(max_size) if max_size is not None else None
+            except (TypeError, ValueError):
+                raise ValueError("limit and max_size must be integers.")
+            result = min_cut_sets(graph_plan(graph), goals=goals, max_size=max_size, limit=limit)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
         return Response(result, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["post"])
+    def optimize(self, request, pk=None):
+        """
+        Queue a search for the controls that minimize success_rate_any_goal within a budget;
+        poll /api/jobs/{id}/ for the Pareto frontier of cost against risk.
+        Body: {"budget", "costs": {control: cost}, "candidates": [control],
+               "evaluator": "monte_carlo" | "analytic", "method": "auto" | "greedy" | "exact", "trials", "seed"}
+        """
+        graph: AttackGraph = self.get_object()
+        try:
+            params = optimize_options(request.data, graph_plan(graph), graph.metadata)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        job = submit_optimize_job(graph, request.user, params)
+        return Response(SimulationJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["post"])
+    def paths(self, request, pk=None):
+        """
+        The k most likely foothold -> goal paths per goal; "distributions" adds
+        each path's spread over "trials" samples (exact "all" / "none" forces
+        exact or sketched percentiles).
+        Body: {"k", "goals": [node_id], "point": "mean" | "mode", "distributions", "trials", "seed", "exact"}
+        """
+        graph: AttackGraph = self.get_object()
+        goals = request.data.get("goals")
+        if goals is not None and (not isinstance(goals, list) or not all(isinstance(g, str) for g in goals)):
+            return Response({"detail": "goals must be a list of node ids."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            try:
+                k = int(request.data.get("k", DEFAULT_K))
+            except (TypeError, ValueError):
+                raise ValueError("k must be an integer.")
+            options = simulation_options(request.data)
+            plan = graph_plan(graph)
+            result = top_paths(
+                plan,
+                k=k,
+                goals=goals,
+                point=request.data.get("point", "mean"),
+                trials=options["trials"] if _truthy(request.data.get("distributions", "")) else 0,
+                seed=options["seed"],
+                exact={"all": True, "none": False}.get(options["exact"]),
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK)
+
+class SimulationJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status, progress and result of queued simulations."""
+    serializer_class = SimulationJobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+
+    def get_queryset(self):
+        return SimulationJob.objects.filter(owner=self.request.user).select_related("result")
+
 """ 
 Scenario viewsets, for implementation of FAIR scenario simulation as a backup method to evaluate FAIR scenarios.
 Not considered main scope of project, but partial implementation remains. Remains here for completeness.
 """
 
+def scenario_specs(scenario) -> dict:
+    """simulate_scenario_mc spec kwargs from a Scenario's min/ml/max fields."""
+    return {
+        f"{name}_spec": {
+            "dist": "TRIANGULAR",
+            "min": getattr(scenario, f"{name}_min"),
+            "mode": getattr(scenario, f"{name}_ml"),
+            "max": getattr(scenario, f"{name}_max"),
+        }
+        for name in ("tef", "vuln", "plm", "slef", "slm")
+    }
+
+
 class ScenarioViewSet(viewsets.ModelViewSet):
     serializer_class = ScenarioSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    pagination_class = ListPagination
 
     def get_queryset(self):
         qs = Scenario.objects.filter(owner=self.request.user)
-        return Scenario.objects.all() if self.request.user.is_superuser else qs
+        qs = Scenario.objects.all() if self.request.user.is_superuser else qs
+        return qs.prefetch_related(Prefetch("attack_graphs", queryset=graph_summaries(AttackGraph.objects.all())))
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
     @action(detail=True, methods=["post"])
     def simulate(self, request, pk=None):
+        """
+        FAIR Monte Carlo for the scenario. With vuln_source "graph" (the
+        scenario's own setting unless the body overrides it) Vulnerability is
+        the primary attack graph's per-trial any-goal probability, paired
+        trial by trial with the TEF and loss draws.
+        """
         scenario = self.get_object()
-        trials = int(request.data.get("trials", 20000))
-        seed = request.data.get("seed")
-        seed = int(seed) if seed is not None else None
+        try:
+            trials, seed = fair_options(request.data)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
 
-        # Build specs from scenario fields
-        tef_spec = {"dist": "TRIANGULAR", "min": scenario.tef_min, "mode": scenario.tef_ml, "max": scenario.tef_max}
-        vuln_spec = {"dist": "TRIANGULAR", "min": scenario.vuln_min, "mode": scenario.vuln_ml, "max": scenario.vuln_max}
-        plm_spec  = {"dist": "TRIANGULAR", "min": scenario.plm_min, "mode": scenario.plm_ml, "max": scenario.plm_max}
-        slef_spec = {"dist": "TRIANGULAR", "min": scenario.slef_min, "mode": scenario.slef_ml, "max": scenario.slef_max}
-        slm_spec  = {"dist": "TRIANGULAR", "min": scenario.slm_min, "mode": scenario.slm_ml, "max": scenario.slm_max}
-
-        summary = simulate_scenario_mc(
-            tef_spec=tef_spec, vuln_spec=vuln_spec,
-            plm_spec=plm_spec, slef_spec=slef_spec, slm_spec=slm_spec,
-            trials=trials, seed=seed
-        )
+        specs = scenario_specs(scenario)
+        extra = {}
+        if request.data.get("vuln_source", scenario.vuln_source) == "graph":
+            graph = scenario.primary_attack_graph
+            if graph is None:
+                return Response({"detail": "No primary_attack_graph set."}, status=400)
+            try:
+                options = simulation_options({"trials": trials, "seed": seed})
+                plan = graph_plan(graph)
+            except ValueError as exc:
+                return Response({"detail": str(exc)}, status=400)
+            if not plan.n:
+                return Response({"detail": "Graph has no nodes."}, status=400)
+            # Retained seeded runs of the graph are reused; nothing is written for the graph
+            vuln, reused = success_samples(str(graph.pk), plan, options["trials"], options["seed"])
+            del specs["vuln_spec"]
+            out = simulate_graph_scenario_mc(vuln, **specs, seed=seed)
+            summary = out["ale"]
+            extra = {
+                "vulnerability": out["vulnerability"],
+                "graph": {"id": str(graph.pk), "trials": options["trials"], "reused": reused},
+            }
+        else:
+            summary = simulate_scenario_mc(**specs, trials=trials, seed=seed)
 
         # Optionally persist to model
         scenario.ale_estimate = summary["p50"]
         scenario.save(update_fields=["ale_estimate"])
 
-        return Response({"summary": summary})
+        return Response({"summary": summary, **extra})
+
+    @action(detail=False, methods=["post"])
+    def portfolio(self, request):
+        """
+        Portfolio-level ALE over several scenarios in one run.
+        Body: {"scenarios": [scenario ids], "trials", "seed"}; all owned scenarios when omitted.
+        """
+        ids = request.data.get("scenarios")
+        if ids is None:
+            scenarios = list(self.get_queryset().order_by("title", "id"))
+        else:
+            try:
+                ids = list(dict.fromkeys(uuid.UUID(str(i)) for i in ids))
+            except (TypeError, ValueError):
+                return Response({"detail": "scenarios must be a list of scenario ids."}, status=400)
+            found = self.get_queryset().in_bulk(ids)
+            missing = [str(i) for i in ids if i not in found]
+            if missing:
+                return Response({"detail": f"Unknown scenario: {missing[0]}"}, status=400)
+            scenarios = [found[i] for i in ids]
+        if not scenarios:
+            return Response({"detail": "No scenarios to simulate."}, status=400)
+        try:
+            trials, seed = fair_options(request.data)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+
+        out = simulate_portfolio_mc([scenario_specs(s) for s in scenarios], trials=trials, seed=seed)
+        return Response({
+            "trials": trials,
+            "seed": seed,
+            "scenarios": {str(s.id): summary for s, summary in zip(scenarios, out["scenarios"])},
+            "portfolio": out["portfolio"],
+        })
 
     @action(detail=True, methods=["post"])
     def refresh_vulnerability(self, request, pk=None):
@@ -127,4 +557,43 @@ class ScenarioViewSet(viewsets.ModelViewSet):
         scenario.vuln_max = latest.p90
         scenario.compute_derived_values()
         scenario.save()
-        return Response(ScenarioSerializer(scenario).data)
\ No newline at end of file
+        return Response(ScenarioSerializer(scenario).data)
+
+
+def _ratio(name: str) -> dict:
+    """Hit ratio of a hit/miss counter, {(): ratio}, or {} before the first lookup."""
+    counts = {dict(labels).get("outcome"): value for labels, value in metrics.counter_values(name).items()}
+    total = counts.get("hit", 0.0) + counts.get("miss", 0.0)
+    return {(): counts.get("hit", 0.0) / total} if total else {}
+
+
+def metrics_view(request):
+    """
+    Prometheus text metrics of this process (settings.SIM_METRICS). Only
+    served to staff users, or to a scraper sending
+    "Authorization: Bearer <settings.SIM_METRICS_TOKEN>". The client address
+    is not trusted: behind a reverse proxy every request comes from loopback.
+    """
+    if not metrics.enabled():
+        return HttpResponseNotFound()
+    token = getattr(settings, "SIM_METRICS_TOKEN", "")
+    sent = request.META.get("HTTP_AUTHORIZATION", "")
+    scraper = bool(token) and hmac.compare_digest(sent.encode(), f"Bearer {token}".encode())
+    if not scraper and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden()
+
+    queued = dict(
+        SimulationJob.objects.filter(status__in=("queued", "running")).values_list("status").annotate(n=Count("id"))
+    )
+    extra = {
+        "sim_jobs": (
+            "Simulation jobs waiting or running (queue depth).",
+            {(("status", s),): float(queued.get(s, 0)) for s in ("queued", "running")},
+        ),
+        "sim_result_cache_hit_ratio": ("Stored-result lookups served from cache.", _ratio("sim_result_cache_requests_total")),
+        "sim_plan_cache_hit_ratio": ("Compiled-plan lookups served from cache.", _ratio("sim_plan_cache_requests_total")),
+    }
+    rss = metrics.peak_rss_bytes()
+    if rss is not None:
+        extra["sim_peak_rss_bytes"] = ("Peak resident memory of this process.", {(): rss})
+    return HttpResponse(metrics.render(extra), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,157 @@
+from __future__ import annotations
+from typing import Dict, List
+import numpy as np
+from django.conf import settings
+from .compiled import CompiledGraph, p_succ_spec
+from .distributions import Distributions
+from .incremental import dirty_columns
+from .simulate import (
+    BLOCK_VALUES, CHUNK_TRIALS, Z_95, _any_goal, _chunk_streams, _chunk_uniforms, _propagate,
+    _propagate_dirty, _result, _sample_p,
+)
+from .sketch import DEFAULT_BINS, ReachStats, exact_columns, DEFAULT_EXACT
+
+"""
+Batch what-if evaluation with common random numbers.
+
+Every variant of a graph (p_succ overrides on some nodes) is evaluated on
+the same uniform draws as the base graph. Per chunk the base is propagated
+once and each variant only re-propagates the descendants of the nodes it
+overrides. Paired differences against the base have far less variance than
+differences between independent runs, so small effects can be resolved at
+ordinary trial counts.
+"""
+
+MAX_VARIANTS = 64
+# Default cap on a request's per-variant node statistics, in bytes (see run_whatif)
+DEFAULT_MAX_STATS_BYTES = 256 << 20
+
+
+def variant_dists(plan: CompiledGraph, overrides: Dict[str, Dict]) -> Distributions:
+    """The plan's p_succ distributions with overridden nodes recompiled."""
+    if not isinstance(overrides, dict):
+        raise ValueError("overrides must be an object of node_id -> p_succ spec.")
+    family = plan.dists.family.copy()
+    params = plan.dists.params.copy()
+    for nid, spec in overrides.items():
+        if nid not in plan.index:
+            raise ValueError(f"Unknown node in overrides: {nid}")
+        if not isinstance(spec, dict):
+            raise ValueError(f"Override for {nid} must be a p_succ object.")
+        try:
+            family[plan.index[nid]], params[plan.index[nid]] = p_succ_spec(spec)
+        except ValueError as exc:
+            raise ValueError(f"Override for {nid}: {exc}")
+    return Distributions.from_arrays(family, params)
+
+
+def _paired(variant: np.ndarray, base: np.ndarray) -> Dict[str, float]:
+    """Mean paired difference with its 95% CI, plus the SE an unpaired comparison would have."""
+    n = variant.size
+    d = variant - base
+    mean = float(d.mean()) if n else 0.0
+    se = float(d.std(ddof=1) / np.sqrt(n)) if n > 1 else 0.0
+    independent = float(np.sqrt((variant.var(ddof=1) + base.var(ddof=1)) / n)) if n > 1 else 0.0
+    return {
+        "mean": mean,
+        "standard_error": se,
+        "ci95": [mean - Z_95 * se, mean + Z_95 * se],
+        "independent_standard_error": independent,
+    }
+
+
+def run_whatif(
+    plan: CompiledGraph,
+    variants: List[Dict],
+    trials: int = 20000,
+    seed: int | None = None,
+    exact: str = DEFAULT_EXACT,
+) -> Dict:
+    """
+    variants: [{"name": str, "overrides": {node_id: p_succ spec}}, ...].
+    Returns the base result, each variant's result and its paired deltas on
+    success_rate_any_goal and on every goal's reach (goal deltas need the
+    goals' exact samples, i.e. exact "goals" or "all").
+
+    Nodes a variant does not dirty reach exactly as in the base, so each
+    variant only accumulates statistics for its dirty columns. Their total
+    size is capped by settings.SIM_WHATIF_MAX_STATS_BYTES.
+    """
+    if len(variants) > MAX_VARIANTS:
+        raise ValueError(f"At most {MAX_VARIANTS} variants per request.")
+
+    specs = []
+    for i, v in enumerate(variants):
+        overrides = v.get("overrides") or {}
+        dists = variant_dists(plan, overrides)
+        dirty = dirty_columns(plan, dists.changed(plan.dists))
+        specs.append((str(v.get("name") or f"variant-{i + 1}"), sorted(overrides), dists, dirty))
+
+    exact_cols = exact_columns(exact, plan.n, plan.goal_cols)
+    goal_rows = [int(np.flatnonzero(exact_cols == g)[0]) for g in plan.goal_cols if g in exact_cols]
+    var_cols = [np.flatnonzero(dirty) for _, _, _, dirty in specs]
+    var_exact = [np.flatnonzero(np.isin(cols, exact_cols)) for cols in var_cols]
+
+    # Exact columns keep every sample, the others a histogram
+    size = sum(
+        len(ex) * trials + (len(cols) - len(ex)) * DEFAULT_BINS for cols, ex in zip(var_cols, var_exact)
+    ) * 8
+    limit = getattr(settings, "SIM_WHATIF_MAX_STATS_BYTES", DEFAULT_MAX_STATS_BYTES)
+    if size > limit:
+        raise ValueError(
+            f"These variants need {size >> 20} MB of node statistics (limit {limit >> 20} MB); "
+            "send fewer variants or fewer trials per request."
+        )
+
+    base_goal = np.zeros(trials, dtype=float)
+    base_stats = ReachStats(plan.n, trials, exact_cols)
+    var_goal = [np.zeros(trials, dtype=float) for _ in specs]
+    var_stats = [ReachStats(len(cols), trials, ex) for cols, ex in zip(var_cols, var_exact)]
+
+    # Row blocks as in _propagate_chunk, so each variant's scratch copy stays small
+    step = max(64, BLOCK_VALUES // max(plan.n, 1))
+    for k, stream in enumerate(_chunk_streams(seed, trials)):
+        start = k * CHUNK_TRIALS
+        stop = min(start + CHUNK_TRIALS, trials)
+        u = _chunk_uniforms(plan, stream, stop - start)
+        # Column-major as in _propagate_chunk, so the base equals a plain simulate_plan run
+        reach = np.zeros((stop - start, plan.n + 1), dtype=float, order="F")
+        for lo in range(0, stop - start, step):
+            ub = u[lo:lo + step]
+            block = _propagate(plan, _sample_p(plan, ub), out=reach[lo:lo + step])
+            for i, (_, _, dists, dirty) in enumerate(specs):
+                cols = var_cols[i]
+                p = np.zeros((ub.shape[0], plan.n))
+                p[:, cols] = _sample_p(plan, ub, cols, dists)
+                vreach = block.copy()
+                _propagate_dirty(plan, vreach, p, dirty)
+                var_goal[i][start + lo:start + lo + ub.shape[0]] = _any_goal(plan, vreach)
+                var_stats[i].update(start + lo, vreach[:, cols])
+        base_goal[start:stop] = _any_goal(plan, reach)
+        base_stats.update(start, reach[:, :plan.n])
+
+    out = []
+    for i, (name, overridden, _, dirty) in enumerate(specs):
+        stats = base_stats.spliced(var_cols[i], var_stats[i])
+        goal_deltas = {
+            plan.goal_ids[j]: _paired(stats.samples[row], base_stats.samples[row])
+            for j, row in enumerate(goal_rows)
+        } if len(goal_rows) == len(plan.goal_ids) else {}
+        out.append({
+            "name": name,
+            "overrides": overridden,
+            "recomputed_nodes": int(dirty.sum()),
+            "result": _result(plan, trials, var_goal[i], stats),
+            "delta": {
+                "success_rate_any_goal": _paired(var_goal[i], base_goal),
+                "goals": goal_deltas,
+            },
+        })
+
+    return {
+        "trials": trials,
+        "seed": seed,
+        "base": _result(plan, trials, base_goal, base_stats),
+        "variants": out,
+    }
+